@@ -0,0 +1,185 @@
+import io
+import os
+import re
+import csv
+import time
+
+from matcher import AhoCorasick
+from html_store import summarize
+
+ALERTS_FILE = "data/alerts.txt"
+ALERTS_LOG = "data/alerts.tsv"
+ALERT_FIELDS = ["time", "rule", "feed", "title", "link"]
+
+class AlertRules:
+    """Keyword alert rules compiled into one matcher, so an item is scanned once however many rules there are.
+
+    Rule forms, one per line of data/alerts.txt:
+        neural network          - keyword or phrase, whole words, any case
+        transformer*            - word prefix (transformers, transformer-based)
+        GPU: cuda, tensor core  - named rule with several keywords
+        /llama[- ]?\\d/          - regular expression (case-insensitive)
+        # comment
+    Keywords go into one Aho-Corasick automaton, regular expressions into one
+    alternation; a hit reports the rule name (the line itself if unnamed).
+    Expressions that cannot share an alternation (the same named group in two
+    rules, numbered backreferences) are matched one by one instead.
+    """
+
+    def __init__(self):
+        self.keywords = AhoCorasick()
+        self.keyword_rules = []  # id шаблона -> (правило, только префикс)
+        self.regex_rules = []    # (правило, выражение)
+        self.regex = None
+        self.regex_list = []     # (правило, выражение), если общее выражение не собралось
+        self.rule_count = 0
+
+    @classmethod
+    def from_file(cls, path=ALERTS_FILE):
+        rules = cls()
+        if os.path.isfile(path):
+            try:
+                with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                    rules.load_rules(f)
+            except OSError as e:
+                print(f"Error loading alert rules {path}: {e}")
+        rules.build()
+        return rules
+
+    def load_rules(self, lines):
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if self.add_rule(line):
+                self.rule_count += 1
+
+    def add_rule(self, line):
+        """Add one rule line; returns False if it has no usable keyword."""
+        if len(line) > 2 and line.startswith("/") and line.endswith("/"):
+            try:
+                re.compile(line[1:-1], re.I)
+            except re.error as e:
+                print(f"Bad alert regex {line}: {e}")
+                return False
+            self.regex_rules.append((line, line[1:-1]))
+            return True
+        name, sep, body = line.partition(":")
+        if not sep:
+            name, body = line, line
+        name = name.strip()
+        added = False
+        for keyword in body.split(","):
+            keyword = " ".join(keyword.lower().split())
+            prefix = keyword.endswith("*")
+            keyword = keyword.rstrip("*").strip()
+            if keyword:
+                self.keywords.add(keyword)
+                self.keyword_rules.append((name, prefix))
+                added = True
+        return added
+
+    def build(self):
+        self.keywords.build()
+        if self.regex_rules:
+            try:
+                self.regex = re.compile(
+                    "|".join(f"(?P<r{i}>{pattern})" for i, (_, pattern) in enumerate(self.regex_rules)), re.I)
+            except re.error as e:
+                # Каждое выражение уже проверено в add_rule; вместе они не собираются - проверяем по одному
+                print(f"Alert regexes checked one by one: {e}")
+                self.regex = None
+                self.regex_list = [(rule, re.compile(pattern, re.I)) for rule, pattern in self.regex_rules]
+
+    def match(self, text):
+        """Names of the rules that fire on text, in rule order of first hit."""
+        hits = {}
+        lowered = " ".join(text.lower().split())
+        patterns = self.keywords.patterns
+        for end, pattern_id in self.keywords.iter_matches(lowered):
+            name, prefix = self.keyword_rules[pattern_id]
+            if name in hits:
+                continue
+            start = end - len(patterns[pattern_id]) + 1
+            # Только целые слова: "ai" не должен срабатывать на "said"
+            if start > 0 and lowered[start - 1].isalnum():
+                continue
+            if not prefix and end + 1 < len(lowered) and lowered[end + 1].isalnum():
+                continue
+            hits[name] = True
+        if self.regex is not None:
+            for match in self.regex.finditer(text):
+                hits.setdefault(self.regex_rules[int(match.lastgroup[1:])][0], True)
+        for rule, regex in self.regex_list:
+            if rule not in hits and regex.search(text):
+                hits[rule] = True
+        return list(hits)
+
+    def __len__(self):
+        return self.rule_count
+
+class AlertLog:
+    """Matches new feed items against data/alerts.txt and appends hits to data/alerts.tsv.
+
+    The rules are recompiled when alerts.txt changes, so a long-running
+    ingestd picks up edits on its next fetch.
+    """
+
+    def __init__(self, rules_path=ALERTS_FILE, log_path=ALERTS_LOG):
+        self.rules_path = rules_path
+        self.log_path = log_path
+        self.rules = AlertRules()
+        self.rules_mtime = None
+
+    def refresh(self):
+        try:
+            mtime = os.stat(self.rules_path).st_mtime
+        except OSError:
+            mtime = None
+        if mtime != self.rules_mtime:
+            # Время запоминается и при ошибке: сломанный файл не перечитывается при каждой записи
+            self.rules_mtime = mtime
+            try:
+                self.rules = AlertRules.from_file(self.rules_path) if mtime is not None else AlertRules()
+            except Exception as e:
+                print(f"Error loading alert rules {self.rules_path}: {e}")
+                self.rules = AlertRules()
+            if len(self.rules):
+                print(f"Loaded {len(self.rules)} alert rules")
+        return self.rules
+
+    def check(self, batch, indices, feed=""):
+        """Match batch rows (title and description text) and log the hits. Returns the number of hits."""
+        rules = self.refresh()
+        if not len(rules):
+            return 0
+        now = time.strftime("%Y-%m-%d %H:%M:%S")
+        rows = []
+        for i in indices:
+            description = batch.descriptions[i]
+            text = batch.titles[i] + "\n" + summarize(description, limit=len(description))
+            for rule in rules.match(text):
+                rows.append([now, rule, feed, batch.titles[i], batch.links[i]])
+        if rows:
+            write_header = not os.path.exists(self.log_path) or os.path.getsize(self.log_path) == 0
+            with open(self.log_path, 'a', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f, delimiter='\t')
+                if write_header:
+                    writer.writerow(ALERT_FIELDS)
+                writer.writerows(rows)
+            print(f"{len(rows)} alerts for: {feed}")
+        return len(rows)
+
+def read_alerts(log_path=ALERTS_LOG, offset=0):
+    """Alert rows appended after byte offset, as dicts, and the new offset."""
+    try:
+        with open(log_path, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+    except OSError:
+        return [], offset
+    # Неполная последняя строка (запись ещё идёт) - дочитаем в следующий раз
+    data = data[:data.rfind(b"\n") + 1]
+    offset += len(data)
+    reader = csv.reader(io.StringIO(data.decode('utf-8', errors='replace'), newline=''), delimiter='\t')
+    return [dict(zip(ALERT_FIELDS, row)) for row in reader if row and row != ALERT_FIELDS], offset
@@ -0,0 +1,77 @@
+# Benchmark of keyword alerts: items matched per second as the rule count
+# grows, compiled automaton against checking every rule with its own regex.
+#
+#   python benchmarks/bench_alerts.py
+
+import os
+import re
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from alerts import AlertRules
+
+WORDS = ("новости рынок the market report government city team season data model said "
+         "people company region price energy research science game policy update").split()
+
+def make_rules(count, rng):
+    rules = []
+    for i in range(count):
+        kind = i % 10
+        if kind == 0:
+            rules.append(f"topic{i}: keyword{i}, phrase number {i}")
+        elif kind == 1:
+            rules.append(f"prefix{i}*")
+        else:
+            rules.append(f"keyword{i}")
+    rules.append("/llama[- ]?\\d/")
+    return rules
+
+def make_items(count, rule_count, rng):
+    items = []
+    for i in range(count):
+        words = [rng.choice(WORDS) for _ in range(60)]
+        if i % 20 == 0:
+            words.insert(rng.randrange(len(words)), f"keyword{rng.randrange(rule_count)}")
+        items.append(" ".join(words))
+    return items
+
+def bench(rule_count, items, rng, naive=False):
+    lines = make_rules(rule_count, rng)
+    start = time.perf_counter()
+    rules = AlertRules()
+    rules.load_rules(lines)
+    rules.build()
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    hits = sum(len(rules.match(text)) for text in items)
+    match_time = time.perf_counter() - start
+    line = (f"rules={len(rules):>6}  build={build_time * 1000:8.1f} ms  "
+            f"automaton={len(items) / match_time:9.0f} items/s  hits={hits}")
+
+    if naive:
+        # Каждое правило отдельным выражением - как grep по списку слов
+        patterns = [re.compile(r"\b" + re.escape(line.rstrip("*")), re.I) for line in lines if not line.startswith("/")]
+        start = time.perf_counter()
+        naive_hits = sum(1 for text in items for pattern in patterns if pattern.search(text))
+        naive_time = time.perf_counter() - start
+        line += f"  per-rule regex={len(items) / naive_time:9.0f} items/s"
+    print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description="Alert rule matching benchmark")
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--rules", type=int, nargs="+", default=[10, 100, 1000, 5000])
+    parser.add_argument("--naive", action="store_true", help="also time one regex per rule")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    for rule_count in args.rules:
+        bench(rule_count, make_items(args.items, rule_count, rng), rng, args.naive)
+
+if __name__ == "__main__":
+    main()
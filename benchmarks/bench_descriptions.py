@@ -0,0 +1,106 @@
+# Benchmark of description storage: raw HTML in the CSV against a plain-text
+# summary in the CSV plus the compressed HTML store, by file size and load time.
+#
+#   QT_QPA_PLATFORM=offscreen python benchmarks/bench_descriptions.py
+
+import os
+import sys
+import time
+import random
+import tempfile
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from feed_items import FeedBatch
+from html_store import HtmlStore, store_descriptions
+from enrich import item_id
+
+WORDS = ("новости рынок the market report government city team season data model said "
+         "people company region price energy research science game policy update").split()
+
+def make_description(rng):
+    paragraphs = []
+    for _ in range(rng.randint(3, 10)):
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(30, 80)))
+        paragraphs.append(f'<p class="article-text">{text} <a href="https://example.com/{rng.randint(0, 10**6)}" '
+                          f'target="_blank" rel="nofollow">Read more</a></p>')
+    image = f'<img src="https://cdn.example.com/{rng.randint(0, 10**6)}.jpg" alt="" width="640" height="360" />'
+    return f'<div class="content">{image}{"".join(paragraphs)}</div>'
+
+def make_batch(count, seed=1):
+    rng = random.Random(seed)
+    batch = FeedBatch()
+    now = int(time.time())
+    for i in range(count):
+        batch.append(f"Headline {i} " + " ".join(rng.choice(WORDS) for _ in range(6)),
+                     f"https://example.com/news/{i}", make_description(rng),
+                     "Mon, 01 Jan 2024 10:00:00 GMT", now, "bench")
+    return batch
+
+def dir_size(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+def time_viewer(path, repeat):
+    from PySide6.QtWidgets import QApplication
+    from csv_viewer import CSVViewerTab
+
+    class Window:
+        html_store = None
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    tab = CSVViewerTab(path, Window())
+    start = time.perf_counter()
+    for _ in range(repeat):
+        tab.load_csv()
+        app.processEvents()
+    return (time.perf_counter() - start) / repeat
+
+def main():
+    parser = argparse.ArgumentParser(description="Description storage benchmark")
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-viewer", action="store_true", help="skip CSVViewerTab load timing")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        raw_path = os.path.join(tmp, "raw.csv")
+        summary_path = os.path.join(tmp, "summary.csv")
+        store = HtmlStore(os.path.join(tmp, "html_store"))
+
+        make_batch(args.items).write_tsv(raw_path)
+        batch = make_batch(args.items)
+        start = time.perf_counter()
+        store_descriptions(batch, range(len(batch)), store)
+        store_time = time.perf_counter() - start
+        batch.write_tsv(summary_path)
+
+        raw_size = os.path.getsize(raw_path)
+        summary_size = os.path.getsize(summary_path)
+        store_size = dir_size(store.store_dir)
+        print(f"{args.items} items")
+        print(f"raw HTML in CSV:      {raw_size / 1024 / 1024:7.2f} MB")
+        print(f"summary CSV:          {summary_size / 1024 / 1024:7.2f} MB")
+        print(f"HTML store:           {store_size / 1024 / 1024:7.2f} MB  "
+              f"({store_time:.2f} s to summarise and compress)")
+
+        for label, path in (("raw", raw_path), ("summary", summary_path)):
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                FeedBatch.read_tsv(path)
+            print(f"read_tsv {label:<8}      {(time.perf_counter() - start) / args.repeat * 1000:7.0f} ms")
+
+        if not args.no_viewer:
+            for label, path in (("raw", raw_path), ("summary", summary_path)):
+                print(f"viewer load {label:<8}   {time_viewer(path, args.repeat) * 1000:7.0f} ms")
+
+        # Раскрытие строки: одно чтение из хранилища
+        reopened = HtmlStore(store.store_dir)
+        start = time.perf_counter()
+        for i in range(0, args.items, max(1, args.items // 1000)):
+            assert reopened.get(item_id(f"https://example.com/news/{i}"))
+        lookups = len(range(0, args.items, max(1, args.items // 1000)))
+        print(f"expand row:           {(time.perf_counter() - start) / lookups * 1e6:7.0f} us")
+
+if __name__ == "__main__":
+    main()
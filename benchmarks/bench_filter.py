@@ -0,0 +1,134 @@
+# Benchmark of request filtering: matcher throughput and page load time
+# on a generated local page set, with and without the filter.
+#
+#   QT_QPA_PLATFORM=offscreen python benchmarks/bench_filter.py
+
+import os
+import sys
+import time
+import random
+import tempfile
+import threading
+import argparse
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from content_filter import FilterEngine
+
+def make_rules(count):
+    rules = []
+    for i in range(count):
+        kind = i % 3
+        if kind == 0:
+            rules.append(f"0.0.0.0 tracker{i}.example.net")
+        elif kind == 1:
+            rules.append(f"||ads{i}.example.com^")
+        else:
+            rules.append(f"/adserver{i}/banner.")
+    rules.append("/ads/")
+    rules.append("/track/")
+    return rules
+
+def bench_matcher(rule_count, url_count=100000):
+    engine = FilterEngine()
+    start = time.perf_counter()
+    engine.load_rules(make_rules(rule_count))
+    engine.url_patterns.build()
+    build_time = time.perf_counter() - start
+
+    urls = []
+    for i in range(url_count):
+        n = random.randrange(rule_count * 2)
+        host = random.choice([f"tracker{n}.example.net", f"cdn{n}.site.org", f"ads{n}.example.com"])
+        urls.append((f"https://{host}/static/{n}/app.js?v={i}", host))
+    start = time.perf_counter()
+    blocked = sum(1 for url, host in urls if engine.should_block(url, host))
+    match_time = time.perf_counter() - start
+    print(f"rules={len(engine):>7}  build={build_time * 1000:8.1f} ms  "
+          f"match={url_count / match_time:10.0f} url/s  blocked={blocked}")
+
+class SlowHandler(SimpleHTTPRequestHandler):
+    """Serves the page set; /ads/ and /track/ resources answer with a delay like third-party trackers."""
+
+    def do_GET(self):
+        if self.path.startswith(("/ads/", "/track/")):
+            time.sleep(0.05)
+            body = b"/* tracker */"
+            self.send_response(200)
+            self.send_header("Content-Type", "application/javascript")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        super().do_GET()
+
+    def log_message(self, *args):
+        pass
+
+def make_pages(directory, count, trackers_per_page=20):
+    for i in range(count):
+        scripts = "\n".join(
+            f'<script src="/{"ads" if j % 2 else "track"}/s{i}_{j}.js"></script>' for j in range(trackers_per_page))
+        paragraphs = "\n".join(f"<p>Paragraph {k} of article {i}.</p>" for k in range(50))
+        with open(os.path.join(directory, f"page{i}.html"), 'w', encoding='utf-8') as f:
+            f.write(f"<html><head><title>Page {i}</title>{scripts}</head><body>{paragraphs}</body></html>")
+
+def bench_page_load(page_count):
+    from PySide6.QtCore import QUrl, QEventLoop, QTimer
+    from PySide6.QtWidgets import QApplication
+    from PySide6.QtWebEngineWidgets import QWebEngineView
+    from PySide6.QtWebEngineCore import QWebEngineProfile, QWebEnginePage
+    from content_filter import TabRequestFilter
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    directory = tempfile.mkdtemp(prefix="neurolit_pages_")
+    make_pages(directory, page_count)
+    handler = lambda *a, **kw: SlowHandler(*a, directory=directory, **kw)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+
+    engine = FilterEngine()
+    engine.load_rules(make_rules(3000))
+    engine.url_patterns.build()
+
+    for label, use_filter in (("no filter", False), ("filter", True)):
+        profile = QWebEngineProfile()  # off-the-record, no shared cache between runs
+        view = QWebEngineView()
+        page = QWebEnginePage(profile, view)
+        view.setPage(page)
+        request_filter = TabRequestFilter(engine) if use_filter else None
+        if request_filter is not None:
+            page.setUrlRequestInterceptor(request_filter)
+        times = []
+        for i in range(page_count):
+            loop = QEventLoop()
+            view.loadFinished.connect(loop.quit)
+            QTimer.singleShot(30000, loop.quit)
+            start = time.perf_counter()
+            view.setUrl(QUrl(f"http://127.0.0.1:{port}/page{i}.html"))
+            loop.exec()
+            times.append(time.perf_counter() - start)
+            view.loadFinished.disconnect(loop.quit)
+        blocked = request_filter.blocked if request_filter is not None else 0
+        times.sort()
+        print(f"{label:>10}: median={times[len(times) // 2] * 1000:7.1f} ms  "
+              f"max={times[-1] * 1000:7.1f} ms  blocked={blocked}")
+        page.setUrlRequestInterceptor(None)
+        view.deleteLater()
+    server.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description="Request filter benchmark")
+    parser.add_argument("--pages", type=int, default=20, help="pages in the generated local page set")
+    parser.add_argument("--no-browser", action="store_true", help="only benchmark the matcher")
+    args = parser.parse_args()
+
+    for rule_count in (1000, 10000, 100000):
+        bench_matcher(rule_count)
+    if not args.no_browser:
+        bench_page_load(args.pages)
+
+if __name__ == "__main__":
+    main()
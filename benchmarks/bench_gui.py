@@ -0,0 +1,240 @@
+# GUI responsiveness benchmark: builds MainWindow offscreen against a synthetic
+# data/ tree and times startup, sidebar population, feed paging, the CSV viewer
+# and bookmark adds, with the longest event-loop stall of every scenario.
+# Results are compared with a stored baseline; a regression exits with code 1.
+#
+#   QT_QPA_PLATFORM=offscreen python benchmarks/bench_gui.py --scale small --update-baseline
+#   QT_QPA_PLATFORM=offscreen python benchmarks/bench_gui.py --scale small
+
+import os
+import sys
+import json
+import time
+import random
+import tempfile
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PySide6.QtCore import QUrl, QTimer, QElapsedTimer
+from PySide6.QtWidgets import QApplication
+
+from feed_items import FeedBatch
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_DIR = os.path.join(BENCH_DIR, "baselines")
+
+# history files, bookmarks, feeds in feeds.csv, rows of the big feed CSV
+SCALES = {
+    "small": dict(history=1000, bookmarks=500, feeds=200, rows=20000),
+    "full": dict(history=10000, bookmarks=5000, feeds=2000, rows=500000),
+}
+
+WORDS = ("новости рынок the market report government city team season data model said "
+         "people company region price energy research science game policy update").split()
+
+def make_data_tree(root, history, bookmarks, feeds, rows, seed=1):
+    rng = random.Random(seed)
+    history_dir = os.path.join(root, "history")
+    os.makedirs(history_dir)
+    subdirs = [os.path.join(history_dir, f"topic{i}") for i in range(20)]
+    for subdir in subdirs:
+        os.makedirs(subdir)
+    for i in range(history):
+        directory = subdirs[i % len(subdirs)] if i % 10 == 0 else history_dir
+        with open(os.path.join(directory, f"2024-01-{i % 28 + 1:02d} page {i}.txt"), 'w', encoding='utf-8') as f:
+            f.write(" ".join(rng.choice(WORDS) for _ in range(200)))
+
+    with open(os.path.join(root, "bookmarks.txt"), 'w', encoding='utf-8') as f:
+        folder_size = 80
+        for i in range(bookmarks):
+            if i % folder_size == 0 and i < bookmarks // 2:
+                if i:
+                    f.write("[]\n")
+                f.write(f"[Folder {i // folder_size}]\n")
+            if i == bookmarks // 2:
+                f.write("[]\n")
+            f.write(f"Bookmark {i} {rng.choice(WORDS)}|https://site{i}.example.com/page\n")
+
+    with open(os.path.join(root, "feeds.csv"), 'w', encoding='utf-8') as f:
+        f.write("url\tdescription\tproxy\n")
+        for i in range(feeds):
+            f.write(f"https://feed{i}.example.com/rss\tFeed {i}\t\n")
+
+    feeds_dir = os.path.join(root, "feeds")
+    os.makedirs(feeds_dir)
+    big_path = os.path.join(feeds_dir, "big_example_com_rss.csv")
+    now = int(time.time())
+    for start in range(0, rows, 10000):
+        batch = FeedBatch()
+        for i in range(start, min(rows, start + 10000)):
+            batch.append(" ".join(rng.choice(WORDS) for _ in range(8)), f"https://big.example.com/news/{i}",
+                         " ".join(rng.choice(WORDS) for _ in range(30)), "",
+                         now - i * 60, pub_ts=now - rng.randrange(rows) * 60)
+        batch.write_tsv(big_path)
+    return big_path
+
+class StallMonitor:
+    """Longest gap between ticks of a short timer, i.e. how long the event loop was blocked."""
+
+    def __init__(self, interval_ms=5, threshold_ms=50):
+        self.interval_ms = interval_ms
+        self.threshold_ms = threshold_ms
+        self.clock = QElapsedTimer()
+        self.timer = QTimer()
+        self.timer.setInterval(interval_ms)
+        self.timer.timeout.connect(self.tick)
+        self.reset()
+
+    def start(self):
+        self.clock.start()
+        self.last = self.clock.elapsed()
+        self.timer.start()
+
+    def reset(self):
+        self.max_stall = 0
+        self.stalls = 0
+        self.last = self.clock.elapsed() if self.clock.isValid() else 0
+
+    def tick(self):
+        now = self.clock.elapsed()
+        gap = now - self.last - self.interval_ms
+        self.last = now
+        if gap > self.threshold_ms:
+            self.stalls += 1
+        self.max_stall = max(self.max_stall, gap)
+
+def settle(app, ms):
+    """Run the event loop for ms, so deferred work and the stall monitor get their turn."""
+    end = time.perf_counter() + ms / 1000
+    while time.perf_counter() < end:
+        app.processEvents()
+        time.sleep(0.001)
+
+def wait_for(app, condition, timeout=120):
+    end = time.perf_counter() + timeout
+    while not condition() and time.perf_counter() < end:
+        app.processEvents()
+        time.sleep(0.001)
+
+class Bench:
+    def __init__(self, app, settle_ms=200):
+        self.app = app
+        self.settle_ms = settle_ms
+        self.monitor = StallMonitor()
+        self.monitor.start()
+        self.results = {}
+
+    def run(self, name, func, count=1):
+        """Time func (seconds per call over count calls) and the worst stall until the loop is idle again."""
+        settle(self.app, 50)
+        self.monitor.reset()
+        start = time.perf_counter()
+        for _ in range(count):
+            result = func()
+        elapsed = (time.perf_counter() - start) / count
+        settle(self.app, self.settle_ms)
+        self.results[name] = {"seconds": round(elapsed, 4), "max_stall_ms": self.monitor.max_stall,
+                              "stalls": self.monitor.stalls}
+        print(f"{name:22} {elapsed * 1000:10.1f} ms   max stall {self.monitor.max_stall:6d} ms   "
+              f"stalls {self.monitor.stalls}")
+        return result
+
+def run_scenarios(data_dir, big_path, settle_ms):
+    import main
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    bench = Bench(app, settle_ms)
+
+    window = bench.run("startup", lambda: main.MainWindow(data_dir))
+    window.show()
+    bench.run("sidebar_history", window.populate_history_tree)
+    bench.run("sidebar_bookmarks", window.populate_bookmarks_tree)
+
+    window.feed_page = 0
+    bench.run("feeds_first_page", window.show_feeds)
+    bench.run("feeds_next_page", window.next_feeds_page, count=10)
+
+    bench.run("viewer_open", lambda: window.add_csv_tab(big_path, "big"))
+    viewer = window.tabs.currentWidget()
+    bench.run("viewer_refresh", viewer.load_csv)
+
+    headers = viewer.model.headers
+
+    def sort_by_title():
+        viewer.on_header_clicked(headers.index("title"))
+        wait_for(app, lambda: viewer.order is not None)
+    bench.run("viewer_sort_title", sort_by_title)
+
+    window.add_new_tab(QUrl("about:blank"), "bench")
+    browser = window.current_browser()
+    urls = iter(range(10 ** 6))
+
+    def add_bookmark():
+        browser.setUrl(QUrl(f"https://bench.example.com/{next(urls)}"))
+        window.add_current_page_bookmark()
+    bench.run("bookmark_add", add_bookmark, count=20)
+
+    window.hibernate_timer.stop()
+    window.session_timer.stop()
+    return bench.results
+
+def compare(results, baseline, tolerance, floor_ms=10):
+    """Names of the scenarios slower than baseline by more than tolerance (and floor_ms)."""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for key, scale in (("seconds", 1000), ("max_stall_ms", 1)):
+            value, reference = result[key] * scale, base[key] * scale
+            if value > reference * (1 + tolerance) and value - reference > floor_ms:
+                regressions.append(f"{name}.{key}: {value:.0f} vs baseline {reference:.0f}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Offscreen GUI responsiveness benchmark")
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--baseline", help="baseline JSON (default benchmarks/baselines/gui_<scale>.json)")
+    parser.add_argument("--update-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed slowdown, 0.5 = 50%%")
+    parser.add_argument("--settle-ms", type=int, default=200)
+    parser.add_argument("--output", help="also write the results JSON here")
+    args = parser.parse_args()
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    app = QApplication(sys.argv)
+    baseline_path = args.baseline or os.path.join(BASELINE_DIR, f"gui_{args.scale}.json")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = os.path.join(tmp, "data")
+        start = time.perf_counter()
+        big_path = make_data_tree(data_dir, **SCALES[args.scale])
+        print(f"Synthetic data ({args.scale}): {time.perf_counter() - start:.1f} s")
+        results = run_scenarios(data_dir, big_path, args.settle_ms)
+
+    report = {"scale": args.scale, "python": sys.version.split()[0], "results": results}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=1)
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(baseline_path) or ".", exist_ok=True)
+        with open(baseline_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=1)
+        print(f"Baseline saved: {baseline_path}")
+        return 0
+    if not os.path.exists(baseline_path):
+        print(f"No baseline at {baseline_path}, run with --update-baseline")
+        return 0
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)["results"]
+    regressions = compare(results, baseline, args.tolerance)
+    for line in regressions:
+        print("REGRESSION " + line)
+    if not regressions:
+        print("No regressions against " + baseline_path)
+    app.processEvents()
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
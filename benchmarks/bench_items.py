@@ -0,0 +1,95 @@
+# Benchmark of feed item storage: a dict per item (the old parse_and_save_to_csv
+# format) against FeedBatch columns, by memory, allocated blocks and time.
+#
+#   python benchmarks/bench_items.py --items 1000000
+
+import os
+import sys
+import csv
+import time
+import tempfile
+import argparse
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from feed_items import FeedBatch
+
+FEEDS = 50
+
+def item_fields(i):
+    # Строки создаются заново для каждого элемента, как при разборе XML
+    return (f"Headline number {i} about something",
+            f"https://example{i % FEEDS}.com/news/{i}",
+            f"Short description of item {i}",
+            f"Mon, {i % 28 + 1:02d} Jan 2024 10:00:00 GMT")
+
+def build_dicts(count, save_ts):
+    items = []
+    for i in range(count):
+        title, link, description, pub_date = item_fields(i)
+        items.append({
+            "title": title,
+            "link": link,
+            "description": description,
+            "pub_date": pub_date,
+            "save_date": datetime.fromtimestamp(save_ts).strftime("%Y-%m-%d %H:%M:%S"),
+            "feed": f"feed_{i % FEEDS}",
+        })
+    return items
+
+def build_batch(count, save_ts):
+    batch = FeedBatch()
+    for i in range(count):
+        title, link, description, pub_date = item_fields(i)
+        batch.append(title, link, description, pub_date, save_ts, f"feed_{i % FEEDS}")
+    return batch
+
+def measure(label, func, count):
+    tracemalloc.start()
+    blocks_before = sys.getallocatedblocks()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    blocks = sys.getallocatedblocks() - blocks_before
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<22} {size / count:7.0f} B/item  {blocks / count:5.2f} blocks/item  "
+          f"{elapsed:6.2f} s  ({size / 1024 / 1024:.0f} MB)")
+    return result
+
+def bench_memory(count):
+    print(f"In memory, {count} items:")
+    save_ts = int(time.time())
+    result = measure("dict per item", lambda: build_dicts(count, save_ts), count)
+    del result
+    result = measure("FeedBatch", lambda: build_batch(count, save_ts), count)
+    return result
+
+def bench_tsv(batch, count):
+    print(f"TSV read, {count} items:")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "feed.csv")
+        batch.select(range(count)).write_tsv(path)
+
+        def read_rows():
+            with open(path, 'r', newline='', encoding='utf-8') as f:
+                return list(csv.DictReader(f, delimiter='\t'))
+
+        rows = measure("csv.DictReader", read_rows, count)
+        del rows
+        loaded = measure("FeedBatch.read_tsv", lambda: FeedBatch.read_tsv(path), count)
+        assert [loaded.row(i) for i in range(3)] == [batch.row(i) for i in range(3)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Feed item storage benchmark")
+    parser.add_argument("--items", type=int, default=1000000, help="items to build in memory")
+    parser.add_argument("--tsv-items", type=int, default=200000, help="items to write and read back")
+    args = parser.parse_args()
+
+    batch = bench_memory(args.items)
+    bench_tsv(batch, min(args.tsv_items, args.items))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# Benchmark of feed parsing per format: items/s and peak memory of the sniffing
+# streaming parsers against the old whole-tree RSS 2.0 -> Atom parse_feed.
+#
+#   python benchmarks/bench_parsers.py --items 2000
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tracemalloc
+import xml.etree.ElementTree as ET
+from email.utils import formatdate
+from xml.sax.saxutils import escape
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from feed_items import FeedBatch
+from feed_parsers import parse_feed, decode_feed, sniff_format
+
+WORDS = ("новости рынок the market report government city team season data model said "
+         "people company region price energy research science game policy update").split()
+
+def make_items(count, rng):
+    now = int(time.time())
+    for i in range(count):
+        ts = now - i * 600
+        yield (f"Headline {i} " + " ".join(rng.choice(WORDS) for _ in range(6)),
+               f"https://example.com/news/{i}",
+               "<p>" + " ".join(rng.choice(WORDS) for _ in range(rng.randint(40, 120))) + "</p>",
+               ts)
+
+def make_rss2(items):
+    body = "".join(f"<item><title>{escape(t)}</title><link>{l}</link><description>{escape(d)}</description>"
+                   f"<pubDate>{formatdate(ts, usegmt=True)}</pubDate><guid>{l}</guid></item>"
+                   for t, l, d, ts in items)
+    return ('<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel><title>Bench</title>'
+            f'<link>https://example.com/</link>{body}</channel></rss>').encode('utf-8')
+
+def make_rss1(items):
+    items = list(items)
+    seq = "".join(f'<rdf:li rdf:resource="{l}"/>' for _, l, _, _ in items)
+    body = "".join(f'<item rdf:about="{l}"><title>{escape(t)}</title><link>{l}</link>'
+                   f'<description>{escape(d)}</description>'
+                   f'<dc:date>{time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(ts))}</dc:date></item>'
+                   for t, l, d, ts in items)
+    return ('<?xml version="1.0" encoding="UTF-8"?>'
+            '<rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#" xmlns="http://purl.org/rss/1.0/" '
+            'xmlns:dc="http://purl.org/dc/elements/1.1/">'
+            f'<channel rdf:about="https://example.com/"><title>Bench</title><items><rdf:Seq>{seq}</rdf:Seq></items>'
+            f'</channel>{body}</rdf:RDF>').encode('utf-8')
+
+def make_atom(items):
+    body = "".join(f'<entry><title>{escape(t)}</title><link rel="alternate" href="{l}"/><id>{l}</id>'
+                   f'<summary type="html">{escape(d)}</summary>'
+                   f'<published>{time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(ts))}</published></entry>'
+                   for t, l, d, ts in items)
+    return ('<?xml version="1.0" encoding="utf-8"?><feed xmlns="http://www.w3.org/2005/Atom">'
+            f'<title>Bench</title>{body}</feed>').encode('utf-8')
+
+def make_json(items):
+    return json.dumps({
+        "version": "https://jsonfeed.org/version/1.1", "title": "Bench",
+        "items": [{"id": l, "url": l, "title": t, "content_html": d,
+                   "date_published": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(ts))}
+                  for t, l, d, ts in items],
+    }, ensure_ascii=False).encode('utf-8')
+
+FORMATS = {"rss2": make_rss2, "rss1": make_rss1, "atom": make_atom, "json": make_json}
+
+def legacy_parse(content):
+    """The old parse_feed: whole tree, .//item and then Atom entries."""
+    root = ET.fromstring(decode_feed(content))
+    batch = FeedBatch()
+    save_ts = int(time.time())
+    for item in root.findall(".//item"):
+        batch.append(item.findtext("title", ""), item.findtext("link", ""),
+                     item.findtext("description", ""), item.findtext("pubDate", ""), save_ts)
+    if not len(batch):
+        for entry in root.findall("{http://www.w3.org/2005/Atom}entry"):
+            link_elem = entry.find("{http://www.w3.org/2005/Atom}link")
+            batch.append(entry.findtext("{http://www.w3.org/2005/Atom}title", ""),
+                         link_elem.get("href", "") if link_elem is not None else "",
+                         entry.findtext("{http://www.w3.org/2005/Atom}summary", ""),
+                         entry.findtext("{http://www.w3.org/2005/Atom}published", ""), save_ts)
+    return batch
+
+def measure(func, content, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(content)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    func(content)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, best, peak
+
+def main():
+    parser = argparse.ArgumentParser(description="Feed parser benchmark")
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for name, make in FORMATS.items():
+        content = make(make_items(args.items, random.Random(1)))
+        assert sniff_format(content) == name, name
+        batch, elapsed, peak = measure(parse_feed, content, args.repeat)
+        assert len(batch) == args.items and all(batch.pub_ts) and batch.links[0].startswith("https://"), name
+        line = (f"{name:5}  {len(content) / 1e6:6.2f} MB  parse={args.items / elapsed:9.0f} items/s  "
+                f"peak={peak / 1e6:6.1f} MB")
+        if name != "json":
+            # Текст (str) всегда проходит regex-очистку - так декодировал старый код
+            _, fast, _ = measure(decode_feed, content, args.repeat)
+            _, slow, _ = measure(decode_feed, content.decode('utf-8'), args.repeat)
+            line += f"  decode={fast * 1000:5.1f} ms (regex cleanup {slow * 1000:5.1f} ms)"
+            old, legacy_elapsed, legacy_peak = measure(legacy_parse, content, args.repeat)
+            line += (f"  old={len(old) / legacy_elapsed:9.0f} items/s ({len(old)} found)  "
+                     f"peak={legacy_peak / 1e6:6.1f} MB")
+        print(line)
+
+if __name__ == "__main__":
+    main()
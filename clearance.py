@@ -0,0 +1,174 @@
+import os
+import json
+import time
+import threading
+from urllib.parse import urlparse
+
+CLEARANCE_FILE = "data/clearance.json"
+
+# Cookies, которые Cloudflare выдаёт после решения проверки
+CLEARANCE_COOKIES = ("cf_clearance", "__cf_bm", "__cflb", "cf_chl_rc_m")
+
+class ChallengeStats:
+    """Per-run counters of Cloudflare challenge handling, updated from the fetch threads."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.solved = 0
+        self.reused = 0
+        self.rejected = 0
+        self.solve_seconds = 0.0
+
+    def add(self, solved=0, reused=0, rejected=0, solve_seconds=0.0):
+        with self.lock:
+            self.solved += solved
+            self.reused += reused
+            self.rejected += rejected
+            self.solve_seconds += solve_seconds
+
+    def report(self):
+        return (f"Challenges: {self.solved} solved in {self.solve_seconds:.1f} s, "
+                f"{self.reused} clearances reused, {self.rejected} rejected")
+
+class ClearanceCache:
+    """Persistent per-host cache of Cloudflare clearance cookies.
+
+    data/clearance.json:
+        {"host|proxy": {"user_agent": ..., "expires": ts, "cookies": [{name, value, domain, path}]}}
+
+    cf_clearance is bound to the user agent and the client IP, so the key
+    includes the proxy and the user agent is sent together with the cookies.
+    The session is shared by the fetch threads: the user agent goes with each
+    request instead of into the session headers, and requests to one host are
+    serialised by host_lock() (the cookie jar is per host), so a new cf_clearance in the cookie jar belongs
+    to the request that got it (and a challenge is solved once, not by every
+    thread fetching the host).
+    """
+
+    def __init__(self, file_path=CLEARANCE_FILE, default_ttl=1800):
+        self.file_path = file_path
+        self.default_ttl = default_ttl
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.host_locks = {}
+        if os.path.isfile(file_path):
+            try:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except Exception as e:
+                print(f"Error loading clearance cache: {e}")
+
+    @staticmethod
+    def key(url, proxy=None):
+        return f"{urlparse(url).hostname}|{proxy or 'direct'}"
+
+    def host_lock(self, host):
+        with self.lock:
+            lock = self.host_locks.get(host)
+            if lock is None:
+                lock = self.host_locks[host] = threading.Lock()
+            return lock
+
+    def apply(self, session, key):
+        """Load a valid cached clearance's cookies into the session.
+
+        Returns the user agent to send with them ("" if none was saved), None if nothing was applied.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry["expires"] <= time.time():
+                del self.entries[key]
+                return None
+            for cookie in entry["cookies"]:
+                session.cookies.set(cookie["name"], cookie["value"], domain=cookie["domain"], path=cookie["path"])
+            return entry.get("user_agent") or ""
+
+    def store(self, session, key, host, user_agent):
+        """Remember the clearance cookies the session holds for host. Returns True if found."""
+        cookies = []
+        expires = []
+        for cookie in session.cookies:
+            domain = cookie.domain.lstrip(".")
+            if cookie.name in CLEARANCE_COOKIES and (host == domain or host.endswith("." + domain)):
+                cookies.append({"name": cookie.name, "value": cookie.value,
+                                "domain": cookie.domain, "path": cookie.path})
+                if cookie.name == "cf_clearance":
+                    expires.append(cookie.expires or time.time() + self.default_ttl)
+        if not expires:
+            return False
+        with self.lock:
+            self.entries[key] = {
+                "user_agent": user_agent,
+                "expires": min(expires),
+                "cookies": cookies,
+            }
+        return True
+
+    def invalidate(self, session, key, host):
+        with self.lock:
+            self.entries.pop(key, None)
+        for cookie in list(session.cookies):
+            domain = cookie.domain.lstrip(".")
+            if cookie.name in CLEARANCE_COOKIES and (host == domain or host.endswith("." + domain)):
+                session.cookies.clear(cookie.domain, cookie.path, cookie.name)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.file_path) or ".", exist_ok=True)
+        with self.lock:
+            now = time.time()
+            entries = {k: v for k, v in self.entries.items() if v["expires"] > now}
+            tmp_path = self.file_path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entries, f, indent=1)
+            os.replace(tmp_path, self.file_path)
+
+def is_challenge(response):
+    """True if Cloudflare answered with a challenge instead of the content."""
+    if response.status_code not in (403, 429, 503):
+        return False
+    if response.headers.get("cf-mitigated") == "challenge":
+        return True
+    return "cloudflare" in response.headers.get("Server", "").lower() and (
+        b"challenge-platform" in response.content or b"cf_chl_" in response.content)
+
+def _clearance_value(session, host):
+    for cookie in session.cookies:
+        domain = cookie.domain.lstrip(".")
+        if cookie.name == "cf_clearance" and (host == domain or host.endswith("." + domain)):
+            return cookie.value
+    return None
+
+def get_with_clearance(session, url, cache, stats, proxy=None, **kwargs):
+    """GET url reusing a cached clearance; re-solve only if the cached one is rejected. Safe to call from
+    several threads on one session."""
+    key = cache.key(url, proxy)
+    host = urlparse(url).hostname or ""
+    with cache.host_lock(host):
+        user_agent = cache.apply(session, key)
+        reused = user_agent is not None
+        if user_agent:
+            kwargs["headers"] = dict(kwargs.get("headers") or {}, **{"User-Agent": user_agent})
+        else:
+            user_agent = (kwargs.get("headers") or {}).get("User-Agent") or session.headers.get("User-Agent", "")
+        before = _clearance_value(session, host)
+
+        start = time.monotonic()
+        response = session.get(url, **kwargs)
+        if reused and is_challenge(response):
+            # Сохранённый допуск больше не принимается - решаем проверку заново
+            stats.add(rejected=1)
+            cache.invalidate(session, key, host)
+            reused = False
+            before = None
+            start = time.monotonic()
+            response = session.get(url, **kwargs)
+        elapsed = time.monotonic() - start
+
+        if reused:
+            stats.add(reused=1)
+        after = _clearance_value(session, host)
+        if after is not None and after != before and cache.store(session, key, host, user_agent):
+            stats.add(solved=1, solve_seconds=elapsed)
+    return response
@@ -0,0 +1,151 @@
+import os
+import re
+import glob
+import threading
+
+from PySide6.QtCore import Signal
+from PySide6.QtWebEngineCore import QWebEngineUrlRequestInterceptor, QWebEngineUrlRequestInfo
+
+from matcher import DomainTrie, AhoCorasick
+
+FILTERS_DIR = "data/filters"
+
+HOSTS_LINE = re.compile(r'^(?:0\.0\.0\.0|127\.0\.0\.1|::1?)\s+([^\s#]+)')
+DOMAIN_LINE = re.compile(r'^[a-z0-9-]+(?:\.[a-z0-9-]+)+$')
+# Опции, которые не сужают правило; с любыми другими ($script, third-party, domain=...) правило пропускается
+IGNORED_OPTIONS = {"important"}
+
+class FilterEngine:
+    """Block list compiled from hosts files and EasyList-style rules.
+
+    Supported rule forms:
+        0.0.0.0 ads.example.com     - hosts file entry (domain and subdomains)
+        ads.example.com             - bare domain
+        ||ads.example.com^          - EasyList domain anchor
+        @@||cdn.example.com^        - exception (never blocked)
+        /adserver/banner.           - substring of the request URL
+    Cosmetic (##), regex and wildcard rules are skipped, as are rules with
+    $options other than $important: applied to every request, a rule limited
+    to scripts or third-party requests would block far more than intended.
+    """
+
+    def __init__(self):
+        self.blocked_domains = DomainTrie()
+        self.allowed_domains = DomainTrie()
+        self.url_patterns = AhoCorasick()
+        self.rule_count = 0
+
+    @classmethod
+    def from_directory(cls, filters_dir=FILTERS_DIR):
+        """Load every *.txt rule list in data/filters/."""
+        engine = cls()
+        for path in sorted(glob.glob(os.path.join(filters_dir, "*.txt"))):
+            try:
+                with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                    engine.load_rules(f)
+            except OSError as e:
+                print(f"Error loading filter list {path}: {e}")
+        engine.url_patterns.build()
+        return engine
+
+    def load_rules(self, lines):
+        for line in lines:
+            line = line.strip()
+            if not line or line[0] in "!#[":
+                continue
+            if "##" in line or "#@#" in line or "#?#" in line:
+                continue
+            if self.add_rule(line):
+                self.rule_count += 1
+
+    def add_rule(self, line):
+        """Add one rule; returns False if the rule form is not supported."""
+        match = HOSTS_LINE.match(line)
+        if match:
+            host = match.group(1).lower()
+            if host in ("localhost", "0.0.0.0", "broadcasthost"):
+                return False
+            self.blocked_domains.add(host)
+            return True
+
+        exception = line.startswith("@@")
+        if exception:
+            line = line[2:]
+        line, sep, options = line.rpartition("$") if "$" in line else (line, "", "")
+        if sep and any(option.strip().lower() not in IGNORED_OPTIONS for option in options.split(",")):
+            return False
+        if not line or (len(line) > 2 and line.startswith("/") and line.endswith("/")):
+            return False  # regex rule
+
+        if line.startswith("||"):
+            body = line[2:].rstrip("^|")
+            domain, sep, rest = body.partition("^")
+            if not rest and "/" not in domain and "*" not in domain and DOMAIN_LINE.match(domain.lower()):
+                (self.allowed_domains if exception else self.blocked_domains).add(domain)
+                return True
+            line = body
+
+        if exception:
+            return False
+        if DOMAIN_LINE.match(line.lower()):
+            self.blocked_domains.add(line)
+            return True
+        pattern = line.strip("|").replace("^", "")
+        if "*" in pattern or len(pattern) < 4:
+            return False
+        self.url_patterns.add(pattern.lower())
+        return True
+
+    def should_block(self, url, host):
+        host = host.lower()
+        if host in self.allowed_domains:
+            return False
+        if host in self.blocked_domains:
+            return True
+        return self.url_patterns.search(url.lower()) is not None
+
+    def __len__(self):
+        return self.rule_count
+
+class TabRequestFilter(QWebEngineUrlRequestInterceptor):
+    """Per-page interceptor that applies a shared FilterEngine and counts blocked requests.
+
+    interceptRequest runs on the network thread. blocked_changed is emitted
+    once until the count is read with take_count(), not once per request.
+    """
+
+    blocked_changed = Signal(int)
+
+    def __init__(self, engine, parent=None):
+        super().__init__(parent)
+        self.engine = engine
+        self.lock = threading.Lock()
+        self.blocked = 0
+        self.notified = False
+
+    def reset(self):
+        with self.lock:
+            self.blocked = 0
+            self.notified = True
+        self.blocked_changed.emit(0)
+
+    def take_count(self):
+        """Blocked requests so far; the next block emits blocked_changed again."""
+        with self.lock:
+            self.notified = False
+            return self.blocked
+
+    def interceptRequest(self, info):
+        # Навигацию, запрошенную пользователем, не блокируем
+        if info.resourceType() == QWebEngineUrlRequestInfo.ResourceType.ResourceTypeMainFrame:
+            return
+        url = info.requestUrl()
+        if self.engine.should_block(url.toString(), url.host()):
+            info.block(True)
+            with self.lock:
+                self.blocked += 1
+                blocked = self.blocked
+                notify = not self.notified
+                self.notified = True
+            if notify:
+                self.blocked_changed.emit(blocked)
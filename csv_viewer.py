@@ -1,18 +1,101 @@
 import sys
 import csv
 import os
+import html
+import threading
 from PySide6.QtWidgets import (
-    QWidget, QVBoxLayout, QTableWidget, QTableWidgetItem,
-    QHeaderView, QLabel, QHBoxLayout, QPushButton, QMenu
+    QWidget, QVBoxLayout, QTableView,
+    QHeaderView, QLabel, QHBoxLayout, QPushButton, QMenu, QSplitter, QTextBrowser
 )
-from PySide6.QtCore import Qt, QUrl
-from PySide6.QtGui import QDesktopServices
+from PySide6.QtCore import Qt, QUrl, Signal, QAbstractTableModel
+from PySide6.QtGui import QDesktopServices, QColor
+from feed_items import FeedBatch, FIELDS
+from enrich import item_id
+from sort_index import SortIndex, SORT_COLUMNS
+from profiling import profiled
+
+class CSVTableModel(QAbstractTableModel):
+    """Cells of a feed FeedBatch read through a sort permutation, or plain rows of any other CSV.
+
+    Only the visible cells are ever formatted, so a re-sort is a new order
+    and a layoutChanged, whatever the number of rows.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.headers = []
+        self.batch = None  # FeedBatch файла фида
+        self.rows = []     # строки прочих CSV
+        self.order = None  # строка таблицы -> строка batch, None - порядок файла
+        self.descending = False
+
+    def set_data(self, headers, batch=None, rows=()):
+        self.beginResetModel()
+        self.headers = list(headers)
+        self.batch = batch
+        self.rows = rows
+        self.order = None
+        self.descending = False
+        self.endResetModel()
+
+    def set_order(self, order, descending):
+        self.layoutAboutToBeChanged.emit()
+        self.order = order
+        self.descending = descending
+        self.layoutChanged.emit()
+
+    def batch_row(self, row):
+        """Row of self.batch shown in table row."""
+        if self.order is None:
+            return row
+        return self.order[len(self.order) - 1 - row] if self.descending else self.order[row]
+
+    def rowCount(self, parent=None):
+        return len(self.batch) if self.batch is not None else len(self.rows)
+
+    def columnCount(self, parent=None):
+        return len(self.headers)
+
+    def cell(self, row, column):
+        if self.batch is not None:
+            cells = self.batch.row(self.batch_row(row))
+        else:
+            cells = self.rows[row]
+        # Simple "beautify": strip quotes
+        return cells[column].strip('"') if column < len(cells) else ""
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.DisplayRole:
+            return self.cell(index.row(), index.column())
+        if role == Qt.ForegroundRole:
+            # If it looks like a link, make it blue
+            if self.cell(index.row(), index.column()).startswith("http"):
+                return QColor(Qt.blue)
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.headers[section] if section < len(self.headers) else None
+        return str(section + 1)
 
 class CSVViewerTab(QWidget):
+    # Индекс сортировки построен в фоновом потоке: (колонка, перестановка)
+    sort_ready = Signal(str, object)
+
     def __init__(self, file_path, main_window):
         super().__init__()
         self.file_path = file_path
         self.main_window = main_window
+        self.batch = None  # FeedBatch открытого файла фида
+        self.sort_column = None
+        self.sort_descending = False
+        self.closing = False  # вкладка закрыта, фоновая сортировка не должна слать сигнал
+        self.sort_thread = None
+        self.sort_ready.connect(self.apply_sort)
         self.layout = QVBoxLayout(self)
         
         # Header info
@@ -29,10 +112,12 @@ class CSVViewerTab(QWidget):
         self.layout.addLayout(header_layout)
         
         # Table
-        self.table = QTableWidget()
+        self.model = CSVTableModel()
+        self.table = QTableView()
+        self.table.setModel(self.model)
         self.table.setAlternatingRowColors(True)
         self.table.setStyleSheet("""
-            QTableWidget {
+            QTableView {
                 gridline-color: #d3d3d3;
                 font-size: 12px;
             }
@@ -45,7 +130,23 @@ class CSVViewerTab(QWidget):
             }
         """)
         self.table.verticalHeader().setVisible(True)
-        self.layout.addWidget(self.table)
+
+        # Полное HTML-описание строки, открывается двойным щелчком
+        self.details = QTextBrowser()
+        self.details.setOpenLinks(False)
+        self.details.anchorClicked.connect(self.open_details_link)
+        self.details.hide()
+        self.details_row = None
+
+        splitter = QSplitter(Qt.Vertical)
+        splitter.addWidget(self.table)
+        splitter.addWidget(self.details)
+        splitter.setStretchFactor(0, 3)
+        splitter.setStretchFactor(1, 1)
+        self.layout.addWidget(splitter)
+        self.table.doubleClicked.connect(lambda index: self.toggle_details(index.row(), index.column()))
+        self.table.selectionModel().currentRowChanged.connect(self.on_current_row_changed)
+        self.table.horizontalHeader().sectionClicked.connect(self.on_header_clicked)
         
         # Context menu for links
         self.table.setContextMenuPolicy(Qt.CustomContextMenu)
@@ -53,58 +154,183 @@ class CSVViewerTab(QWidget):
 
         self.load_csv()
 
+    @property
+    def order(self):
+        return self.model.order
+
+    def closeEvent(self, event):
+        self.closing = True
+        super().closeEvent(event)
+
+    def selected_links(self):
+        rows = sorted({index.row() for index in self.table.selectionModel().selectedIndexes()})
+        links = (self.batch.links[self.batch_row(row)] if self.batch is not None else self.cell_text(row, "link") for row in rows)
+        return [link for link in links if link.startswith("http")]
+
     def show_context_menu(self, pos):
-        item = self.table.itemAt(pos)
-        if item and item.text().startswith("http"):
-            menu = QMenu(self)
+        index = self.table.indexAt(pos)
+        text = index.data() if index.isValid() else ""
+        url = text if text and text.startswith("http") else None
+        selected = self.selected_links()
+        if url is None and len(selected) < 2:
+            return
+        menu = QMenu(self)
+        open_action = live_action = open_all_action = None
+        if url is not None:
             open_action = menu.addAction("Open Link")
-            action = menu.exec(self.table.viewport().mapToGlobal(pos))
-            if action == open_action:
-                # Open in a new tab within the application
-                self.main_window.add_new_tab(QUrl(item.text()), "Loading...")
+            if url in self.main_window.reader_cache:
+                live_action = menu.addAction("Open Live Page")
+        if len(selected) > 1:
+            # Вкладки открываются в фоне и загружаются через очередь
+            open_all_action = menu.addAction(f"Open Selected ({len(selected)})")
+        action = menu.exec(self.table.viewport().mapToGlobal(pos))
+        if action is None:
+            return
+        if action == open_action:
+            # Cached reader view opens instantly and offline, otherwise load the page
+            if not self.main_window.add_reader_tab(url):
+                self.main_window.add_new_tab(QUrl(url), "Loading...")
+        elif action == live_action:
+            self.main_window.add_new_tab(QUrl(url), "Loading...")
+        elif action == open_all_action:
+            self.main_window.open_links(selected)
+
+    def column_index(self, name):
+        for i, header in enumerate(self.model.headers):
+            if header.lower() == name:
+                return i
+        return -1
+
+    def cell_text(self, row, name):
+        column = self.column_index(name)
+        return self.model.cell(row, column) if column >= 0 and row < self.model.rowCount() else ""
+
+    def toggle_details(self, row, column):
+        if self.details.isVisible() and row == self.details_row:
+            self.details.hide()
+            self.details_row = None
+        else:
+            self.show_details(row)
+
+    def on_current_row_changed(self, current, previous):
+        row = current.row()
+        if self.details.isVisible() and row >= 0 and row != self.details_row:
+            self.show_details(row)
+
+    def show_details(self, row):
+        """Load the full description of a row from the HTML store; the inline text if it is not there."""
+        link = self.batch.links[self.batch_row(row)] if self.batch is not None else self.cell_text(row, "link")
+        store = getattr(self.main_window, "html_store", None)
+        body = store.get(item_id(link)) if store is not None and link else None
+        if body is None:
+            # Старые файлы хранят HTML прямо в колонке description
+            description = self.cell_text(row, "description")
+            body = description if "<" in description else html.escape(description)
+        title = html.escape(self.cell_text(row, "title"))
+        self.details.setHtml(f"<h3>{title}</h3><p><a href=\"{html.escape(link)}\">{html.escape(link)}</a></p>{body}")
+        self.details_row = row
+        self.details.show()
+
+    def open_details_link(self, url):
+        if url.scheme().startswith("http"):
+            self.main_window.add_new_tab(url, "Loading...")
+
+    def batch_row(self, row):
+        """Row of self.batch shown in table row."""
+        return self.model.batch_row(row)
+
+    def on_header_clicked(self, column):
+        name = self.model.headers[column]
+        if self.batch is None or name not in SORT_COLUMNS:
+            return
+        self.sort_descending = not self.sort_descending if name == self.sort_column else False
+        self.sort_column = name
+        self.request_sort()
+
+    def request_sort(self):
+        """Sort by self.sort_column using the saved permutation, building it in the background if stale."""
+        sort_index = getattr(self.main_window, "sort_index", None) or SortIndex()
+        column = self.sort_column
+        order = sort_index.load(self.file_path, column)
+        if order is not None:
+            self.apply_sort(column, order)
+            return
+        self.title_label.setText(f"<b>Viewing:</b> {os.path.basename(self.file_path)} - sorting by {column}...")
+        file_path = self.file_path
+        # Большой файл сортируется внешней сортировкой с диска, без второй копии ключей в памяти
+        batch = self.batch if os.path.getsize(file_path) <= sort_index.memory_bytes else None
+
+        def build():
+            try:
+                order = sort_index.build(file_path, column, batch)
+            except Exception as e:
+                print(f"Error building sort index for {file_path}: {e}")
+                order = None
+            if self.closing:
+                return
+            try:
+                self.sort_ready.emit(column, order)
+            except RuntimeError:
+                pass  # вкладку уже удалили
+        self.sort_thread = threading.Thread(target=build, daemon=True)
+        self.sort_thread.start()
 
+    def apply_sort(self, column, order):
+        self.title_label.setText(f"<b>Viewing:</b> {os.path.basename(self.file_path)}")
+        if column != self.sort_column or self.batch is None:
+            return  # пока строился индекс, пользователь выбрал другую колонку
+        if order is None or len(order) != len(self.batch):
+            return
+        self.details.hide()
+        self.details_row = None
+        # Выделение держит номера строк, после перестановки они указывали бы на другие элементы
+        self.table.clearSelection()
+        self.model.set_order(order, self.sort_descending)
+        header = self.table.horizontalHeader()
+        header.setSortIndicatorShown(True)
+        header.setSortIndicator(FIELDS.index(column), Qt.DescendingOrder if self.sort_descending else Qt.AscendingOrder)
+
+    @profiled()
     def load_csv(self):
         if not os.path.exists(self.file_path):
             self.title_label.setText(f"<font color='red'>File not found: {self.file_path}</font>")
             return
 
+        self.details.hide()
+        self.details_row = None
+        self.table.horizontalHeader().setSortIndicatorShown(False)
         try:
             with open(self.file_path, mode='r', newline='', encoding='utf-8') as f:
                 # Use tab as the explicit delimiter
-                reader = csv.reader(f, delimiter='\t')
-                data = list(reader)
+                header = next(csv.reader(f, delimiter='\t'), None)
 
-            if not data:
-                self.table.setRowCount(0)
-                self.table.setColumnCount(0)
+            if not header:
+                self.batch = None
+                self.model.set_data([])
                 return
 
-            headers = data[0]
-            rows = data[1:]
-
-            self.table.setColumnCount(len(headers))
-            self.table.setHorizontalHeaderLabels(headers)
-            self.table.setRowCount(len(rows))
-
-            for row_idx, row_data in enumerate(rows):
-                for col_idx, cell_data in enumerate(row_data):
-                    # Simple "beautify": strip quotes and handle long text
-                    clean_data = cell_data.strip('"')
-                    item = QTableWidgetItem(clean_data)
-                    
-                    # If it looks like a link, make it blue
-                    if clean_data.startswith("http"):
-                        item.setForeground(Qt.blue)
-                    
-                    self.table.setItem(row_idx, col_idx, item)
+            if "title" in header and "link" in header and "pub_date" in header:
+                # Файл фида - колонками, без списка строк на каждый элемент
+                self.batch = FeedBatch.read_tsv(self.file_path)
+                headers = FIELDS
+                self.model.set_data(headers, batch=self.batch)
+            else:
+                self.batch = None
+                with open(self.file_path, mode='r', newline='', encoding='utf-8') as f:
+                    data = list(csv.reader(f, delimiter='\t'))
+                headers = data[0]
+                self.model.set_data(headers, rows=data[1:])
+
+            # pub_ts нужен для сортировки и ленты, в таблице хватает pub_date
+            for i, name in enumerate(headers):
+                self.table.setColumnHidden(i, name == "pub_ts")
 
             self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
             self.table.horizontalHeader().setStretchLastSection(True)
             self.table.resizeColumnsToContents()
             
             # Limit column width for very long descriptions
-            for i in range(self.table.columnCount()):
-                header_text = self.table.horizontalHeaderItem(i).text().lower()
+            for i, header_text in enumerate(h.lower() for h in headers):
                 if "title" in header_text:
                     if self.table.columnWidth(i) > 700:
                         self.table.setColumnWidth(i, 700)
@@ -113,5 +339,9 @@ class CSVViewerTab(QWidget):
                 if "link" in header_text:
                     if self.table.columnWidth(i) > 40:
                         self.table.setColumnWidth(i, 40)
+
+            if self.batch is not None and self.sort_column is not None:
+                # После Refresh сортировка сохраняется; индекс перестроится, если файл изменился
+                self.request_sort()
         except Exception as e:
             self.title_label.setText(f"<font color='red'>Error loading CSV: {str(e)}</font>")
@@ -0,0 +1,214 @@
+import os
+import re
+import csv
+import time
+import hashlib
+import random
+from urllib.parse import urlsplit, urlunsplit, unquote
+
+STORY_INDEX_FILE = "data/story_index.tsv"
+
+# Параметры, которые только отслеживают переход и никогда не меняют содержимое страницы
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "yclid", "msclkid", "mc_cid", "mc_eid", "igshid", "_openstat",
+    "ref_src", "ref_url", "cmpid", "at_medium", "at_campaign",
+}
+TRACKING_PREFIXES = ("utm_", "pk_")
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+def canonicalize_url(url):
+    """Canonical form of a link for deduplication: lower-case scheme and host, no default port,
+    password, tracking parameters or in-page fragment. The query is otherwise kept byte for byte."""
+    url = url.strip()
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return url
+    if not parts.scheme or not parts.netloc:
+        return url
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").rstrip(".")
+    netloc = host
+    if port and not (scheme == "http" and port == 80) and not (scheme == "https" and port == 443):
+        netloc = f"{host}:{port}"
+    if parts.username:
+        netloc = f"{parts.username}@{netloc}"
+    query = "&".join(segment for segment in parts.query.split("&")
+                     if segment and not _is_tracking(segment.split("=", 1)[0]))
+    # "#!/..." и "#/..." - маршрут одностраничного сайта, а не якорь на странице
+    fragment = parts.fragment if parts.fragment.startswith(("!", "/")) else ""
+    return urlunsplit((scheme, netloc, parts.path or "/", query, fragment))
+
+def _is_tracking(name):
+    name = unquote(name).lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+def link_key(url):
+    """Dedup key of a link: its canonical form, the same story over http/https and with/without www."""
+    try:
+        parts = urlsplit(canonicalize_url(url))
+    except ValueError:
+        return url.strip()
+    host = parts.netloc[4:] if parts.netloc.startswith("www.") else parts.netloc
+    path = parts.path.rstrip("/") or "/"
+    key = f"{host}{path}?{parts.query}" if parts.query else f"{host}{path}"
+    return f"{key}#{parts.fragment}" if parts.fragment else key
+
+def item_id(url):
+    """Stable id of a feed item, derived from its link key."""
+    return hashlib.blake2b(link_key(url).encode('utf-8'), digest_size=8).hexdigest()
+
+def _hash64(token):
+    return int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'big')
+
+MINHASH_PRIME = (1 << 61) - 1
+MINHASH_SIZE = 32
+LSH_BANDS = 8          # 8 полос по 4 значения: кандидат при сходстве ~0.6 и выше
+_rng = random.Random(20260209)
+MINHASH_PARAMS = [(_rng.randrange(1, MINHASH_PRIME), _rng.randrange(MINHASH_PRIME)) for _ in range(MINHASH_SIZE)]
+
+def title_tokens(text):
+    """Normalised set of title words."""
+    return set(WORD_RE.findall(text.lower().replace("ё", "е")))
+
+def minhash(tokens):
+    """MinHash signature of a token set."""
+    hashes = [_hash64(token) for token in tokens]
+    return [min((a * h + b) % MINHASH_PRIME for h in hashes) for a, b in MINHASH_PARAMS]
+
+def lsh_bands(signature):
+    """Hash each band of the signature into one bucket key."""
+    rows = MINHASH_SIZE // LSH_BANDS
+    return [f"{_hash64(str(signature[i:i + rows])) & 0xFFFFFFFF:08x}" for i in range(0, MINHASH_SIZE, rows)]
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+class StoryIndex:
+    """Cross-feed index of stories seen recently, used to drop duplicates at ingest.
+
+    Each entry is a row of data/story_index.tsv:
+        key  link  feed  cluster  first_seen  bands  words
+    where cluster is the link of the first item of the story. Near-duplicate
+    titles are found through MinHash LSH buckets (bands) and confirmed by the
+    Jaccard similarity of the stored title words.
+    """
+
+    FIELDS = ["key", "link", "feed", "cluster", "first_seen", "bands", "words"]
+    MIN_SIMILARITY = 0.7
+    MIN_WORDS = 4  # короче - сравниваем только по ссылке
+
+    def __init__(self, file_path=STORY_INDEX_FILE, max_age_days=14):
+        self.file_path = file_path
+        self.max_age = max_age_days * 86400
+        self.by_key = {}
+        self.buckets = {}
+        self.loaded_rows = 0
+        self.load()
+
+    def load(self):
+        if not os.path.isfile(self.file_path):
+            return
+        cutoff = time.time() - self.max_age
+        with open(self.file_path, 'r', newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f, delimiter='\t'):
+                self.loaded_rows += 1
+                try:
+                    if float(row['first_seen']) < cutoff:
+                        continue
+                except (KeyError, ValueError, TypeError):
+                    continue
+                self._insert(row)
+        # Старые записи вытесняются перезаписью файла
+        if self.loaded_rows > 2 * len(self.by_key) + 1000:
+            self.compact()
+
+    def _insert(self, row):
+        self.by_key[row['key']] = row
+        row['_words'] = set((row.get('words') or '').split())
+        for band in filter(None, (row.get('bands') or '').split(',')):
+            self.buckets.setdefault(band, []).append(row)
+
+    def find(self, key, words, bands):
+        """Return the index row for a story with the same key or a near-duplicate title."""
+        row = self.by_key.get(key)
+        if row is not None:
+            return row
+        seen = set()
+        for band in bands:
+            for row in self.buckets.get(band, ()):
+                if id(row) not in seen:
+                    seen.add(id(row))
+                    if jaccard(words, row['_words']) >= self.MIN_SIMILARITY:
+                        return row
+        return None
+
+    def match(self, title, link, feed):
+        """(cluster link of an earlier story the item duplicates or None, index row to add for it or None).
+
+        Changes nothing: the row is only registered by hold() or commit().
+        """
+        key = link_key(link)
+        words = title_tokens(title)
+        bands = lsh_bands(minhash(words)) if len(words) >= self.MIN_WORDS else []
+        existing = self.find(key, words, bands)
+        cluster = existing['cluster'] if existing is not None else link
+        row = None
+        if existing is None or existing['key'] != key:
+            row = {"key": key, "link": link, "feed": feed, "cluster": cluster,
+                   "first_seen": f"{time.time():.0f}", "bands": ",".join(bands), "words": " ".join(sorted(words))}
+        return (cluster if existing is not None else None), row
+
+    def hold(self, row):
+        """Make a row from match() visible to find() in memory only, until commit() or release()."""
+        self._insert(row)
+
+    def commit(self, rows):
+        """Register held rows for good: in memory and in data/story_index.tsv."""
+        for row in rows:
+            if self.by_key.get(row['key']) is not row:
+                self._insert(row)
+        if rows:
+            self._append(*rows)
+
+    def release(self, rows):
+        """Forget held rows that were not stored after all (the write failed)."""
+        for row in rows:
+            if self.by_key.get(row['key']) is row:
+                del self.by_key[row['key']]
+            for band in filter(None, row['bands'].split(',')):
+                bucket = self.buckets.get(band, [])
+                if row in bucket:
+                    bucket.remove(row)
+
+    def add(self, title, link, feed):
+        """Register an item. Returns the cluster link of an earlier story it duplicates, or None."""
+        cluster, row = self.match(title, link, feed)
+        if row is not None:
+            self.commit([row])
+        return cluster
+
+    def _append(self, *rows):
+        file_exists = os.path.exists(self.file_path)
+        os.makedirs(os.path.dirname(self.file_path) or ".", exist_ok=True)
+        with open(self.file_path, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=self.FIELDS, delimiter='\t', extrasaction='ignore')
+            if not file_exists:
+                writer.writeheader()
+            writer.writerows(rows)
+
+    def compact(self):
+        tmp_path = self.file_path + ".tmp"
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=self.FIELDS, delimiter='\t', extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(self.by_key.values())
+        os.replace(tmp_path, self.file_path)
+        self.loaded_rows = len(self.by_key)
+
+    def cluster_members(self, cluster):
+        """All indexed links that belong to the story cluster."""
+        return [row for row in self.by_key.values() if row['cluster'] == cluster]
@@ -0,0 +1,402 @@
+# Export collected feed items (data/global_feeds) and saved history notes
+# (data/history) as a training corpus: normalised text, deduplicated by content
+# hash, in compressed shards with a manifest. An interrupted export resumes
+# from the last finished shard.
+#
+#   python export_dataset.py                          - into data/export/corpus
+#   python export_dataset.py --out /mnt/corpus --workers 8 --shard-mb 512
+#   python export_dataset.py --format arrow           - Arrow IPC shards (needs pyarrow)
+#   python export_dataset.py --restart                - start over, dropping the previous export
+
+import os
+import re
+import sys
+import glob
+import gzip
+import json
+import time
+import shutil
+import sqlite3
+import hashlib
+import argparse
+import unicodedata
+import multiprocessing
+from collections import deque
+from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor
+
+from feed_items import FeedBatch
+from enrich import item_id
+from html_store import HtmlStore, HTML_STORE_DIR, SUMMARY_CHARS, html_text
+from timeline import feed_name
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:
+    pyarrow = None
+
+EXPORT_DIR = "data/export/corpus"
+FORMATS = {"jsonl": ".jsonl.gz", "arrow": ".arrow"}
+RECORD_FIELDS = ["id", "source", "collection", "title", "url", "date", "text"]
+# Записей в одном record batch Arrow: столько держится в памяти, а не весь шард
+ARROW_BATCH_ROWS = 4096
+
+# Управляющие символы, кроме перевода строки и табуляции
+CONTROL_RE = re.compile(r'[\x00-\x08\x0B-\x1F\x7F-\x9F\u200B\u2028\u2029\uFEFF]')
+BLANK_LINES_RE = re.compile(r'\n{3,}')
+
+def normalize_text(text):
+    """NFKC text without control characters, runs of spaces or more than one blank line in a row."""
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    # Проверки дешевле самих преобразований, а текст фидов обычно уже в порядке
+    if not unicodedata.is_normalized("NFKC", text):
+        text = unicodedata.normalize("NFKC", text)
+    if CONTROL_RE.search(text):
+        text = CONTROL_RE.sub("", text)
+    if "\n" not in text:
+        return " ".join(text.split())
+    text = "\n".join(" ".join(line.split()) for line in text.split("\n"))
+    return BLANK_LINES_RE.sub("\n\n", text).strip()
+
+def content_hash(text):
+    """Dedup key: the normalised text without case, so a re-capitalised copy is a duplicate too."""
+    return hashlib.blake2b(text.casefold().encode('utf-8'), digest_size=16).digest()
+
+def list_sources(data_dir, include_open=False):
+    """(kind, path) of every file to export: sealed feed segments, open ones if asked, history notes."""
+    patterns = [("feed", os.path.join(data_dir, "global_feeds", "*.csv"))]
+    if include_open:
+        patterns.append(("feed", os.path.join(data_dir, "feeds", "*.csv")))
+    patterns.append(("history", os.path.join(data_dir, "history", "**", "*.txt")))
+    sources = []
+    for kind, pattern in patterns:
+        sources.extend((kind, path) for path in sorted(glob.glob(pattern, recursive=True)))
+    return sources
+
+# ---- Workers: read, normalise and hash one file ----
+
+_html_store = None
+
+def _init_worker(html_store_dir):
+    global _html_store
+    _html_store = HtmlStore(html_store_dir) if os.path.isdir(html_store_dir) else None
+
+def _iso_date(ts):
+    try:
+        return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ") if ts else None
+    except (OverflowError, OSError, ValueError):
+        return None
+
+def _record(source, collection, title, url, ts, text):
+    key = content_hash(text)
+    record = {"id": key.hex(), "source": source, "collection": collection, "title": title, "url": url,
+              "date": _iso_date(ts), "text": text}
+    return key, json.dumps(record, ensure_ascii=False)
+
+def export_feed_file(path, min_chars):
+    """Records of one feed TSV; the full description comes from the HTML store when it was moved there."""
+    batch = FeedBatch.read_tsv(path)
+    collection = feed_name(path)
+    stored = {}
+    if _html_store is not None:
+        # Описание, ушедшее в хранилище, заменено текстовой выжимкой не длиннее SUMMARY_CHARS + "…"
+        ids = {i: item_id(batch.links[i]) for i in range(len(batch)) if batch.links[i]
+               and len(batch.descriptions[i]) <= SUMMARY_CHARS + 1 and "<" not in batch.descriptions[i]}
+        found = _html_store.get_many(ids.values())
+        stored = {i: found[key] for i, key in ids.items() if key in found}
+    records = []
+    for i in range(len(batch)):
+        link = batch.links[i]
+        description = stored.get(i, batch.descriptions[i])
+        title = normalize_text(html_text(batch.titles[i]))
+        body = normalize_text(html_text(description))
+        text = f"{title}\n\n{body}" if title and body and not body.startswith(title) else (body or title)
+        if len(text) >= min_chars:
+            records.append(_record("feed", collection, title, link, batch.pub_ts[i], text))
+    return len(batch), records
+
+def export_history_file(path, min_chars, history_dir):
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        text = normalize_text(f.read())
+    if len(text) < min_chars:
+        return 1, []
+    folder = os.path.relpath(os.path.dirname(path), history_dir)
+    title = os.path.splitext(os.path.basename(path))[0]
+    return 1, [_record("history", "" if folder == "." else folder, title, "", int(os.path.getmtime(path)), text)]
+
+def export_file(kind, path, min_chars, history_dir):
+    """(rows read, [(content hash, JSON line)]) of one source file; runs in the worker pool."""
+    try:
+        if kind == "feed":
+            return export_feed_file(path, min_chars)
+        return export_history_file(path, min_chars, history_dir)
+    except Exception as e:
+        print(f"Error exporting {path}: {e}")
+        return 0, []
+
+# ---- Output ----
+
+class ShardWriter:
+    """One output shard, written to <name>.tmp and renamed into place when closed.
+
+    Arrow shards are written as a record batch every ARROW_BATCH_ROWS records,
+    so memory does not grow with the shard size.
+    """
+
+    def __init__(self, out_dir, number, fmt):
+        self.fmt = fmt
+        self.name = f"shard-{number:05d}{FORMATS[fmt]}"
+        self.path = os.path.join(out_dir, self.name)
+        self.tmp_path = self.path + ".tmp"
+        self.records = 0
+        self.bytes = 0  # до сжатия
+        if fmt == "arrow":
+            self.rows = []
+            self.schema = pyarrow.schema([(name, pyarrow.string()) for name in RECORD_FIELDS])
+            self.sink = pyarrow.OSFile(self.tmp_path, 'wb')
+            self.writer = pyarrow.ipc.new_file(self.sink, self.schema)
+        else:
+            self.file = gzip.open(self.tmp_path, 'wt', encoding='utf-8', compresslevel=6)
+
+    def _write_batch(self):
+        if self.rows:
+            self.writer.write_batch(pyarrow.RecordBatch.from_pylist(self.rows, schema=self.schema))
+            self.rows = []
+
+    def write(self, line):
+        if self.fmt == "arrow":
+            self.rows.append(json.loads(line))
+            if len(self.rows) >= ARROW_BATCH_ROWS:
+                self._write_batch()
+        else:
+            self.file.write(line)
+            self.file.write("\n")
+        self.records += 1
+        self.bytes += len(line) + 1
+
+    def close(self):
+        if self.fmt == "arrow":
+            self._write_batch()
+            self.writer.close()
+            self.sink.close()
+        else:
+            self.file.close()
+        os.replace(self.tmp_path, self.path)
+        return {"file": self.name, "records": self.records, "bytes": os.path.getsize(self.path),
+                "text_bytes": self.bytes}
+
+    def discard(self):
+        if self.fmt == "arrow":
+            self.rows = []
+            self.writer.close()
+            self.sink.close()
+        else:
+            self.file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+class ExportState:
+    """Progress of an export in <out>/state.sqlite: seen content hashes, finished files and shards.
+
+    A shard, the hashes of its records and the files finished with it are
+    committed in one transaction after the shard file is in place, so a crash
+    loses at most the open shard; files not committed yet are exported again
+    and their records already in committed shards drop out as duplicates.
+    """
+
+    def __init__(self, out_dir):
+        self.db = sqlite3.connect(os.path.join(out_dir, "state.sqlite"))
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS hashes (hash BLOB PRIMARY KEY) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, kind TEXT, size INTEGER, mtime INTEGER,
+                                              rows INTEGER, records INTEGER);
+            CREATE TABLE IF NOT EXISTS shards (number INTEGER PRIMARY KEY, file TEXT, records INTEGER,
+                                               bytes INTEGER, text_bytes INTEGER);
+        """)
+        self.db.commit()
+        self.done = {path: (size, mtime) for path, size, mtime in self.db.execute("SELECT path, size, mtime FROM files")}
+
+    def check_config(self, config):
+        """False if the export was started with different options (its shards would not match)."""
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'config'").fetchone()
+        if row is None:
+            self.db.execute("INSERT INTO meta VALUES ('config', ?)", (json.dumps(config, sort_keys=True),))
+            self.db.commit()
+            return True
+        return json.loads(row[0]) == config
+
+    def is_done(self, path):
+        stat = os.stat(path)
+        return self.done.get(path) == (stat.st_size, int(stat.st_mtime))
+
+    def add_hash(self, key):
+        """True if the content was not seen before; becomes permanent with the next commit."""
+        return self.db.execute("INSERT OR IGNORE INTO hashes VALUES (?)", (key,)).rowcount == 1
+
+    def next_shard(self):
+        return self.db.execute("SELECT COALESCE(MAX(number) + 1, 0) FROM shards").fetchone()[0]
+
+    def commit(self, number, shard, files):
+        if shard is not None:
+            self.db.execute("INSERT INTO shards VALUES (?, ?, ?, ?, ?)",
+                            (number, shard["file"], shard["records"], shard["bytes"], shard["text_bytes"]))
+        self.db.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)", files)
+        self.db.commit()
+        for path, _, size, mtime, _, _ in files:
+            self.done[path] = (size, mtime)
+
+    def rollback(self):
+        self.db.rollback()
+
+    def manifest(self, config):
+        shards = [{"file": file, "records": records, "bytes": size, "text_bytes": text_bytes}
+                  for file, records, size, text_bytes in
+                  self.db.execute("SELECT file, records, bytes, text_bytes FROM shards ORDER BY number")]
+        sources = {kind: {"files": files, "rows": rows or 0}
+                   for kind, files, rows in self.db.execute("SELECT kind, COUNT(*), SUM(rows) FROM files GROUP BY kind")}
+        return {
+            "updated": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "config": config,
+            "fields": RECORD_FIELDS,
+            "records": sum(shard["records"] for shard in shards),
+            "bytes": sum(shard["bytes"] for shard in shards),
+            "sources": sources,
+            "shards": shards,
+        }
+
+def write_manifest(out_dir, manifest):
+    tmp_path = os.path.join(out_dir, "manifest.json.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1, ensure_ascii=False)
+    os.replace(tmp_path, os.path.join(out_dir, "manifest.json"))
+
+def export(data_dir="data", out_dir=EXPORT_DIR, workers=None, shard_mb=256, fmt="jsonl", min_chars=50,
+           include_open=False):
+    """Export data_dir into out_dir, resuming a previous run with the same options. Returns the manifest.
+
+    Files are read and normalised by a process pool; the parent keeps at most
+    two files per worker in flight, deduplicates against the on-disk hash
+    table and writes the shards in source order, so memory stays flat however
+    large the archive is.
+    """
+    if fmt == "arrow" and pyarrow is None:
+        raise RuntimeError("Arrow output needs pyarrow (pip install pyarrow)")
+    os.makedirs(out_dir, exist_ok=True)
+    config = {"format": fmt, "min_chars": min_chars, "include_open": include_open}
+    state = ExportState(out_dir)
+    if not state.check_config(config):
+        raise RuntimeError(f"{out_dir} holds an export with other options, use --restart or another --out")
+
+    history_dir = os.path.join(data_dir, "history")
+    sources = [(kind, path) for kind, path in list_sources(data_dir, include_open) if not state.is_done(path)]
+    print(f"{len(sources)} files to export, {len(state.done)} already done")
+    shard_bytes = shard_mb * 1024 * 1024
+    html_store_dir = os.path.join(data_dir, os.path.relpath(HTML_STORE_DIR, "data"))
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    executor = None
+    if workers > 1:
+        # spawn, как и пул разбора в fetchrss.py
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                       initializer=_init_worker, initargs=(html_store_dir,))
+    else:
+        _init_worker(html_store_dir)
+
+    number = state.next_shard()
+    writer = ShardWriter(out_dir, number, fmt)
+    finished = []  # файлы, записанные в открытый шард
+    started = time.monotonic()
+    text_bytes = 0
+    duplicates = 0
+
+    def results():
+        if executor is None:
+            for kind, path in sources:
+                yield kind, path, export_file(kind, path, min_chars, history_dir)
+            return
+        pending = deque()
+        for kind, path in sources:
+            pending.append((kind, path, executor.submit(export_file, kind, path, min_chars, history_dir)))
+            if len(pending) >= workers * 2:
+                kind, path, future = pending.popleft()
+                yield kind, path, future.result()
+        while pending:
+            kind, path, future = pending.popleft()
+            yield kind, path, future.result()
+
+    try:
+        for done, (kind, path, (rows, records)) in enumerate(results(), 1):
+            stat = os.stat(path)
+            written = 0
+            for key, line in records:
+                if not state.add_hash(key):
+                    duplicates += 1
+                    continue
+                writer.write(line)
+                written += 1
+                if writer.bytes >= shard_bytes:
+                    text_bytes += writer.bytes
+                    state.commit(number, writer.close(), finished)
+                    finished = []
+                    print(f"Shard {number}: {done}/{len(sources)} files, "
+                          f"{text_bytes / max(time.monotonic() - started, 1e-6) / 1e6:.1f} MB/s")
+                    number += 1
+                    writer = ShardWriter(out_dir, number, fmt)
+            finished.append((path, kind, stat.st_size, int(stat.st_mtime), rows, written))
+        if writer.records:
+            text_bytes += writer.bytes
+            state.commit(number, writer.close(), finished)
+        else:
+            writer.discard()
+            state.commit(None, None, finished)
+    except BaseException:
+        # Открытый шард и его хэши отбрасываются, следующий запуск продолжит с последнего шарда
+        writer.discard()
+        state.rollback()
+        raise
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        manifest = state.manifest(config)
+        write_manifest(out_dir, manifest)
+        state.db.close()
+
+    elapsed = time.monotonic() - started
+    print(f"Exported {manifest['records']} records in {len(manifest['shards'])} shards "
+          f"({manifest['bytes'] / 1e6:.1f} MB compressed), {duplicates} duplicates skipped, "
+          f"{text_bytes / 1e6:.1f} MB of text in {elapsed:.1f} s")
+    return manifest
+
+def main():
+    parser = argparse.ArgumentParser(description="Export feed items and history as a deduplicated text corpus")
+    parser.add_argument("--data", default="data", help="NeuroLit data directory")
+    parser.add_argument("--out", default=EXPORT_DIR)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes, 1 - no pool (default: CPUs)")
+    parser.add_argument("--shard-mb", type=int, default=256, help="uncompressed text per shard")
+    parser.add_argument("--format", choices=FORMATS, default="jsonl")
+    parser.add_argument("--min-chars", type=int, default=50, help="skip shorter texts")
+    parser.add_argument("--include-open", action="store_true", help="also export today's open feed segments")
+    parser.add_argument("--restart", action="store_true", help="drop the previous export in --out first")
+    args = parser.parse_args()
+
+    if args.restart and os.path.isdir(args.out):
+        # Удаляем только каталог экспорта, а не что угодно, переданное в --out
+        if not any(os.path.exists(os.path.join(args.out, name)) for name in ("state.sqlite", "manifest.json")):
+            print(f"Error: {args.out} is not an export directory (no state.sqlite or manifest.json), not removing it")
+            return 1
+        shutil.rmtree(args.out)
+    try:
+        export(args.data, args.out, args.workers, args.shard_mb, args.format, args.min_chars, args.include_open)
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        return 1
+    except KeyboardInterrupt:
+        print("Interrupted, run again to resume")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,258 @@
+import os
+import sys
+import csv
+import time
+from array import array
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+# Колонки data/feeds/*.csv и data/global_feeds/*.csv
+FIELDS = ["title", "link", "description", "pub_date", "save_date", "pub_ts"]
+
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_format_cache = {}
+_parse_cache = {}
+
+def format_ts(ts):
+    """Epoch seconds as save_date text; items of one fetch share the value, so it is cached."""
+    text = _format_cache.get(ts)
+    if text is None:
+        if len(_format_cache) > 10000:
+            _format_cache.clear()
+        text = _format_cache[ts] = datetime.fromtimestamp(ts).strftime(DATE_FORMAT) if ts else ""
+    return text
+
+def parse_ts(text):
+    """save_date text as epoch seconds, 0 if empty or malformed."""
+    ts = _parse_cache.get(text)
+    if ts is None:
+        if len(_parse_cache) > 10000:
+            _parse_cache.clear()
+        try:
+            ts = int(time.mktime(time.strptime(text.strip().strip('"'), DATE_FORMAT)))
+        except (ValueError, OverflowError):
+            ts = 0
+        _parse_cache[text] = ts
+    return ts
+
+def parse_pub_date(text):
+    """pub_date as epoch seconds: RFC 822 (RSS), ISO 8601 (Atom, JSON Feed); 0 if unparseable."""
+    text = text.strip()
+    if not text:
+        return 0
+    try:
+        if text[:4].isdigit():
+            dt = datetime.fromisoformat(text.replace("Z", "+00:00"))
+        else:
+            dt = parsedate_to_datetime(text)
+    except (ValueError, TypeError, IndexError, OverflowError):
+        return 0
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+class FeedItem:
+    """One feed item. Used for single items; bulk data travels in a FeedBatch."""
+
+    __slots__ = ("title", "link", "description", "pub_date", "save_ts", "feed", "pub_ts")
+
+    def __init__(self, title="", link="", description="", pub_date="", save_ts=0, feed="", pub_ts=0):
+        self.title = title
+        self.link = link
+        self.description = description
+        self.pub_date = pub_date
+        self.save_ts = save_ts
+        self.feed = feed
+        self.pub_ts = pub_ts
+
+    @property
+    def save_date(self):
+        return format_ts(self.save_ts)
+
+    def __repr__(self):
+        return f"FeedItem({self.title!r}, {self.link!r})"
+
+class FeedBatch:
+    """Columnar batch of feed items exchanged by the parser, dedup, storage, rollover and the viewer.
+
+    Text columns are plain lists, save_ts and pub_ts are arrays of epoch
+    seconds and feed_ids index into feeds, a per-batch table of interned feed
+    names, so an item costs its strings plus a few bytes instead of a dict and
+    a repeated save_date string. pub_ts is the normalised pub_date, or the
+    save time if the feed gave none.
+    """
+
+    __slots__ = ("titles", "links", "descriptions", "pub_dates", "save_ts", "feed_ids", "feeds", "_feed_index",
+                 "pub_ts")
+
+    def __init__(self):
+        self.titles = []
+        self.links = []
+        self.descriptions = []
+        self.pub_dates = []
+        self.save_ts = array('q')
+        self.pub_ts = array('q')
+        self.feed_ids = array('I')
+        self.feeds = []
+        self._feed_index = {}
+
+    def __getstate__(self):
+        return (self.titles, self.links, self.descriptions, self.pub_dates, self.save_ts, self.pub_ts,
+                self.feed_ids, self.feeds)
+
+    def __setstate__(self, state):
+        (self.titles, self.links, self.descriptions, self.pub_dates, self.save_ts, self.pub_ts,
+         self.feed_ids, feeds) = state
+        self.feeds = [sys.intern(feed) for feed in feeds]
+        self._feed_index = {feed: i for i, feed in enumerate(self.feeds)}
+
+    def feed_id(self, feed):
+        index = self._feed_index.get(feed)
+        if index is None:
+            index = self._feed_index[feed] = len(self.feeds)
+            self.feeds.append(sys.intern(feed))
+        return index
+
+    def append(self, title, link, description, pub_date, save_ts=0, feed="", pub_ts=None):
+        self.titles.append(title)
+        self.links.append(link)
+        self.descriptions.append(description)
+        self.pub_dates.append(pub_date)
+        self.save_ts.append(int(save_ts))
+        if pub_ts is None:
+            pub_ts = parse_pub_date(pub_date)
+        self.pub_ts.append(int(pub_ts or save_ts))
+        self.feed_ids.append(self.feed_id(feed))
+
+    def append_item(self, item):
+        self.append(item.title, item.link, item.description, item.pub_date, item.save_ts, item.feed, item.pub_ts)
+
+    def extend(self, other):
+        for i in range(len(other)):
+            self.append_from(other, i)
+
+    def append_from(self, other, i):
+        """Copy row i of another batch."""
+        self.append(other.titles[i], other.links[i], other.descriptions[i], other.pub_dates[i],
+                    other.save_ts[i], other.feeds[other.feed_ids[i]], other.pub_ts[i])
+
+    def select(self, indices):
+        """New batch with the given rows, in that order."""
+        batch = FeedBatch()
+        for i in indices:
+            batch.append_from(self, i)
+        return batch
+
+    def set_save_ts(self, ts):
+        self.save_ts = array('q', [int(ts)]) * len(self.titles)
+
+    def __len__(self):
+        return len(self.titles)
+
+    def __getitem__(self, i):
+        return FeedItem(self.titles[i], self.links[i], self.descriptions[i], self.pub_dates[i],
+                        self.save_ts[i], self.feeds[self.feed_ids[i]], self.pub_ts[i])
+
+    def __iter__(self):
+        for i in range(len(self.titles)):
+            yield self[i]
+
+    def feed(self, i):
+        return self.feeds[self.feed_ids[i]]
+
+    def row(self, i):
+        """Row i as TSV cells in FIELDS order."""
+        return (self.titles[i], self.links[i], self.descriptions[i], self.pub_dates[i], format_ts(self.save_ts[i]),
+                str(self.pub_ts[i]))
+
+    @classmethod
+    def from_rows(cls, rows, header=FIELDS, feed=""):
+        """Batch from TSV rows (lists of cells) laid out as header."""
+        batch = cls()
+        column = {name: header.index(name) for name in FIELDS if name in header}
+        width = len(header)
+        t, l, d, p, s, ts = (column.get(name) for name in FIELDS)
+        fid = batch.feed_id(feed)
+        for row in rows:
+            if len(row) < width:
+                row = row + [""] * (width - len(row))
+            batch.titles.append(row[t] if t is not None else "")
+            batch.links.append(row[l] if l is not None else "")
+            batch.descriptions.append(row[d] if d is not None else "")
+            pub_date = row[p] if p is not None else ""
+            batch.pub_dates.append(pub_date)
+            save_ts = parse_ts(row[s]) if s is not None else 0
+            batch.save_ts.append(save_ts)
+            # Файлы до появления pub_ts: разбираем pub_date при чтении
+            pub_ts = int(row[ts]) if ts is not None and row[ts].isdigit() else parse_pub_date(pub_date)
+            batch.pub_ts.append(pub_ts or save_ts)
+            batch.feed_ids.append(fid)
+        return batch
+
+    @classmethod
+    def read_tsv(cls, file_path, feed=None):
+        """Load a feed TSV file; the feed name defaults to the file name.
+
+        Files without the header row (written by old versions of change_rss.py)
+        are read in FIELDS order.
+        """
+        if feed is None:
+            feed = os.path.splitext(os.path.basename(file_path))[0]
+        with open(file_path, 'r', newline='', encoding='utf-8') as f:
+            reader = csv.reader(f, delimiter='\t')
+            header = next(reader, None)
+            if header is None:
+                return cls()
+            if "link" in header and "title" in header:
+                return cls.from_rows(reader, header, feed)
+            batch = cls.from_rows([header], FIELDS, feed)
+            batch.extend(cls.from_rows(reader, FIELDS, feed))
+            return batch
+
+    def write_tsv(self, file_path, indices=None):
+        """Append rows (all, or the given indices) to a feed TSV file, writing the header if it is new.
+
+        Rows appended to a file with an older header keep that file's columns.
+        """
+        header = read_header(file_path)
+        rows = (self.row(i) for i in (range(len(self)) if indices is None else indices))
+        if header and header != FIELDS:
+            if "title" in header:
+                positions = [FIELDS.index(name) if name in FIELDS else None for name in header]
+            else:
+                positions = range(len(header))  # файл без заголовка, колонки в старом порядке
+            rows = ([row[i] if i is not None else "" for i in positions] for row in rows)
+        with open(file_path, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f, delimiter='\t')
+            if not header:
+                writer.writerow(FIELDS)
+            writer.writerows(rows)
+
+def read_header(file_path):
+    """First row of a TSV file, None if the file is missing or empty."""
+    if not os.path.exists(file_path):
+        return None
+    with open(file_path, 'r', newline='', encoding='utf-8') as f:
+        return next(csv.reader(f, delimiter='\t'), None)
+
+def read_column(file_path, name):
+    """One column of a feed TSV file, without building the rest of the rows."""
+    if not os.path.exists(file_path):
+        return []
+    with open(file_path, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.reader(f, delimiter='\t')
+        header = next(reader, None)
+        if header is None:
+            return []
+        if name in header:
+            index = header.index(name)
+            rows = reader
+        elif "link" in header and "title" in header:
+            # Заголовок старой версии без этой колонки: у каждой строки она пустая
+            return ["" for _ in reader]
+        else:
+            index = FIELDS.index(name)  # файл без заголовка, колонки в порядке FIELDS
+            rows = [header]
+            rows.extend(reader)
+        return [row[index] if index < len(row) else "" for row in rows]
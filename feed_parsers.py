@@ -0,0 +1,186 @@
+import re
+import codecs
+import json
+import time
+import xml.etree.ElementTree as ET
+
+from feed_items import FeedBatch
+
+RSS1_NAMESPACES = ("http://purl.org/rss/1.0/", "http://my.netscape.com/rdf/simple/0.9/")
+ATOM_NS = "http://www.w3.org/2005/Atom"
+CONTENT_ENCODED = "{http://purl.org/rss/1.0/modules/content/}encoded"
+DC_DATE = "{http://purl.org/dc/elements/1.1/}date"
+
+# Разбор по формату: имя -> генератор (title, link, description, pub_date) по тексту документа
+PARSERS = {}
+
+def register(name):
+    """Decorator adding an item generator for a feed format to PARSERS."""
+    def decorator(func):
+        PARSERS[name] = func
+        return func
+    return decorator
+
+# Байты, после которых в UTF-8 может оказаться символ, недопустимый для XML:
+# управляющие символы и начала 4-байтовых последовательностей (символы вне BMP)
+UTF8_SAFE_BYTES = bytes(b for b in range(256) if (b >= 0x20 or b in (0x09, 0x0A, 0x0D)) and not 0xF0 <= b <= 0xF4)
+
+def has_invalid_utf8_chars(data):
+    """True if UTF-8 bytes may hold characters the XML cleanup removes; a byte scan, much cheaper than the regex."""
+    return bool(data.translate(None, UTF8_SAFE_BYTES)) or b"\xef\xbf\xbe" in data or b"\xef\xbf\xbf" in data
+
+def decode_feed(xml_content):
+    """Feed bytes as text with characters that break the XML parser removed."""
+    clean = False
+    if isinstance(xml_content, bytes):
+        # Try to detect encoding from XML declaration
+        match = re.search(b'encoding=["\']([a-zA-Z0-9-]+)["\']', xml_content)
+        encoding = match.group(1).decode('utf-8') if match else 'utf-8'
+        try:
+            text = xml_content.decode(encoding)
+            clean = codecs.lookup(encoding).name == 'utf-8' and not has_invalid_utf8_chars(xml_content)
+        except (LookupError, UnicodeDecodeError, ValueError):
+            # Fallback strategies
+            try:
+                text = xml_content.decode('cp1251')
+            except UnicodeDecodeError:
+                text = xml_content.decode('utf-8', errors='replace')
+        xml_content = text
+
+    clean_xml = xml_content
+    if not clean:
+        clean_xml = re.sub(r'[^\x09\x0A\x0D\x20-\uD7FF\uE000-\uFFFD\u10000-\u10FFFF]+', '', clean_xml)
+
+    clean_xml = re.sub(r'&(?!(?:[a-zA-Z0-9]+|#[0-9]+|#x[0-9a-fA-F]+);)', '&amp;', clean_xml)
+    return clean_xml
+
+# Пролог XML до корневого элемента: объявление, комментарии, DOCTYPE, инструкции
+PROLOG_RE = re.compile(rb'\s*(?:<\?.*?\?>|<!--.*?-->|<!DOCTYPE[^>\[]*(?:\[.*?\])?\s*>)', re.S)
+ROOT_RE = re.compile(rb'\s*<([A-Za-z_][\w.-]*:)?([A-Za-z_][\w.-]*)')
+
+ROOT_FORMATS = {b"rss": "rss2", b"RDF": "rss1", b"feed": "atom"}
+
+def sniff_format(content):
+    """Format name from the first bytes of a feed (the root element or a JSON object), None if unknown."""
+    head = content[:4096]
+    if isinstance(head, str):
+        head = head.encode('utf-8', errors='replace')
+    # BOM UTF-8 / UTF-16 не мешает определить формат
+    if head.startswith(b"\xef\xbb\xbf"):
+        head = head[3:]
+    elif head[:2] in (b"\xff\xfe", b"\xfe\xff"):
+        head = head.decode('utf-16', errors='ignore').encode('utf-8')
+    if head.lstrip().startswith(b"{"):
+        return "json"
+    pos = 0
+    while True:
+        match = PROLOG_RE.match(head, pos)
+        if not match:
+            break
+        pos = match.end()
+    match = ROOT_RE.match(head, pos)
+    return ROOT_FORMATS.get(match.group(2)) if match else None
+
+def _local(tag):
+    return tag.rsplit("}", 1)[-1]
+
+def _text(elem):
+    return elem.text.strip() if elem.text else ""
+
+@register("rss2")
+def iter_rss2(text):
+    for item in ET.fromstring(text).iter("item"):
+        link = item.findtext("link", "").strip()
+        if not link:
+            guid = item.find("guid")
+            if guid is not None and guid.get("isPermaLink", "true") == "true":
+                link = _text(guid)
+        description = item.findtext("description")
+        if description is None:
+            description = item.findtext(CONTENT_ENCODED, "")
+        pub_date = item.findtext("pubDate")
+        if pub_date is None:
+            pub_date = item.findtext(DC_DATE, "")
+        yield item.findtext("title", "").strip(), link, description, pub_date.strip()
+
+@register("rss1")
+def iter_rss1(text):
+    root = ET.fromstring(text)
+    for item in (item for ns in RSS1_NAMESPACES for item in root.iter(f"{{{ns}}}item")):
+        fields = {}
+        for child in item:
+            fields.setdefault(_local(child.tag), child)
+        description = fields.get("description")
+        yield (_text(fields["title"]) if "title" in fields else "",
+               _text(fields["link"]) if "link" in fields else "",
+               (description.text or "") if description is not None else "",
+               _text(fields["date"]) if "date" in fields else "")
+
+@register("atom")
+def iter_atom(text):
+    ns = f"{{{ATOM_NS}}}"
+    for entry in ET.fromstring(text).iter(ns + "entry"):
+        link = ""
+        for link_elem in entry.iterfind(ns + "link"):
+            # rel="alternate" (или без rel) - ссылка на статью, иначе первая попавшаяся
+            if link_elem.get("rel", "alternate") == "alternate":
+                link = link_elem.get("href", "")
+                break
+            link = link or link_elem.get("href", "")
+        summary = entry.findtext(ns + "summary")
+        if summary is None:
+            summary = entry.findtext(ns + "content", "")
+        pub_date = entry.findtext(ns + "published") or entry.findtext(ns + "updated", "")
+        yield entry.findtext(ns + "title", "").strip(), link, summary, pub_date.strip()
+
+@register("json")
+def iter_json(text):
+    feed = json.loads(text)
+    for item in feed.get("items", ()):
+        if not isinstance(item, dict):
+            continue
+        yield (item.get("title") or "", item.get("url") or item.get("external_url") or "",
+               item.get("content_html") or item.get("summary") or item.get("content_text") or "",
+               item.get("date_published") or item.get("date_modified") or "")
+
+def decode_json(content):
+    if isinstance(content, bytes):
+        return content.decode('utf-8-sig', errors='replace')
+    return content
+
+def iter_items(content):
+    """(title, link, description, pub_date) of every item, with the parser picked by sniffing.
+
+    A document the sniffer does not recognise goes through each parser in
+    turn until one finds items.
+    """
+    name = sniff_format(content)
+    if name == "json":
+        yield from iter_json(decode_json(content))
+        return
+    text = decode_feed(content)
+    if name is not None:
+        yield from PARSERS[name](text)
+        return
+    for name, parser in PARSERS.items():
+        found = False
+        try:
+            for item in parser(decode_json(content) if name == "json" else text):
+                found = True
+                yield item
+        except (ET.ParseError, ValueError):
+            if not found:
+                continue
+        if found:
+            return
+
+def parse_feed(content, feed=""):
+    """Parse RSS 1.0, RSS 2.0, Atom or JSON Feed into a FeedBatch; pub_date is normalised to epoch pub_ts on append.
+
+    Pure CPU work with no shared state, so it can run in the parse process pool.
+    """
+    batch = FeedBatch()
+    save_ts = int(time.time())
+    for title, link, description, pub_date in iter_items(content):
+        batch.append(title, link, description, pub_date, save_ts, feed)
+    return batch
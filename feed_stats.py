@@ -0,0 +1,272 @@
+# Per-feed statistics rollups: items per day, last publication and save time,
+# average description size, kept up to date at ingest.
+#
+#   python feed_stats.py             - print the per-feed summary
+#   python feed_stats.py --rebuild   - rebuild the rollups from data/feeds and data/global_feeds
+
+import os
+import sys
+import csv
+import time
+import argparse
+import threading
+from datetime import date, timedelta
+
+from feed_items import FeedBatch
+from jobs import file_lock, FEEDS_LOCK
+from timeline import feed_name, FEED_DIRS
+
+FEED_STATS_FILE = "data/feed_stats.tsv"
+STATS_FIELDS = ["feed", "day", "items", "desc_chars", "last_pub_ts", "last_save_ts"]
+# Строка после заголовка: rollups посчитаны по всем файлам фидов, а не только с момента обновления
+BUILT_MARKER = "#built"
+
+class FeedStats:
+    """Items per feed per day, with the per-feed totals the dashboard reads, without rescanning feed CSVs.
+
+    data/feed_stats.tsv is an append-only log of deltas in STATS_FIELDS order;
+    rows of the same (feed, day) add up items and description characters and
+    keep the latest timestamps. The ingest writer (under FEEDS_LOCK) appends
+    one row per feed and day of each batch; the daily rollover compacts the
+    log to one row per (feed, day). Readers in other processes follow the
+    file as it grows and start over when it is replaced.
+
+    A "#built" row marks a log that includes every feed file on disk. A log
+    started by record() alone only counts items ingested since; the rollover
+    rebuilds it once from the feed files.
+
+    Per-feed totals are updated together with the daily rows, so summary()
+    costs O(feeds), whatever the number of items.
+    """
+
+    def __init__(self, file_path=FEED_STATS_FILE, feed_dirs=FEED_DIRS):
+        self.file_path = file_path
+        self.feed_dirs = feed_dirs
+        self.lock = threading.Lock()
+        self.daily = {}  # (фид, день) -> [items, desc_chars, last_pub_ts, last_save_ts]
+        self.feeds = {}  # фид -> [items, desc_chars, first_day, last_day, last_pub_ts, last_save_ts]
+        self.pos = 0
+        self.inode = None
+        self.rows = 0    # строк в файле, для решения о сжатии
+        self.built = False
+
+    def _apply(self, feed, day, items, chars, pub_ts, save_ts):
+        entry = self.daily.get((feed, day))
+        if entry is None:
+            self.daily[(feed, day)] = [items, chars, pub_ts, save_ts]
+        else:
+            entry[0] += items
+            entry[1] += chars
+            entry[2] = max(entry[2], pub_ts)
+            entry[3] = max(entry[3], save_ts)
+        total = self.feeds.get(feed)
+        if total is None:
+            self.feeds[feed] = [items, chars, day, day, pub_ts, save_ts]
+        else:
+            total[0] += items
+            total[1] += chars
+            total[2] = min(total[2], day)
+            total[3] = max(total[3], day)
+            total[4] = max(total[4], pub_ts)
+            total[5] = max(total[5], save_ts)
+
+    def _reload(self):
+        """Apply rows appended since the last call; re-read everything if the file was replaced."""
+        try:
+            stat = os.stat(self.file_path)
+        except OSError:
+            return
+        if stat.st_ino != self.inode or stat.st_size < self.pos:
+            self.daily = {}
+            self.feeds = {}
+            self.pos = 0
+            self.rows = 0
+            self.built = False
+            self.inode = stat.st_ino
+        if stat.st_size == self.pos:
+            return
+        with open(self.file_path, 'rb') as f:
+            f.seek(self.pos)
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].decode('utf-8').splitlines():
+            if line.startswith(BUILT_MARKER):
+                self.built = True
+                continue
+            try:
+                feed, day, items, chars, pub_ts, save_ts = line.split("\t")
+                self._apply(feed, day, int(items), int(chars), int(pub_ts), int(save_ts))
+                self.rows += 1
+            except ValueError:
+                continue  # заголовок или оборванная строка
+        self.pos += end
+
+    def _append(self, rows):
+        os.makedirs(os.path.dirname(self.file_path) or ".", exist_ok=True)
+        new = not os.path.exists(self.file_path)
+        with open(self.file_path, 'a', encoding='utf-8', newline='') as f:
+            if new:
+                f.write("\t".join(STATS_FIELDS) + "\n")
+            f.writelines("\t".join(map(str, row)) + "\n" for row in rows)
+        stat = os.stat(self.file_path)
+        if new:
+            self.inode = stat.st_ino
+        self.pos = stat.st_size
+
+    @staticmethod
+    def _rollup(batch, indices, feed):
+        """Delta rows (feed, day, items, chars, last_pub_ts, last_save_ts) of batch rows, one per day."""
+        days = {}
+        day_of = {}
+        now = int(time.time())
+        for i in indices:
+            pub_ts = batch.pub_ts[i] or batch.save_ts[i] or now
+            # Четверть часа целиком лежит в одном дне (смещения поясов кратны 15 минутам)
+            slot = pub_ts // 900
+            day = day_of.get(slot)
+            if day is None:
+                day = day_of[slot] = date.fromtimestamp(pub_ts).isoformat()
+            entry = days.get(day)
+            if entry is None:
+                entry = days[day] = [0, 0, 0, 0]
+            entry[0] += 1
+            entry[1] += len(batch.descriptions[i])
+            entry[2] = max(entry[2], batch.pub_ts[i])
+            entry[3] = max(entry[3], batch.save_ts[i])
+        return [(feed, day, *entry) for day, entry in sorted(days.items())]
+
+    def record(self, batch, indices, feed):
+        """Add the batch rows at indices (items being written to feed) to the rollups. Called under FEEDS_LOCK."""
+        rows = self._rollup(batch, indices, feed)
+        if not rows:
+            return
+        with self.lock:
+            self._reload()
+            self._append(rows)
+            for row in rows:
+                self._apply(*row)
+            self.rows += len(rows)
+
+    def _write(self):
+        """Replace the log with the rollups in memory, one row per (feed, day)."""
+        os.makedirs(os.path.dirname(self.file_path) or ".", exist_ok=True)
+        # Старый файл удаляется только заменой: пока он жив, у нового другой inode, и читатели его заметят
+        tmp_path = self.file_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+            f.write("\t".join(STATS_FIELDS) + "\n")
+            if self.built:
+                f.write(f"{BUILT_MARKER}\t{int(time.time())}\n")
+            for (feed, day), entry in sorted(self.daily.items()):
+                f.write("\t".join(map(str, (feed, day, *entry))) + "\n")
+        os.replace(tmp_path, self.file_path)
+        stat = os.stat(self.file_path)
+        self.inode = stat.st_ino
+        self.pos = stat.st_size
+        self.rows = len(self.daily)
+
+    def compact(self):
+        """Rewrite the log as one row per (feed, day); done at the daily rollover, under FEEDS_LOCK."""
+        with self.lock:
+            self._reload()
+            if self.daily or self.built:
+                self._write()
+
+    def rebuild(self):
+        """Recompute the rollups from every feed CSV (a full scan, for the first run). Called under FEEDS_LOCK.
+
+        The recount is merged with the rollups already in the log, taking the larger value of each
+        (feed, day): segments removed by retention.py are no longer on disk, and their days keep
+        the counts recorded while they existed.
+        """
+        with self.lock:
+            self._reload()
+            recorded = self.daily
+            self.daily = {}
+            self.feeds = {}
+            for feed_dir in self.feed_dirs:
+                if not os.path.isdir(feed_dir):
+                    continue
+                for name in sorted(os.listdir(feed_dir)):
+                    if not name.endswith(".csv"):
+                        continue
+                    path = os.path.join(feed_dir, name)
+                    try:
+                        batch = FeedBatch.read_tsv(path)
+                    except (OSError, csv.Error) as e:
+                        print(f"Error reading {path}: {e}")
+                        continue
+                    for row in self._rollup(batch, range(len(batch)), feed_name(path)):
+                        self._apply(*row)
+            counted = self.daily
+            for key, entry in recorded.items():
+                if key in counted:
+                    counted[key] = [max(old, new) for old, new in zip(entry, counted[key])]
+                else:
+                    counted[key] = entry
+            self.daily = {}
+            self.feeds = {}
+            for (feed, day), entry in counted.items():
+                self._apply(feed, day, *entry)
+            self.built = True
+            self._write()
+            return len(self.feeds)
+
+    def rollover(self):
+        """Daily maintenance: build the rollups if they were never built from the feed files, else compact the log."""
+        with self.lock:
+            self._reload()
+            built = self.built
+            grown = self.rows > len(self.daily) + 1000
+        if not built:
+            count = self.rebuild()
+            print(f"Feed statistics built for {count} feeds")
+        elif grown:
+            self.compact()
+
+    def summary(self, recent_days=7, today=None):
+        """Per-feed dicts sorted by feed name; O(feeds * recent_days)."""
+        today = today or date.today()
+        recent = [(today - timedelta(days=n)).isoformat() for n in range(recent_days)]
+        with self.lock:
+            self._reload()
+            result = []
+            for feed, (items, chars, first_day, last_day, last_pub, last_save) in sorted(self.feeds.items()):
+                try:
+                    span = (date.fromisoformat(last_day) - date.fromisoformat(first_day)).days + 1
+                except ValueError:
+                    span = 1
+                recent_items = sum(self.daily[(feed, day)][0] for day in recent if (feed, day) in self.daily)
+                result.append({
+                    "feed": feed, "items": items, "first_day": first_day, "last_day": last_day,
+                    "per_day": items / span, "recent": recent_items, "last_pub_ts": last_pub,
+                    "last_save_ts": last_save, "avg_chars": chars / items if items else 0,
+                })
+            return result
+
+    def days(self, feed):
+        """[(day, items, desc_chars, last_pub_ts, last_save_ts)] of one feed, newest first."""
+        with self.lock:
+            self._reload()
+            return sorted(((day, *entry) for (name, day), entry in self.daily.items() if name == feed),
+                          reverse=True)
+
+def format_time(ts):
+    return time.strftime("%Y-%m-%d %H:%M", time.localtime(ts)) if ts else ""
+
+def main():
+    parser = argparse.ArgumentParser(description="NeuroLit per-feed statistics")
+    parser.add_argument("--rebuild", action="store_true", help="recompute from the feed CSV files")
+    args = parser.parse_args()
+
+    stats = FeedStats()
+    if args.rebuild:
+        with file_lock(FEEDS_LOCK):
+            print(f"Rebuilt statistics of {stats.rebuild()} feeds")
+    for row in stats.summary():
+        print(f"{row['feed'][:40]:40} {row['items']:8} items  {row['per_day']:7.1f}/day  "
+              f"{row['recent']:6} last 7 days  last pub {format_time(row['last_pub_ts']):16}  "
+              f"avg {row['avg_chars']:6.0f} chars")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,10 +2,27 @@ import csv
 import os
 import requests
 import cloudscraper
-import xml.etree.ElementTree as ET
-import re
+from cloudscraper.exceptions import CloudflareException, CaptchaException
+import time
+import queue
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from urllib.parse import urlparse
-from datetime import datetime
+from settings import load_settings
+from reader_cache import ReaderCache, prefetch_articles
+from enrich import link_key, StoryIndex
+from feed_items import FeedBatch, read_column
+from feed_parsers import parse_feed
+from html_store import HtmlStore, store_descriptions
+from alerts import AlertLog
+from segments import SegmentLog
+from feed_stats import FeedStats
+from profiling import PROFILER, profiled
+from clearance import ClearanceCache, ChallengeStats, get_with_clearance, is_challenge
+from proxy_pool import ProxyPool, parse_proxy_list, requests_proxies
+from jobs import file_lock, LockTimeout, FEEDS_LOCK, FETCH_LOCK, FEED_LIST_LOCK
 
 def get_simplified_name(url):
     parsed = urlparse(url)
@@ -15,97 +32,105 @@ def get_simplified_name(url):
         name = "feed"
     return name[:50]
 
-def parse_and_save_to_csv(xml_content, base_filename):
-    try:
-        if isinstance(xml_content, bytes):
-            # Try to detect encoding from XML declaration
-            match = re.search(b'encoding=["\']([a-zA-Z0-9-]+)["\']', xml_content)
-            encoding = match.group(1).decode('utf-8') if match else 'utf-8'
-            try:
-                xml_content = xml_content.decode(encoding)
-            except (LookupError, UnicodeDecodeError, ValueError):
-                # Fallback strategies
-                try:
-                    xml_content = xml_content.decode('cp1251')
-                except UnicodeDecodeError:
-                    xml_content = xml_content.decode('utf-8', errors='replace')
-        
-        clean_xml = re.sub(r'[^\x09\x0A\x0D\x20-\uD7FF\uE000-\uFFFD\u10000-\u10FFFF]+', '', xml_content)
-        
-        clean_xml = re.sub(r'&(?!(?:[a-zA-Z0-9]+|#[0-9]+|#x[0-9a-fA-F]+);)', '&amp;', clean_xml)
-        
-        root = ET.fromstring(clean_xml)
-        new_items = []
-        save_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-        # Handle RSS 2.0
-        for item in root.findall(".//item"):
-            title = item.findtext("title", "")
-            link = item.findtext("link", "")
-            description = item.findtext("description", "")
-            pub_date = item.findtext("pubDate", "")
-            
-            new_items.append({
-                "title": title,
-                "link": link,
-                "description": description,
-                "pub_date": pub_date,
-                "save_date": save_date
-            })
-
-        # Handle Atom
-        if not new_items:
-            for entry in root.findall("{http://www.w3.org/2005/Atom}entry"):
-                title = entry.findtext("{http://www.w3.org/2005/Atom}title", "")
-                link_elem = entry.find("{http://www.w3.org/2005/Atom}link")
-                link = link_elem.get("href", "") if link_elem is not None else ""
-                description = entry.findtext("{http://www.w3.org/2005/Atom}summary", "")
-                pub_date = entry.findtext("{http://www.w3.org/2005/Atom}published", "") or entry.findtext("{http://www.w3.org/2005/Atom}updated", "")
-                
-                new_items.append({
-                    "title": title,
-                    "link": link,
-                    "description": description,
-                    "pub_date": pub_date,
-                    "save_date": save_date
-                })
-
-        if not new_items:
-            return
+# Ключи ссылок последнего закрытого сегмента фида: фид -> (путь, set); сегменты не меняются после закрытия
+_sealed_keys = {}
 
-        csv_file = base_filename + ".csv"
-        existing_links = set()
-        fieldnames = ["title", "link", "description", "pub_date", "save_date"]
+def sealed_link_keys(segments, feed):
+    """Link keys of the feed's most recently sealed segment (cached per feed until a newer one is sealed)."""
+    path = segments.latest_sealed(feed)
+    if path is None:
+        return set()
+    cached = _sealed_keys.get(feed)
+    if cached is None or cached[0] != path:
+        cached = _sealed_keys[feed] = (path, {link_key(link) for link in read_column(path, "link")})
+    return cached[1]
 
+def save_items(batch, base_filename, story_index=None, html_store=None, alerts=None, segments=None, stats=None):
+    """Append parsed items that are not stored yet to base_filename.csv. Returns a FeedBatch of the added items.
+
+    Links are stored as they came and compared by their canonical form
+    (enrich.link_key); with a StoryIndex, stories already stored from
+    any feed (same link or near-duplicate title) are skipped. With an HtmlStore,
+    HTML descriptions are moved there and the CSV keeps a plain-text summary.
+    With an AlertLog, added items are matched against the alert rules. With a
+    SegmentLog, a full or day-old base_filename.csv is sealed into global_feeds
+    before writing; links are deduplicated against the open segment and the
+    last sealed one, repeats of older segments are left to the story index. With FeedStats, added
+    items are counted into the per-feed rollups.
+    """
+    if not len(batch):
+        return FeedBatch()
+    # Записи индекса историй: сохраняются только после записи CSV, иначе элемент потерялся бы как "дубликат"
+    held = []
+    try:
+        links = batch.links
+        csv_file = base_filename + ".csv"
         # Read existing links if file exists
-        if os.path.exists(csv_file):
-            with open(csv_file, mode='r', encoding='utf-8') as f:
-                reader = csv.DictReader(f, delimiter='\t')
-                for row in reader:
-                    existing_links.add(row.get('link'))
+        existing_links = {link_key(link) for link in read_column(csv_file, "link")}
+        feed_name = os.path.basename(base_filename)
+        if segments is not None:
+            # Фид всё ещё отдаёт элементы, ушедшие в global_feeds при ротации или в полночь
+            existing_links |= sealed_link_keys(segments, feed_name)
 
         # Filter out items that already exist
-        items_to_add = [item for item in new_items if item['link'] not in existing_links]
-
-        if items_to_add:
-            file_exists = os.path.exists(csv_file)
-            with open(csv_file, mode='a', newline='', encoding='utf-8') as f:
-                writer = csv.DictWriter(f, fieldnames=fieldnames, delimiter='\t')
-                if not file_exists:
-                    writer.writeheader()
-                for item in items_to_add:
-                    writer.writerow(item)
-            print(f"Added {len(items_to_add)} new items to: {csv_file}")
+        to_add = []
+        for i, link in enumerate(links):
+            key = link_key(link)
+            if key in existing_links:
+                continue
+            existing_links.add(key)
+            if story_index is not None:
+                cluster, row = story_index.match(batch.titles[i], link, feed_name)
+                if row is not None:
+                    story_index.hold(row)  # дубликаты внутри пакета тоже находятся
+                    held.append(row)
+                if cluster is not None:
+                    continue  # та же история уже пришла из другого фида
+            to_add.append(i)
+
+        if to_add:
+            if alerts is not None:
+                # До store_descriptions, по полному описанию; ошибка правил не должна мешать записи
+                try:
+                    alerts.check(batch, to_add, feed_name)
+                except Exception as e:
+                    print(f"Error checking alerts for {feed_name}: {e}")
+            if html_store is not None:
+                store_descriptions(batch, to_add, html_store)
+            if segments is not None:
+                segments.before_write(csv_file)
+            batch.write_tsv(csv_file, to_add)
+            if story_index is not None:
+                story_index.commit(held)
+            held = []
+            if stats is not None:
+                # Только записанные элементы, как их потом пересчитает rebuild
+                stats.record(batch, to_add, feed_name)
+            print(f"Added {len(to_add)} new items to: {csv_file}")
         else:
+            if story_index is not None:
+                story_index.commit(held)
+            held = []
             print(f"No new items for: {csv_file}")
+        return batch.select(to_add)
+
+    except Exception as e:
+        print(f"Error saving items to {base_filename}.csv: {e}")
+        if story_index is not None:
+            story_index.release(held)
+        return FeedBatch()
 
+def parse_and_save_to_csv(xml_content, base_filename, story_index=None, html_store=None, alerts=None,
+                          segments=None, stats=None):
+    """Parse feed XML and append new items to base_filename.csv. Returns a FeedBatch of the added items."""
+    try:
+        batch = parse_feed(xml_content, os.path.basename(base_filename))
     except Exception as e:
         print(f"Error parsing XML: {e}")
+        return FeedBatch()
+    return save_items(batch, base_filename, story_index, html_store, alerts, segments, stats)
 
-def fetch_feeds():
-    csv_path = "data/feeds.csv"
-    output_dir = "data/feeds"
-    
+def create_scraper():
     try:
         scraper = cloudscraper.create_scraper(
             browser={'custom': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Ubuntu Chromium/124.0.0.0 Chrome/124.0.0.0 Safari/537.36'},
@@ -117,45 +142,336 @@ def fetch_feeds():
         print(f"Warning: Could not initialize advanced scraper features: {e}")
         print("Falling back to basic scraper...")
         scraper = cloudscraper.create_scraper()
+    return scraper
+
+@profiled()
+def fetch_feeds(scraper=None, story_index=None, reader_cache=None, on_feed_updated=None, clearance_cache=None,
+                proxy_pool=None, parse_executor=None, html_store=None, alerts=None, websub=None,
+                stats=None):
+    """Fetch every feed from data/feeds.csv. Returns the number of added items.
+
+    A long-running caller (ingestd.py) passes its own scraper, story index and
+    reader cache to keep them warm between runs, and its parse process pool, HTML store, alert log and feed stats;
+    on_feed_updated(url, csv_file, count) is called for every feed that gained items.
+    With a WebSubSubscriber, feeds whose hub pushes them are not polled, and
+    polled feeds that advertise a hub are subscribed.
+
+    Feeds go through a fetch -> parse -> write pipeline: fetch threads share the
+    scraper session, parsing runs in a process pool and one writer appends to the
+    CSV files. Bounded queues between the stages keep a slow stage from piling up
+    downloaded feeds in memory.
+    """
+    try:
+        # Предыдущий запуск ещё идёт - не запускаем второй параллельно
+        with file_lock(FETCH_LOCK, timeout=0):
+            return _fetch_feeds(scraper, story_index, reader_cache, on_feed_updated, clearance_cache, proxy_pool,
+                                parse_executor, html_store, alerts, websub, stats)
+    except LockTimeout:
+        print("Another fetch is still running, skipped")
+        return 0
+
+# Ошибки, которые обычно выдаёт сам прокси, а не сайт
+PROXY_ERROR_CODES = (407, 502, 503, 504)
+
+def fetch_via_pool(scraper, url, proxy_cell, proxy_pool, clearance_cache, challenge_stats, timeout=60, failover_timeout=15):
+    """GET url through the fastest healthy proxy allowed for the feed, failing over to the next ones.
+
+    Every attempt except the last uses the shorter failover_timeout, so a dead
+    proxy costs seconds instead of the full timeout. A Cloudflare challenge the
+    scraper could not solve is the site's answer, not a proxy failure: it moves
+    on to the next proxy without marking this one unhealthy.
+    """
+    candidates = proxy_pool.ranked(parse_proxy_list(proxy_cell))
+    last_error = None
+    for i, proxy in enumerate(candidates):
+        last = i == len(candidates) - 1
+        start = time.monotonic()
+        try:
+            response = get_with_clearance(scraper, url, clearance_cache, challenge_stats,
+                                          proxy=proxy, proxies=requests_proxies(proxy),
+                                          timeout=timeout if last else failover_timeout)
+        except requests.RequestException as e:
+            proxy_pool.record(proxy, False)
+            last_error = e
+            if not last:
+                print(f"Proxy {proxy} failed for {url}: {e}, trying next")
+            continue
+        except (CloudflareException, CaptchaException) as e:
+            # Прокси ответил - через другой выход проверка может пройти
+            last_error = e
+            if not last:
+                print(f"Cloudflare challenge via {proxy} failed for {url}: {e}, trying next")
+            continue
+        if response.status_code in PROXY_ERROR_CODES and not last and not is_challenge(response):
+            proxy_pool.record(proxy, False)
+            print(f"Proxy {proxy} answered {response.status_code} for {url}, trying next")
+            continue
+        # Ответ сайта (в том числе 4xx) - прокси исправен
+        proxy_pool.record(proxy, True, time.monotonic() - start)
+        response.raise_for_status()
+        return response
+    raise last_error
+
+class StageStats:
+    """Throughput counters of one pipeline stage.
+
+    busy is the time spent working, blocked the time spent waiting for room in
+    the next stage's queue. The bottleneck is the stage with the highest
+    utilisation; the stages before it show a lot of blocked time.
+    """
+
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self.lock = threading.Lock()
+        self.jobs = 0
+        self.items = 0
+        self.bytes = 0
+        self.busy = 0.0
+        self.blocked = 0.0
+
+    def add(self, jobs=0, items=0, size=0, busy=0.0, blocked=0.0):
+        with self.lock:
+            self.jobs += jobs
+            self.items += items
+            self.bytes += size
+            self.busy += busy
+            self.blocked += blocked
+
+    def report(self, wall):
+        wall = max(wall, 1e-6)
+        utilisation = self.busy / (wall * self.workers) * 100
+        return (f"{self.name:<6} x{self.workers}: {self.jobs} feeds, {self.items} items, "
+                f"{self.bytes / 1024 / 1024:.1f} MB, {self.jobs / wall:.2f} feeds/s, "
+                f"busy {utilisation:.0f}%, blocked {self.blocked:.1f} s")
+
+class ParsePool:
+    """Process pool for parse_feed that replaces itself when it breaks.
+
+    A worker process that dies (OOM kill, a crash in expat) breaks a
+    ProcessPoolExecutor for good; a long-running ingestd would parse nothing
+    until restarted. The job is retried once in a new pool; if that one breaks
+    too, the document is taken to be the cause and only that job fails.
+    """
+
+    def __init__(self, processes):
+        self.processes = processes
+        self.lock = threading.Lock()
+        self.executor = self._create()
+
+    def _create(self):
+        # spawn: fork из процесса с потоками (Qt, ingestd) может зависнуть
+        return ProcessPoolExecutor(max_workers=self.processes, mp_context=multiprocessing.get_context("spawn"))
 
+    def _replace(self, broken):
+        with self.lock:
+            # Сломанный пул заменяет первый заметивший поток
+            if self.executor is broken:
+                broken.shutdown(wait=False)
+                self.executor = self._create()
+                print("Parse process pool broke, started a new one")
+            return self.executor
+
+    def parse(self, content, name):
+        executor = self.executor
+        for attempt in range(2):
+            try:
+                return executor.submit(parse_feed, content, name).result()
+            except BrokenProcessPool:
+                executor = self._replace(executor)
+        raise BrokenProcessPool(f"parse worker died twice on {name}")
+
+    def shutdown(self):
+        self.executor.shutdown()
+
+def create_parse_executor(processes):
+    """ParsePool for parse_feed; None (parse in the pipeline threads) if processes is 0 or pools are unavailable."""
+    if not processes:
+        return None
+    try:
+        return ParsePool(processes)
+    except (OSError, NotImplementedError, ValueError) as e:
+        print(f"Parse process pool unavailable, parsing in threads: {e}")
+        return None
+
+def _timed_put(q, item, stats):
+    start = time.monotonic()
+    q.put(item)
+    stats.add(blocked=time.monotonic() - start)
+
+def _fetch_feeds(scraper, story_index, reader_cache, on_feed_updated, clearance_cache, proxy_pool, parse_executor,
+                 html_store, alerts, websub, stats):
+    csv_path = "data/feeds.csv"
+    output_dir = "data/feeds"
+    
     if not os.path.exists(csv_path):
         print(f"CSV file not found: {csv_path}")
-        return
+        return 0
 
     os.makedirs(output_dir, exist_ok=True)
+    settings = load_settings()
+    if scraper is None:
+        scraper = create_scraper()
+    if story_index is None:
+        story_index = StoryIndex(max_age_days=settings["story_index_days"])
+    if clearance_cache is None:
+        clearance_cache = ClearanceCache()
+    if proxy_pool is None:
+        proxy_pool = ProxyPool()
+    if html_store is None:
+        html_store = HtmlStore()
+    if alerts is None:
+        alerts = AlertLog()
+    if stats is None:
+        stats = FeedStats()
+    segments = SegmentLog(segment_bytes=settings["segment_mb"] * 1024 * 1024)
+    own_executor = parse_executor is None
+    if own_executor:
+        parse_executor = create_parse_executor(settings["parse_processes"])
+    challenge_stats = ChallengeStats()
+    new_links = []
 
-    with open(csv_path, mode='r', encoding='utf-8') as f:
-        reader = csv.DictReader(f, delimiter='\t')
-        for row in reader:
-            url = row.get('url')
-            proxy = row.get('proxy')
-            
-            if not url:
-                continue
-                
-            print(f"Fetching: {url}")
-            proxies = {}
-            if proxy:
-                proxies = {
-                    "http": proxy,
-                    "https": proxy
-                }
+    with file_lock(FEED_LIST_LOCK):
+        with open(csv_path, mode='r', encoding='utf-8') as f:
+            feed_rows = [row for row in csv.DictReader(f, delimiter='\t') if row.get('url')]
+    if websub is not None:
+        websub.prune({row['url'] for row in feed_rows})
+        polled_rows = [row for row in feed_rows if websub.needs_poll(row['url'])]
+        if len(polled_rows) < len(feed_rows):
+            print(f"Skipping {len(feed_rows) - len(polled_rows)} feeds delivered by WebSub")
+        feed_rows = polled_rows
 
+    # fetch (потоки, сеть) -> parse_queue -> parse (процессы) -> write_queue -> write (один поток)
+    feed_queue = queue.Queue()
+    for row in feed_rows:
+        feed_queue.put(row)
+    parse_queue = queue.Queue(maxsize=settings["pipeline_queue_size"])
+    write_queue = queue.Queue(maxsize=settings["pipeline_queue_size"])
+    fetch_workers = max(1, min(settings["fetch_workers"], len(feed_rows)))
+    parse_workers = settings["parse_processes"] if parse_executor is not None else 1
+    fetch_stats = StageStats("fetch", fetch_workers)
+    parse_stats = StageStats("parse", parse_workers)
+    write_stats = StageStats("write", 1)
+    # Запись прервалась: загрузка прекращается, разобранное отбрасывается
+    stop = threading.Event()
+
+    def fetch_worker():
+        while not stop.is_set():
+            try:
+                row = feed_queue.get_nowait()
+            except queue.Empty:
+                return
+            url = row['url']
+            print(f"Fetching: {url}")
+            start = time.monotonic()
             try:
-                response = scraper.get(url, proxies=proxies, timeout=60)
-                response.raise_for_status()
-                
-                simplified_name = get_simplified_name(url)
-                xml_file_path = os.path.join(output_dir, simplified_name + ".xml")
-                
+                response = fetch_via_pool(scraper, url, row.get('proxy'), proxy_pool, clearance_cache, challenge_stats)
+                base_filename = os.path.join(output_dir, get_simplified_name(url))
+                xml_file_path = base_filename + ".xml"
                 with open(xml_file_path, 'wb') as out_f:
                     out_f.write(response.content)
                 print(f"Saved XML to: {xml_file_path}")
-                
-                parse_and_save_to_csv(response.content, os.path.join(output_dir, simplified_name))
-
             except Exception as e:
                 print(f"Failed to fetch {url}: {e}")
+                continue
+            if websub is not None:
+                try:
+                    websub.polled(url, base_filename, response.content, response.headers)
+                except Exception as e:
+                    print(f"WebSub discovery failed for {url}: {e}")
+            fetch_stats.add(jobs=1, size=len(response.content), busy=time.monotonic() - start)
+            _timed_put(parse_queue, (url, base_filename, response.content), fetch_stats)
+
+    def parse_worker():
+        # Каждый поток держит в работе один процесс пула
+        while True:
+            job = parse_queue.get()
+            if job is None:
+                return
+            url, base_filename, content = job
+            if stop.is_set():
+                continue
+            start = time.monotonic()
+            try:
+                if parse_executor is not None:
+                    batch = parse_executor.parse(content, os.path.basename(base_filename))
+                else:
+                    batch = parse_feed(content, os.path.basename(base_filename))
+            except Exception as e:
+                print(f"Error parsing XML from {url}: {e}")
+                continue
+            parse_stats.add(jobs=1, items=len(batch), size=len(content), busy=time.monotonic() - start)
+            _timed_put(write_queue, (url, base_filename, batch), parse_stats)
+
+    def run_stage(target, count):
+        threads = [threading.Thread(target=target, daemon=True) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def close_stage(threads, next_queue, sentinels):
+        for thread in threads:
+            thread.join()
+        for _ in range(sentinels):
+            next_queue.put(None)
+
+    started = time.monotonic()
+    fetch_threads = run_stage(fetch_worker, fetch_workers)
+    parse_threads = run_stage(parse_worker, parse_workers)
+    closers = [
+        threading.Thread(target=close_stage, args=(fetch_threads, parse_queue, parse_workers), daemon=True),
+        threading.Thread(target=close_stage, args=(parse_threads, write_queue, 1), daemon=True),
+    ]
+    for closer in closers:
+        closer.start()
+
+    try:
+        # Запись - в вызывающем потоке, одна на все фиды
+        while True:
+            job = write_queue.get()
+            if job is None:
+                break
+            url, base_filename, batch = job
+            start = time.monotonic()
+            # change_rss.py не переносит файлы, пока идёт запись
+            with file_lock(FEEDS_LOCK):
+                added = save_items(batch, base_filename, story_index, html_store, alerts, segments, stats)
+            new_links.extend(added.links)
+            write_stats.add(jobs=1, items=len(added), busy=time.monotonic() - start)
+            if added and on_feed_updated is not None:
+                on_feed_updated(url, base_filename + ".csv", len(added))
+    finally:
+        # После исключения в записи разбор может ждать места в write_queue - разгружаем её,
+        # пока стадии не закроются
+        stop.set()
+        while any(closer.is_alive() for closer in closers):
+            try:
+                write_queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        for closer in closers:
+            closer.join()
+        if own_executor and parse_executor is not None:
+            parse_executor.shutdown()
+
+    wall = time.monotonic() - started
+    print(f"Pipeline: {len(feed_rows)} feeds in {wall:.1f} s")
+    for stage_stats in (fetch_stats, parse_stats, write_stats):
+        print("  " + stage_stats.report(wall))
+
+    clearance_cache.save()
+    proxy_pool.save()
+    print(challenge_stats.report())
+
+    # Предзагрузка статей новых элементов для режима чтения
+    if settings["prefetch_articles"] and new_links:
+        if reader_cache is None:
+            reader_cache = ReaderCache(max_bytes=settings["reader_cache_mb"] * 1024 * 1024,
+                                       max_entries=settings["reader_cache_entries"])
+        prefetch_articles(new_links, scraper, reader_cache, max_workers=settings["prefetch_workers"])
+    return len(new_links)
 
 if __name__ == "__main__":
     fetch_feeds()
+    if PROFILER.enabled:
+        PROFILER.snapshot()
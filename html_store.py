@@ -0,0 +1,179 @@
+import os
+import re
+import html
+import zlib
+import threading
+
+from enrich import item_id
+
+HTML_STORE_DIR = "data/html_store"
+
+# Длина текстового описания, которое остаётся в CSV
+SUMMARY_CHARS = 300
+
+# Общий словарь сжатия для коротких HTML-описаний. Не менять: без него
+# уже записанные блоки не распаковать.
+ZDICT = ('</a></p></li></ul></div></span></strong></em><br /><br/>'
+         '<p><a href="https://<img src="https://" alt="" width="" height="" />'
+         '<div class="<span class="<strong><em><ul><li><blockquote>'
+         '&nbsp;&quot;&amp;&laquo;&raquo;&mdash;&#8217;&#8230; target="_blank" rel="nofollow"'
+         'Read more</a> The post appeared first on Читать далее').encode('utf-8')
+
+TAG_RE = re.compile(r'<[^>]+>')
+DROP_RE = re.compile(r'<(script|style)\b.*?</\1\s*>', re.S | re.I)
+
+def html_text(description):
+    """Plain text of an HTML description on one line, scripts and styles dropped."""
+    text = DROP_RE.sub(" ", description)
+    return " ".join(html.unescape(TAG_RE.sub(" ", text)).split())
+
+def summarize(description, limit=SUMMARY_CHARS):
+    """Plain text of an HTML description, cut at a word boundary to about limit characters."""
+    text = html_text(description)
+    if len(text) > limit:
+        text = text[:limit].rsplit(" ", 1)[0].rstrip(",.;:-") + "…"
+    return text
+
+def needs_store(description, limit=SUMMARY_CHARS):
+    """True if the description is markup or too long to keep inline."""
+    return len(description) > limit or "<" in description or "&" in description
+
+def _compress(text):
+    c = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS, zdict=ZDICT)
+    return c.compress(text.encode('utf-8')) + c.flush()
+
+def _decompress(data):
+    d = zlib.decompressobj(zlib.MAX_WBITS, zdict=ZDICT)
+    return (d.decompress(data) + d.flush()).decode('utf-8')
+
+class HtmlStore:
+    """Append-only compressed store of full item descriptions keyed by item id.
+
+    Layout:
+        data/html_store/000001.blob - zlib records, one per item, appended
+        data/html_store/index.tsv   - item_id, segment, offset, length; the last line wins
+
+    Writers hold FEEDS_LOCK (fetchrss.py), readers follow the index as it grows.
+    """
+
+    def __init__(self, store_dir=HTML_STORE_DIR, segment_bytes=16 * 1024 * 1024):
+        self.store_dir = store_dir
+        self.segment_bytes = segment_bytes
+        self.index_path = os.path.join(store_dir, "index.tsv")
+        self.lock = threading.Lock()
+        self.index = {}       # item_id -> (segment, offset, length)
+        self.index_pos = 0    # сколько байт index.tsv уже прочитано
+        self.segment = 1
+        os.makedirs(store_dir, exist_ok=True)
+
+    def _segment_path(self, segment):
+        return os.path.join(self.store_dir, f"{segment:06d}.blob")
+
+    def _reload(self):
+        """Read index lines appended since the last call, by this or another process."""
+        try:
+            size = os.path.getsize(self.index_path)
+        except OSError:
+            return
+        if size < self.index_pos:
+            # Индекс пересоздан (очистка) - читаем заново
+            self.index = {}
+            self.index_pos = 0
+        if size == self.index_pos:
+            return
+        with open(self.index_path, 'rb') as f:
+            f.seek(self.index_pos)
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].decode('utf-8').splitlines():
+            try:
+                item_id, segment, offset, length = line.split("\t")
+                self.index[item_id] = (int(segment), int(offset), int(length))
+                self.segment = max(self.segment, int(segment))
+            except ValueError:
+                continue
+        self.index_pos += end
+
+    def __contains__(self, item_id):
+        with self.lock:
+            self._reload()
+            return item_id in self.index
+
+    def get(self, item_id):
+        """Full description HTML for item_id, or None."""
+        with self.lock:
+            self._reload()
+            entry = self.index.get(item_id)
+        if entry is None:
+            return None
+        segment, offset, length = entry
+        try:
+            with open(self._segment_path(segment), 'rb') as f:
+                f.seek(offset)
+                return _decompress(f.read(length))
+        except (OSError, zlib.error) as e:
+            print(f"Error reading stored description {item_id}: {e}")
+            return None
+
+    def get_many(self, item_ids):
+        """{item_id: HTML} of the stored ones, read in file order with each segment opened once."""
+        with self.lock:
+            self._reload()
+            entries = sorted((entry, item_id) for item_id in item_ids
+                             if (entry := self.index.get(item_id)) is not None)
+        found = {}
+        f = None
+        current = None
+        try:
+            for (segment, offset, length), item_id in entries:
+                if segment != current:
+                    if f is not None:
+                        f.close()
+                    f = open(self._segment_path(segment), 'rb')
+                    current = segment
+                f.seek(offset)
+                try:
+                    found[item_id] = _decompress(f.read(length))
+                except zlib.error as e:
+                    print(f"Error reading stored description {item_id}: {e}")
+        except OSError as e:
+            print(f"Error reading stored descriptions: {e}")
+        finally:
+            if f is not None:
+                f.close()
+        return found
+
+    def put_many(self, items):
+        """Store (item_id, html) pairs; items already stored are skipped."""
+        with self.lock:
+            self._reload()
+            path = self._segment_path(self.segment)
+            if os.path.exists(path) and os.path.getsize(path) >= self.segment_bytes:
+                self.segment += 1
+                path = self._segment_path(self.segment)
+            lines = []
+            with open(path, 'ab') as f:
+                offset = f.tell()
+                for item_id, text in items:
+                    if item_id in self.index:
+                        continue
+                    data = _compress(text)
+                    f.write(data)
+                    self.index[item_id] = (self.segment, offset, len(data))
+                    lines.append(f"{item_id}\t{self.segment}\t{offset}\t{len(data)}\n")
+                    offset += len(data)
+            if lines:
+                with open(self.index_path, 'a', encoding='utf-8') as f:
+                    f.writelines(lines)
+                self.index_pos = os.path.getsize(self.index_path)
+
+def store_descriptions(batch, indices, store):
+    """Move the HTML descriptions of batch rows into store, leaving plain-text summaries inline."""
+    pairs = []
+    for i in indices:
+        description = batch.descriptions[i]
+        if needs_store(description):
+            pairs.append((item_id(batch.links[i]), description))
+            batch.descriptions[i] = summarize(description)
+    if pairs:
+        store.put_many(pairs)
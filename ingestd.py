@@ -0,0 +1,188 @@
+# Headless ingestion service: fetches feeds at :00 and :30, rolls them over
+# at 00:00 and pushes events to connected NeuroLit windows over a local socket.
+# With websub_callback set in settings, feeds whose hub supports WebSub are
+# pushed to a callback server instead of being polled (see websub.py).
+#
+#   python ingestd.py            - run as a service (see neurolit-ingestd.service)
+#   python ingestd.py --once     - fetch once and exit
+
+import os
+import sys
+import json
+import argparse
+from datetime import datetime
+
+from PySide6.QtCore import QCoreApplication, QObject, QTimer, Signal
+from PySide6.QtNetwork import QLocalServer, QLocalSocket
+
+from ipc import SERVER_NAME, encode_message
+from settings import load_settings
+from enrich import StoryIndex
+from reader_cache import ReaderCache
+from jobs import JobRunner
+from clearance import ClearanceCache
+from proxy_pool import ProxyPool
+from html_store import HtmlStore
+from alerts import AlertLog
+from websub import WebSubSubscriber
+from feed_stats import FeedStats
+from retention import run_retention
+import fetchrss
+import change_rss
+
+class IngestService(QObject):
+    # Сигнал из рабочего потока в поток цикла событий
+    event_ready = Signal(dict)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.settings = load_settings()
+        # Тёплое состояние между запусками: сессия с пулом соединений и индексы
+        self.scraper = fetchrss.create_scraper()
+        self.story_index = StoryIndex(max_age_days=self.settings["story_index_days"])
+        self.reader_cache = ReaderCache(max_bytes=self.settings["reader_cache_mb"] * 1024 * 1024,
+                                        max_entries=self.settings["reader_cache_entries"])
+        self.clearance_cache = ClearanceCache()
+        self.proxy_pool = ProxyPool()
+        self.html_store = HtmlStore()
+        self.alerts = AlertLog()
+        self.stats = FeedStats()
+        self.parse_executor = fetchrss.create_parse_executor(self.settings["parse_processes"])
+        self.websub = None
+        if self.settings["websub_callback"]:
+            # Push-доставка: фиды с хабом приходят сами, опрос их пропускает
+            self.websub = WebSubSubscriber(
+                self.settings["websub_callback"], port=self.settings["websub_port"],
+                story_index=self.story_index, html_store=self.html_store, alerts=self.alerts, stats=self.stats,
+                segment_bytes=self.settings["segment_mb"] * 1024 * 1024,
+                lease_hours=self.settings["websub_lease_hours"], poll_hours=self.settings["websub_poll_hours"],
+                on_feed_updated=lambda url, csv_file, count: self.emit_event(
+                    "feed_updated", feed=url, file=os.path.abspath(csv_file), count=count, push=True))
+        self.runner = JobRunner(on_event=lambda event, job, **details: self.emit_event(event, job=job, **details))
+        self.last_tick = None
+        self.clients = {}  # socket -> buffer of unread bytes
+
+        self.event_ready.connect(self.broadcast)
+
+        self.server = QLocalServer(self)
+        self.server.newConnection.connect(self.accept_client)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.check_schedule)
+
+    def start(self):
+        probe = QLocalSocket()
+        probe.connectToServer(SERVER_NAME)
+        if probe.waitForConnected(1000):
+            print("ingestd is already running")
+            return False
+        # Сокет мог остаться от упавшего процесса
+        QLocalServer.removeServer(SERVER_NAME)
+        if not self.server.listen(SERVER_NAME):
+            print(f"Cannot listen on {SERVER_NAME}: {self.server.errorString()}")
+            return False
+        print(f"ingestd listening on {self.server.fullServerName()}")
+        if self.websub is not None and not self.websub.start():
+            self.websub = None
+        self.timer.start(20000)
+        return True
+
+    # ---- Clients ----
+
+    def accept_client(self):
+        while self.server.hasPendingConnections():
+            socket = self.server.nextPendingConnection()
+            socket.readyRead.connect(lambda socket=socket: self.read_command(socket))
+            socket.disconnected.connect(lambda socket=socket: self.drop_client(socket))
+            self.clients[socket] = b""
+            socket.write(encode_message({"event": "hello", "busy": self.is_busy()}))
+
+    def drop_client(self, socket):
+        self.clients.pop(socket, None)
+        socket.deleteLater()
+
+    def read_command(self, socket):
+        buffer = self.clients.get(socket, b"") + bytes(socket.readAll())
+        *lines, self.clients[socket] = buffer.split(b"\n")
+        for line in lines:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(message, dict):
+                continue  # команды - только объекты {"command": ...}
+            command = message.get("command")
+            if command == "fetch":
+                self.run_fetch()
+            elif command == "rollover":
+                self.run_rollover()
+
+    def broadcast(self, message):
+        data = encode_message(message)
+        for socket in list(self.clients):
+            socket.write(data)
+            socket.flush()
+
+    def emit_event(self, event, **kwargs):
+        """Thread-safe: queue an event for all connected clients."""
+        self.event_ready.emit(dict(kwargs, event=event))
+
+    # ---- Jobs ----
+
+    def is_busy(self):
+        return self.runner.is_active()
+
+    def check_schedule(self):
+        now = datetime.now()
+        tick = (now.hour, now.minute)
+        if tick == self.last_tick:
+            return
+        self.last_tick = tick
+        if now.minute == 0 or now.minute == 30:
+            self.run_fetch()
+        if now.hour == 0 and now.minute == 0:
+            self.run_rollover()
+
+    def run_fetch(self):
+        return self.runner.submit("fetch", lambda: fetchrss.fetch_feeds(
+            scraper=self.scraper,
+            story_index=self.story_index,
+            reader_cache=self.reader_cache,
+            clearance_cache=self.clearance_cache,
+            proxy_pool=self.proxy_pool,
+            parse_executor=self.parse_executor,
+            html_store=self.html_store,
+            alerts=self.alerts,
+            websub=self.websub,
+            stats=self.stats,
+            on_feed_updated=lambda url, csv_file, count: self.emit_event(
+                "feed_updated", feed=url, file=os.path.abspath(csv_file), count=count),
+        ))
+
+    def run_rollover(self):
+        # Перенос в global_feeds только после завершения текущего сбора
+        job = self.runner.submit("rollover", change_rss.save_daily_feeds_to_global, after=("fetch",))
+        # Очистка по лимитам хранения - после переноса, когда новые сегменты уже в global_feeds
+        self.runner.submit("retention", run_retention, after=("rollover",))
+        return job
+
+def main():
+    parser = argparse.ArgumentParser(description="NeuroLit headless ingestion service")
+    parser.add_argument("--once", action="store_true", help="fetch all feeds once and exit")
+    args = parser.parse_args()
+
+    # Все пути data/... относительно каталога программы
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    if args.once:
+        fetchrss.fetch_feeds()
+        return 0
+
+    app = QCoreApplication(sys.argv)
+    service = IngestService()
+    if not service.start():
+        return 1
+    return app.exec()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+import json
+
+from PySide6.QtCore import QObject, QTimer, Signal
+from PySide6.QtNetwork import QLocalSocket
+
+# Имя локального сокета ingestd.py (Unix socket / named pipe на Windows)
+SERVER_NAME = "neurolit-ingestd"
+
+def encode_message(message):
+    """One JSON object per line."""
+    return (json.dumps(message, ensure_ascii=False) + "\n").encode('utf-8')
+
+class IngestClient(QObject):
+    """GUI side connection to ingestd.py; reconnects while the daemon is not running.
+
+    Events from the daemon arrive as dicts, e.g.
+        {"event": "feed_updated", "feed": url, "file": absolute_csv_path, "count": n}
+    """
+
+    event_received = Signal(dict)
+    connection_changed = Signal(bool)
+
+    def __init__(self, parent=None, retry_interval=10000):
+        super().__init__(parent)
+        self.socket = QLocalSocket(self)
+        self.socket.readyRead.connect(self._read_events)
+        self.socket.connected.connect(self._on_connected)
+        self.socket.disconnected.connect(self._on_disconnected)
+        self.buffer = b""
+        self.retry_timer = QTimer(self)
+        self.retry_timer.timeout.connect(self.connect_to_daemon)
+        self.retry_timer.start(retry_interval)
+        self.connect_to_daemon()
+
+    def connect_to_daemon(self):
+        if self.socket.state() == QLocalSocket.UnconnectedState:
+            self.socket.connectToServer(SERVER_NAME)
+
+    def is_connected(self):
+        return self.socket.state() == QLocalSocket.ConnectedState
+
+    def send_command(self, command, **kwargs):
+        """Ask the daemon to run a job ("fetch", "rollover"). Returns False if not connected."""
+        if not self.is_connected():
+            return False
+        self.socket.write(encode_message(dict(kwargs, command=command)))
+        self.socket.flush()
+        return True
+
+    def _on_connected(self):
+        self.buffer = b""
+        self.connection_changed.emit(True)
+
+    def _on_disconnected(self):
+        self.connection_changed.emit(False)
+
+    def _read_events(self):
+        self.buffer += bytes(self.socket.readAll())
+        *lines, self.buffer = self.buffer.split(b"\n")
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                self.event_received.emit(json.loads(line))
+            except ValueError as e:
+                print(f"Bad message from ingestd: {e}")
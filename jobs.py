@@ -0,0 +1,143 @@
+import os
+import sys
+import csv
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+if sys.platform == 'win32':
+    import msvcrt
+else:
+    import fcntl
+
+# От каталога программы, а не от текущего: GUI и запущенные им скрипты должны брать одни и те же файлы
+LOCKS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "locks")
+# Запись в data/feeds/*.csv и перенос в global_feeds
+FEEDS_LOCK = os.path.join(LOCKS_DIR, "feeds.lock")
+# Один запуск fetchrss за раз
+FETCH_LOCK = os.path.join(LOCKS_DIR, "fetch.lock")
+# Изменение списка фидов data/feeds.csv
+FEED_LIST_LOCK = os.path.join(LOCKS_DIR, "feed_list.lock")
+
+JOB_HISTORY_FILE = "data/jobs_history.tsv"
+
+class LockTimeout(Exception):
+    pass
+
+def _try_lock(f):
+    try:
+        if sys.platform == 'win32':
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+def _unlock(f):
+    if sys.platform == 'win32':
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+@contextmanager
+def file_lock(path, timeout=None):
+    """Exclusive advisory lock on path, shared by all NeuroLit processes and threads.
+
+    timeout=None waits forever, timeout=0 fails immediately; LockTimeout is
+    raised if the lock is not acquired in time.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    f = open(path, 'a+')
+    try:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not _try_lock(f):
+            if deadline is not None and time.monotonic() >= deadline:
+                raise LockTimeout(f"Lock is busy: {path}")
+            time.sleep(0.1)
+        try:
+            yield
+        finally:
+            _unlock(f)
+    finally:
+        f.close()
+
+class JobRunner:
+    """Runs named jobs in background threads.
+
+    A job with after=("fetch",) waits until every listed job that is queued
+    or running at submit time has finished. A job is not submitted twice
+    while it is still queued or running. Each run is appended to
+    data/jobs_history.tsv with its duration and status.
+    """
+
+    HISTORY_FIELDS = ["job", "started", "duration", "status", "error"]
+
+    def __init__(self, history_path=JOB_HISTORY_FILE, on_event=None):
+        self.history_path = history_path
+        self.on_event = on_event  # on_event(event, job, **details), из рабочего потока
+        self.active = {}          # name -> threading.Event, выставляется по завершении
+        self.lock = threading.Lock()
+
+    def is_active(self, name=None):
+        with self.lock:
+            return bool(self.active) if name is None else name in self.active
+
+    def submit(self, name, func, after=()):
+        """Queue func as job name. Returns False if that job is already queued or running."""
+        with self.lock:
+            if name in self.active:
+                print(f"Job {name} is already running, skipped")
+                return False
+            waits = [self.active[dep] for dep in after if dep in self.active]
+            done = threading.Event()
+            self.active[name] = done
+        threading.Thread(target=self._run, args=(name, func, waits, done), daemon=True).start()
+        return True
+
+    def _run(self, name, func, waits, done):
+        for event in waits:
+            event.wait()
+        started = time.time()
+        self._notify("job_started", name)
+        status, error, result = "ok", "", None
+        try:
+            result = func()
+        except Exception as e:
+            status, error = "failed", str(e)
+            print(f"Job {name} failed: {e}")
+        duration = time.time() - started
+        self._record(name, started, duration, status, error)
+        with self.lock:
+            del self.active[name]
+        done.set()
+        self._notify("job_finished", name, ok=status == "ok", error=error, result=result, duration=round(duration, 1))
+
+    def _notify(self, event, name, **details):
+        if self.on_event is not None:
+            try:
+                self.on_event(event, name, **details)
+            except Exception as e:
+                print(f"Job event handler failed: {e}")
+
+    def _record(self, name, started, duration, status, error):
+        try:
+            os.makedirs(os.path.dirname(self.history_path) or ".", exist_ok=True)
+            with file_lock(self.history_path + ".lock", timeout=10):
+                file_exists = os.path.exists(self.history_path)
+                with open(self.history_path, 'a', newline='', encoding='utf-8') as f:
+                    writer = csv.DictWriter(f, fieldnames=self.HISTORY_FIELDS, delimiter='\t')
+                    if not file_exists:
+                        writer.writeheader()
+                    writer.writerow({
+                        "job": name,
+                        "started": datetime.fromtimestamp(started).strftime("%Y-%m-%d %H:%M:%S"),
+                        "duration": f"{duration:.1f}",
+                        "status": status,
+                        "error": error.replace("\t", " ").replace("\n", " "),
+                    })
+        except Exception as e:
+            print(f"Error saving job history: {e}")
@@ -3,9 +3,10 @@ import os
 import csv
 import subprocess
 import shutil
+import time
 import ctypes  # Для исправления иконки в панели задач
 
-from PySide6.QtCore import QUrl, Qt, QTimer, QDateTime
+from PySide6.QtCore import QUrl, Qt, QTimer, QDateTime, Signal, QPointF, QFileSystemWatcher
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QToolBar, QLineEdit,
     QPushButton, QTabWidget, QVBoxLayout, QWidget,
@@ -29,11 +30,57 @@ except ImportError:
     CSVViewerTab = None 
     print("Warning: csv_viewer module not found.")
 
+from settings import load_settings
+from reader_cache import ReaderCache
+from html_store import HtmlStore
+from content_filter import FilterEngine, TabRequestFilter
+from ipc import IngestClient
+from jobs import JobRunner, file_lock, LockTimeout, FEED_LIST_LOCK
+from proxy_pool import ProxyPool, parse_proxy_list, DIRECT
+from proxy_routes import ProxyRouter, RouteStats, apply_proxy_rules
+from tab_queue import TabLoadQueue
+from timeline import TimelineIndex
+from sort_index import SortIndex
+from alerts import read_alerts
+from profiling import PROFILER, PROFILE_ENV, profiled
+from timeline_view import TimelineTab
+from stats_view import StatsTab
+from feed_stats import FeedStats
+from retention import last_run
+from session import (PlaceholderTab, save_history, history_urls, restore_history,
+                     load_session, save_session)
+
 # [FIX] Исправление группировки иконки в панели задач Windows 11
 if sys.platform == 'win32':
     myappid = 'neurolit.browser.client.1.0'  # Уникальный ID приложения
     ctypes.windll.shell32.SetCurrentProcessExplicitAppUserModelID(myappid)
 
+HOMEPAGE = "https://www.google.com/search?q=&udm=50&hl=ru"
+# Каталог программы: скрипты сбора запускаются в нём, как ingestd.py, с путями data/... от него
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+# Каталог данных рядом с программой; MainWindow(data_dir=...) задают бенчмарки
+DATA_DIR = os.path.join(APP_DIR, "data")
+
+def tab_label(title):
+    return title[:29] + "..." if len(title) > 32 else title
+
+def renderer_memory_kb(pid):
+    """Return resident memory of a renderer process in KB, or None if unknown."""
+    if not pid:
+        return None
+    try:
+        with open(f"/proc/{pid}/status", 'r') as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    try:
+        import psutil
+        return psutil.Process(pid).memory_info().rss // 1024
+    except Exception:
+        return None
+
 class BrowserTab(QWidget):
     def __init__(self, main_window, profile=None):
         super().__init__()
@@ -42,24 +89,142 @@ class BrowserTab(QWidget):
         self.layout.setContentsMargins(0, 0, 0, 0)
         self.browser = QWebEngineView()
         
+        self.request_filter = None
         if profile is not None:
             page = QWebEnginePage(profile, self.browser)
             self.browser.setPage(page)
+            engine = main_window.filter_engine
+            if engine is not None and len(engine):
+                self.request_filter = TabRequestFilter(engine, self)
+                page.setUrlRequestInterceptor(self.request_filter)
+                self.browser.loadStarted.connect(self.request_filter.reset)
+                self.request_filter.blocked_changed.connect(lambda _: main_window.schedule_blocked_update(self))
             
         self.browser.createWindow = self.create_window
         self.layout.addWidget(self.browser)
 
+        # Hibernation state
+        self.discardable = True
+        self.last_active = time.monotonic()
+        self.saved_scroll = None
+        self.browser.loadFinished.connect(self._restore_scroll)
+
+        # История из сеанса без QDataStream: [адреса, позиция]; страница загружается при переходе к ней
+        self.saved_history = None
+        self.saved_loading = False
+        self.browser.urlChanged.connect(self._check_saved_history)
+
+        # Время загрузки для статистики маршрутов прокси
+        self.load_started = None
+        self.browser.loadStarted.connect(self._on_load_started)
+        self.browser.loadFinished.connect(self._on_load_finished)
+
     def create_window(self, _type):
         return self.main_window.add_new_tab()
 
+    def is_discarded(self):
+        return self.browser.page().lifecycleState() == QWebEnginePage.LifecycleState.Discarded
+
+    def discard(self):
+        """Free the renderer of a hidden tab, keeping its URL, history and scroll position."""
+        page = self.browser.page()
+        if not self.discardable or self.is_discarded() or self.isVisible() or page.url().isEmpty():
+            return False
+        self.saved_scroll = page.scrollPosition()
+        page.setLifecycleState(QWebEnginePage.LifecycleState.Discarded)
+        return True
+
+    def activate(self):
+        """Mark the tab as used; a discarded page is reloaded from its history."""
+        self.last_active = time.monotonic()
+        page = self.browser.page()
+        if page.lifecycleState() != QWebEnginePage.LifecycleState.Active:
+            page.setLifecycleState(QWebEnginePage.LifecycleState.Active)
+
+    def load_saved_history(self, urls, index):
+        """Show entry index of a saved history, keeping the others for back and forward without loading them."""
+        index = min(index, len(urls) - 1) if index >= 0 else len(urls) - 1
+        self.saved_history = [list(urls), index]
+        self.saved_loading = True
+        self.browser.setUrl(QUrl(urls[index]))
+
+    def _go_saved(self, step):
+        urls, index = self.saved_history
+        if 0 <= index + step < len(urls):
+            self.saved_history[1] = index + step
+            self.saved_loading = True
+            self.browser.setUrl(QUrl(urls[index + step]))
+
+    def back(self):
+        if self.saved_history is not None:
+            self._go_saved(-1)
+        else:
+            self.browser.back()
+
+    def forward(self):
+        if self.saved_history is not None:
+            self._go_saved(1)
+        else:
+            self.browser.forward()
+
+    def _check_saved_history(self, url):
+        # Переход не по сохранённой истории (ссылка, адресная строка) - дальше работает обычная история;
+        # смена адреса во время своей загрузки - редирект
+        if self.saved_history is None or self.saved_loading:
+            return
+        urls, index = self.saved_history
+        if url.toString().rstrip("/") != urls[index].rstrip("/"):
+            self.saved_history = None
+
+    def _on_load_started(self):
+        self.load_started = time.monotonic()
+
+    def _on_load_finished(self, ok):
+        self.saved_loading = False
+        if ok and self.load_started is not None:
+            host = self.browser.url().host()
+            if host:
+                self.main_window.record_route_latency(host, time.monotonic() - self.load_started)
+        self.load_started = None
+
+    def _restore_scroll(self, ok):
+        if ok and self.saved_scroll is not None:
+            pos = self.saved_scroll
+            self.saved_scroll = None
+            self.browser.page().runJavaScript(f"window.scrollTo({pos.x()}, {pos.y()});")
+
+    def memory_kb(self):
+        """Resident memory of the renderer process (shared between tabs of one site)."""
+        if self.is_discarded():
+            return 0
+        return renderer_memory_kb(self.browser.page().renderProcessPid())
+
+    def blocked_count(self):
+        return self.request_filter.take_count() if self.request_filter is not None else 0
+
+    def dispose(self):
+        """Release the page and the view of a closed tab."""
+        page = self.browser.page()
+        if self.request_filter is not None:
+            page.setUrlRequestInterceptor(None)
+        self.browser.loadFinished.disconnect()
+        self.browser.urlChanged.disconnect()
+        self.browser.stop()
+        page.deleteLater()
+        self.browser.deleteLater()
+        self.deleteLater()
+
 class MainWindow(QMainWindow):
-    def __init__(self):
+    # Завершение фонового задания (из потока JobRunner)
+    job_event = Signal(str, str, dict)
+
+    def __init__(self, data_dir=None):
         super().__init__()
         self.setWindowTitle("NeuroLit - Neuronet Literature")
         
-        # Настройка путей
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        icon_path = os.path.join(base_dir, "favicon.png")
+        # Настройка путей; data_dir задают бенчмарки и тесты со своим каталогом данных
+        icon_path = os.path.join(APP_DIR, "favicon.png")
+        self.data_dir = data_dir or DATA_DIR
         
         # Установка иконки окна
         if os.path.exists(icon_path):
@@ -67,9 +232,10 @@ class MainWindow(QMainWindow):
         
         self.resize(1200, 800)
         self.feed_page = 0
+        self.active_tab = None
 
         # Persistent profile for cookie/session storage
-        storage_path = os.path.join(base_dir, "data", "profile")
+        storage_path = os.path.join(self.data_dir, "profile")
         self.profile = QWebEngineProfile("neurolit", self)
         self.profile.setPersistentStoragePath(storage_path)
         self.profile.setPersistentCookiesPolicy(QWebEngineProfile.ForcePersistentCookies)
@@ -89,13 +255,14 @@ class MainWindow(QMainWindow):
 
         # Back Button
         back_btn = QPushButton("<")
-        back_btn.clicked.connect(lambda: self.current_browser().back() if self.current_browser() else None)
+        back_btn.clicked.connect(lambda: self.current_browser_tab().back() if self.current_browser_tab() else None)
         back_btn.setFixedWidth(32)
         nav_bar.addWidget(back_btn)
 
         # Forward Button
         next_btn = QPushButton(">")
-        next_btn.clicked.connect(lambda: self.current_browser().forward() if self.current_browser() else None)
+        next_btn.clicked.connect(
+            lambda: self.current_browser_tab().forward() if self.current_browser_tab() else None)
         next_btn.setFixedWidth(32)
         nav_bar.addWidget(next_btn)
 
@@ -135,9 +302,30 @@ class MainWindow(QMainWindow):
         sidebar_layout.setAlignment(Qt.AlignTop)
 
         # Ensure data directory exists
-        self.data_dir = os.path.join(base_dir, "data")
         os.makedirs(self.data_dir, exist_ok=True)
         os.makedirs(os.path.join(self.data_dir, "history"), exist_ok=True)
+        self.settings = load_settings(os.path.join(self.data_dir, "settings.json"))
+        self.reader_cache = ReaderCache(os.path.join(self.data_dir, "reader_cache"),
+                                        max_bytes=self.settings["reader_cache_mb"] * 1024 * 1024,
+                                        max_entries=self.settings["reader_cache_entries"])
+        # Полные HTML-описания элементов фидов, в CSV остаётся краткий текст
+        self.html_store = HtmlStore(os.path.join(self.data_dir, "html_store"))
+        # Фильтр рекламы и трекеров для всех вкладок (списки в data/filters/*.txt)
+        self.filter_engine = FilterEngine.from_directory(os.path.join(self.data_dir, "filters"))
+        # Маршруты прокси по хостам (data/proxy_rules.txt, применяются через PAC при запуске)
+        self.proxy_router = ProxyRouter.from_file(os.path.join(self.data_dir, "proxy_rules.txt"))
+        self.route_stats = RouteStats()
+        # Диапазоны времени файлов фидов для ленты
+        self.timeline_index = TimelineIndex(os.path.join(self.data_dir, "timeline_index.json"),
+                                            (os.path.join(self.data_dir, "feeds"),
+                                             os.path.join(self.data_dir, "global_feeds")))
+        # Сводки по фидам, которые fetchrss.py дописывает при каждой записи
+        self.feed_stats = FeedStats(os.path.join(self.data_dir, "feed_stats.tsv"),
+                                    (os.path.join(self.data_dir, "feeds"),
+                                     os.path.join(self.data_dir, "global_feeds")))
+        # Сохранённые перестановки для сортировки колонок в просмотре CSV
+        self.sort_index = SortIndex(os.path.join(self.data_dir, "sort_index"),
+                                    memory_bytes=self.settings["sort_memory_mb"] * 1024 * 1024)
 
         # Tree Widget for collapsible sidebar sections
         self.sidebar_tree = QTreeWidget()
@@ -151,6 +339,14 @@ class MainWindow(QMainWindow):
         self.feeds_tree_item = QTreeWidgetItem(self.sidebar_tree, ["Feeds"])
         self.feeds_tree_item.setFlags(self.feeds_tree_item.flags() | Qt.ItemIsEnabled)
 
+        # Timeline: all feeds merged by publication time
+        self.timeline_tree_item = QTreeWidgetItem(self.sidebar_tree, ["Timeline"])
+        self.timeline_tree_item.setFlags(self.timeline_tree_item.flags() | Qt.ItemIsEnabled)
+
+        # Statistics: items per day and last update of every feed
+        self.stats_tree_item = QTreeWidgetItem(self.sidebar_tree, ["Statistics"])
+        self.stats_tree_item.setFlags(self.stats_tree_item.flags() | Qt.ItemIsEnabled)
+
         # Bookmarks folder (collapsible)
         self.bookmarks_tree_item = QTreeWidgetItem(self.sidebar_tree, ["Bookmarks"])
         self.bookmarks_tree_item.setFlags(self.bookmarks_tree_item.flags() | Qt.ItemIsEnabled)
@@ -165,6 +361,14 @@ class MainWindow(QMainWindow):
         # Settings top-level item
         self.settings_tree_item = QTreeWidgetItem(self.sidebar_tree, ["Settings"])
         self.settings_tree_item.setFlags(self.settings_tree_item.flags() | Qt.ItemIsEnabled)
+        # Профилирование (или NEUROLIT_PROFILE=...): отчёты в data/profiling
+        PROFILER.report_dir = os.path.join(self.data_dir, "profiling")
+        self.profiling_tree_item = QTreeWidgetItem(self.settings_tree_item, ["Profiling"])
+        self.profiling_tree_item.setFlags(self.profiling_tree_item.flags() | Qt.ItemIsUserCheckable)
+        self.profiling_tree_item.setCheckState(0, Qt.Checked if PROFILER.enabled else Qt.Unchecked)
+        # Очистка data/ по лимитам хранения ("retention" в data/settings.json) прямо сейчас
+        self.retention_tree_item = QTreeWidgetItem(self.settings_tree_item, ["Retention"])
+        self.retention_tree_item.setToolTip(0, last_run(os.path.join(self.data_dir, "retention.tsv")) or "Not run yet")
 
         self.sidebar_tree.itemClicked.connect(self.sidebar_tree_item_clicked)
         self.sidebar_tree.itemExpanded.connect(self.sidebar_tree_item_expanded)
@@ -235,7 +439,7 @@ class MainWindow(QMainWindow):
         # Proxy Input
         proxy_layout = QHBoxLayout()
         self.proxy_input = QLineEdit()
-        self.proxy_input.setPlaceholderText("Proxy URL")
+        self.proxy_input.setPlaceholderText("Proxy URL, list or auto")
         self.proxy_input.setStyleSheet("color: green;")
         proxy_layout.addWidget(self.proxy_input)
         
@@ -271,18 +475,68 @@ class MainWindow(QMainWindow):
         self.status_bar = QStatusBar()
         self.setStatusBar(self.status_bar)
         self.status_bar.showMessage("Ready")
+        self.route_label = QLabel()
+        self.status_bar.addPermanentWidget(self.route_label)
+        self.memory_label = QLabel()
+        self.status_bar.addPermanentWidget(self.memory_label)
+        self.memory_text = ""
+        # Счётчик блокировок обновляется не чаще раза в четверть секунды, без опроса памяти
+        self.blocked_timer = QTimer(self)
+        self.blocked_timer.setSingleShot(True)
+        self.blocked_timer.setInterval(250)
+        self.blocked_timer.timeout.connect(self.update_blocked_label)
 
         # [FIX] Настройка системного трея
         self.setup_tray_icon(icon_path)
 
-        # Initial Tab
-        self.add_new_tab(QUrl("https://www.google.com/search?q=&udm=50&hl=ru"), "Homepage")
+        # Срабатывания правил data/alerts.txt пишет сбор фидов (fetchrss.py или ingestd.py);
+        # новые строки data/alerts.tsv показываются уведомлением в трее
+        self.alerts_path = os.path.join(self.data_dir, "alerts.tsv")
+        self.alerts_offset = os.path.getsize(self.alerts_path) if os.path.exists(self.alerts_path) else 0
+        self.last_alert_link = None
+        self.alerts_watcher = QFileSystemWatcher([self.data_dir], self)
+        self.alerts_watcher.directoryChanged.connect(self.check_alerts)
+        self.alerts_watcher.fileChanged.connect(self.check_alerts)
+        self.tray_icon.messageClicked.connect(self.open_last_alert)
+        self.check_alerts()
+
+        # Фоновые вкладки загружаются по очереди: не больше max_loading_tabs сразу и preload_tabs заранее
+        self.load_queue = TabLoadQueue(self, BrowserTab, max_loading=self.settings["max_loading_tabs"],
+                                       max_preload=self.settings["preload_tabs"])
+
+        # Вкладки прошлого сеанса (загружаются при первом открытии), иначе домашняя страница
+        self.session_path = os.path.join(self.data_dir, "session.json")
+        if not self.restore_session():
+            self.add_new_tab(QUrl(HOMEPAGE), "Homepage")
+        QApplication.instance().aboutToQuit.connect(self.save_current_session)
+        QApplication.instance().aboutToQuit.connect(self.reader_cache.flush)
+        self.session_timer = QTimer(self)
+        self.session_timer.timeout.connect(self.save_current_session)
+        self.session_timer.start(60000)
 
         # Setup Scheduled Fetching
         self.fetch_timer = QTimer(self)
         self.fetch_timer.timeout.connect(self.check_schedule)
         self.fetch_timer.start(60000) # Check every minute
 
+        # Связь с ingestd.py: если сервис запущен, он сам выполняет расписание
+        self.ingest_client = IngestClient(self)
+        self.ingest_client.event_received.connect(self.on_ingest_event)
+
+        # Запуск fetchrss.py / change_rss.py без наложения друг на друга
+        self.job_runner = JobRunner(
+            os.path.join(self.data_dir, "jobs_history.tsv"),
+            on_event=lambda event, job, **details: self.job_event.emit(event, job, details))
+        self.job_event.connect(self.on_job_event)
+
+        # Выгрузка неактивных вкладок и обновление памяти
+        self.hibernate_timer = QTimer(self)
+        self.hibernate_timer.timeout.connect(self.hibernate_idle_tabs)
+        self.hibernate_timer.start(30000)
+        self.memory_timer = QTimer(self)
+        self.memory_timer.timeout.connect(self.update_memory_label)
+        self.memory_timer.start(5000)
+
     # --- МЕТОДЫ ДЛЯ ТРЕЯ ---
     def setup_tray_icon(self, icon_path):
         self.tray_icon = QSystemTrayIcon(self)
@@ -316,6 +570,38 @@ class MainWindow(QMainWindow):
             else:
                 self.show_window()
 
+    def check_alerts(self, _path=None):
+        if not os.path.exists(self.alerts_path):
+            return
+        # Файл создаётся при первом срабатывании - после этого следим за ним самим
+        if self.alerts_path not in self.alerts_watcher.files():
+            self.alerts_watcher.addPath(self.alerts_path)
+        if os.path.getsize(self.alerts_path) < self.alerts_offset:
+            self.alerts_offset = 0  # файл очищен вручную
+        rows, self.alerts_offset = read_alerts(self.alerts_path, self.alerts_offset)
+        if not rows:
+            return
+        if len(rows) == 1:
+            title = f"Alert: {rows[0]['rule']}"
+            message = rows[0]["title"]
+            self.last_alert_link = rows[0]["link"]
+        else:
+            rules = sorted({row["rule"] for row in rows})
+            title = f"{len(rows)} alerts: {', '.join(rules[:3])}" + ("..." if len(rules) > 3 else "")
+            message = "\n".join(row["title"] for row in rows[:3])
+            self.last_alert_link = None
+        self.tray_icon.showMessage(title, message, QSystemTrayIcon.Information, 10000)
+        self.status_bar.showMessage(title, 10000)
+
+    def open_last_alert(self):
+        self.show_window()
+        url = self.last_alert_link
+        if url:
+            if not self.add_reader_tab(url):
+                self.add_new_tab(QUrl(url), "Loading...")
+        else:
+            self.add_csv_tab(self.alerts_path, "Alerts")
+
     def show_window(self):
         self.show()
         self.setWindowState(Qt.WindowActive)
@@ -332,6 +618,8 @@ class MainWindow(QMainWindow):
     # -----------------------
 
     def check_schedule(self):
+        if self.ingest_client.is_connected():
+            return
         now = QDateTime.currentDateTime().time()
         hour = now.hour()
         minute = now.minute()
@@ -340,21 +628,55 @@ class MainWindow(QMainWindow):
         if hour == 0 and minute == 0:
             self.run_change_rss()
 
+    def create_browser_tab(self, qurl=None):
+        tab = BrowserTab(self, self.profile)
+        if qurl is not None:
+            tab.browser.setUrl(qurl)
+        tab.browser.urlChanged.connect(lambda qurl, tab=tab: self.update_urlbar(qurl, tab))
+        tab.browser.loadFinished.connect(lambda _, tab=tab: self.update_tab_title(tab))
+        return tab
+
+    def create_reader_tab(self, url):
+        """Browser tab showing the cached reader view of url, or None if it is not cached."""
+        content = self.reader_cache.get(url)
+        if content is None:
+            return None
+        tab = self.create_browser_tab()
+        # Страница из setHtml не восстанавливается после выгрузки
+        tab.discardable = False
+        tab.browser.setHtml(content, QUrl(url))
+        return tab
+
     def add_new_tab(self, qurl=None, label="New Tab"):
         if qurl is None:
-            qurl = QUrl("https://www.google.com/search?q=&udm=50&hl=ru")
+            qurl = QUrl(HOMEPAGE)
         
-        tab = BrowserTab(self, self.profile)
-        tab.browser.setUrl(qurl)
+        tab = self.create_browser_tab(qurl)
+        self.load_queue.track(tab)
         i = self.tabs.addTab(tab, label)
         self.tabs.setCurrentIndex(i)
         
-        # Connect signals
-        tab.browser.urlChanged.connect(lambda qurl, tab=tab: self.update_urlbar(qurl, tab))
-        tab.browser.loadFinished.connect(lambda _, i=i, tab=tab: self.update_tab_title(i, tab))
-        
+        self.hibernate_idle_tabs()
         return tab.browser
 
+    def open_links(self, urls):
+        """Open links as background tabs that load through the load queue."""
+        for url in urls:
+            placeholder = PlaceholderTab({"kind": "browser", "url": url, "title": url})
+            self.tabs.addTab(placeholder, tab_label(url))
+            self.load_queue.enqueue(placeholder)
+        self.status_bar.showMessage(f"Opening {len(urls)} tabs, {len(self.load_queue)} queued", 5000)
+
+    def add_reader_tab(self, url):
+        """Open the cached reader view of url. Returns False if it is not cached."""
+        tab = self.create_reader_tab(url)
+        if tab is None:
+            return False
+        i = self.tabs.addTab(tab, "Reader")
+        self.tabs.setCurrentIndex(i)
+        self.hibernate_idle_tabs()
+        return True
+
     def add_csv_tab(self, file_path, label="CSV Viewer"):
         if CSVViewerTab:
             tab = CSVViewerTab(file_path, self)
@@ -364,13 +686,23 @@ class MainWindow(QMainWindow):
         else:
             print("CSVViewerTab not available")
 
-    def update_tab_title(self, i, tab):
-        title = tab.browser.page().title()
-        if len(title) > 32:
-            display_title = title[:29] + "..."
-        else:
-            display_title = title
-        self.tabs.setTabText(i, display_title)
+    def add_timeline_tab(self):
+        tab = TimelineTab(self, self.timeline_index)
+        i = self.tabs.addTab(tab, "Timeline")
+        self.tabs.setCurrentIndex(i)
+        return tab
+
+    def add_stats_tab(self):
+        tab = StatsTab(self, self.feed_stats)
+        i = self.tabs.addTab(tab, "Statistics")
+        self.tabs.setCurrentIndex(i)
+        return tab
+
+    def update_tab_title(self, tab):
+        i = self.tabs.indexOf(tab)
+        if i == -1:
+            return
+        self.tabs.setTabText(i, tab_label(tab.browser.page().title()))
         self.update_title(tab)
 
     def tab_open_doubleclick(self, i):
@@ -379,18 +711,202 @@ class MainWindow(QMainWindow):
 
     def current_tab_changed(self, i):
         widget = self.tabs.currentWidget()
+        if isinstance(widget, PlaceholderTab):
+            # Открытая вкладка загружается сразу, без очереди
+            self.load_queue.forget(widget)
+            widget = self.load_placeholder(i)
+            if isinstance(widget, BrowserTab):
+                self.load_queue.track(widget)
+        if isinstance(self.active_tab, BrowserTab):
+            self.active_tab.last_active = time.monotonic()
+        self.active_tab = widget
         if isinstance(widget, BrowserTab):
+            widget.activate()
+            self.load_queue.activated(widget)
             qurl = widget.browser.url()
+            self.update_route_label()
             self.update_urlbar(qurl, widget)
             self.update_title(widget)
         elif CSVViewerTab and isinstance(widget, CSVViewerTab):
             self.url_bar.setText(widget.file_path)
             self.setWindowTitle(f"{os.path.basename(widget.file_path)} - NeuroLit")
+        self.update_memory_label()
 
     def close_current_tab(self, i):
         if self.tabs.count() < 2:
             return
+        widget = self.tabs.widget(i)
         self.tabs.removeTab(i)
+        if widget is self.active_tab:
+            self.active_tab = None
+        self.load_queue.forget(widget)
+        if isinstance(widget, BrowserTab):
+            widget.dispose()
+        elif widget is not None:
+            widget.close()
+            widget.deleteLater()
+
+    # --- Сеанс ---
+    def tab_state(self, widget):
+        """Saved form of a tab for data/session.json, or None if the tab is not restorable."""
+        if isinstance(widget, PlaceholderTab):
+            return widget.state
+        if isinstance(widget, BrowserTab):
+            page = widget.browser.page()
+            history = page.history()
+            # Сохранённая история, ещё не пройденная, записывается как была
+            urls, index = widget.saved_history or history_urls(history)
+            scroll = widget.saved_scroll if widget.saved_scroll is not None else page.scrollPosition()
+            state = {
+                "kind": "browser" if widget.discardable else "reader",
+                "url": page.url().toString(),
+                "title": page.title(),
+                "scroll": [scroll.x(), scroll.y()],
+                "history_urls": urls,
+                "history_index": index,
+            }
+            if widget.discardable and widget.saved_history is None:
+                encoded = save_history(history)
+                if encoded:
+                    state["history"] = encoded
+            return state
+        if CSVViewerTab and isinstance(widget, CSVViewerTab):
+            return {
+                "kind": "csv",
+                "path": widget.file_path,
+                "title": self.tabs.tabText(self.tabs.indexOf(widget)),
+                "scroll": widget.table.verticalScrollBar().value(),
+            }
+        if isinstance(widget, TimelineTab):
+            return {"kind": "timeline", "title": "Timeline"}
+        if isinstance(widget, StatsTab):
+            return {"kind": "stats", "title": "Statistics"}
+        return None
+
+    def save_current_session(self):
+        tabs = []
+        current = 0
+        for i in range(self.tabs.count()):
+            state = self.tab_state(self.tabs.widget(i))
+            if state is None:
+                continue
+            if i == self.tabs.currentIndex():
+                current = len(tabs)
+            tabs.append(state)
+        save_session(tabs, current, self.session_path)
+
+    def restore_session(self):
+        """Add placeholder tabs for the saved session. Returns False if there is none."""
+        session = load_session(self.session_path)
+        if session is None:
+            return False
+        # Без сигналов: иначе первая добавленная вкладка сразу загрузится
+        self.tabs.blockSignals(True)
+        for state in session["tabs"]:
+            self.tabs.addTab(PlaceholderTab(state), tab_label(state.get("title") or state.get("url") or "Tab"))
+        current = min(max(session.get("current", 0), 0), self.tabs.count() - 1)
+        self.tabs.setCurrentIndex(current)
+        self.tabs.blockSignals(False)
+        self.current_tab_changed(current)
+        return True
+
+    def load_placeholder(self, i):
+        """Replace the placeholder tab at index i with the real tab. Returns the new widget."""
+        placeholder = self.tabs.widget(i)
+        state = placeholder.state
+        if state.get("kind") == "csv":
+            if not CSVViewerTab:
+                return placeholder
+            tab = CSVViewerTab(state["path"], self)
+            # Полоса прокрутки получает диапазон только после раскладки таблицы
+            scroll = state.get("scroll", 0)
+            QTimer.singleShot(0, lambda: tab.table.verticalScrollBar().setValue(scroll))
+        elif state.get("kind") == "timeline":
+            tab = TimelineTab(self, self.timeline_index)
+        elif state.get("kind") == "stats":
+            tab = StatsTab(self, self.feed_stats)
+        else:
+            tab = self.create_reader_tab(state["url"]) if state.get("kind") == "reader" else None
+            scroll = state.get("scroll")
+            saved_scroll = QPointF(*scroll) if scroll and any(scroll) else None
+            if tab is None:
+                tab = self.create_browser_tab()
+                # История целиком через QDataStream, иначе заново по сохранённым адресам
+                restored = bool(state.get("history")) and restore_history(tab.browser.page().history(),
+                                                                          state["history"])
+                if not restored and len(state.get("history_urls") or []) > 1:
+                    # Загружается только текущая запись, остальные - при переходе назад/вперёд
+                    tab.load_saved_history(state["history_urls"], state.get("history_index", -1))
+                elif not restored:
+                    tab.browser.setUrl(QUrl(state.get("url") or HOMEPAGE))
+            if saved_scroll is not None:
+                tab.saved_scroll = saved_scroll
+
+        was_current = self.tabs.currentIndex() == i
+        self.tabs.blockSignals(True)
+        self.tabs.insertTab(i, tab, self.tabs.tabText(i))
+        self.tabs.removeTab(i + 1)
+        if was_current:
+            self.tabs.setCurrentIndex(i)
+        self.tabs.blockSignals(False)
+        placeholder.deleteLater()
+        return tab
+
+    def browser_tabs(self):
+        return [self.tabs.widget(i) for i in range(self.tabs.count())
+                if isinstance(self.tabs.widget(i), BrowserTab)]
+
+    def hibernate_idle_tabs(self):
+        """Discard idle background tabs and keep live renderers under max_live_tabs."""
+        current = self.tabs.currentWidget()
+        tabs = self.browser_tabs()
+        live = sorted((t for t in tabs if t is not current and not t.is_discarded()),
+                      key=lambda t: t.last_active)
+        excess = len(live) + (1 if current in tabs else 0) - self.settings["max_live_tabs"]
+        idle_limit = self.settings["tab_idle_minutes"] * 60
+        now = time.monotonic()
+        for tab in live:
+            if excess > 0 or now - tab.last_active > idle_limit:
+                if tab.discard():
+                    excess -= 1
+        self.update_memory_label()
+
+    def record_route_latency(self, host, seconds):
+        self.route_stats.record(self.proxy_router.route(host), seconds)
+        self.update_route_label()
+
+    def update_route_label(self):
+        """Show the proxy route of the current page and its average load time."""
+        browser = self.current_browser()
+        host = browser.url().host() if browser else ""
+        if not host or not len(self.proxy_router):
+            self.route_label.setText("")
+            return
+        self.route_label.setText(f"Route {self.route_stats.describe(self.proxy_router.route(host))}")
+
+    def update_memory_label(self):
+        """Show renderer memory of the current tab and the number of live tabs."""
+        tabs = self.browser_tabs()
+        live = sum(1 for t in tabs if not t.is_discarded())
+        widget = self.tabs.currentWidget()
+        if isinstance(widget, BrowserTab):
+            kb = widget.memory_kb()
+            memory = f"{kb // 1024} MB" if kb else "n/a"
+        else:
+            memory = "-"
+        queued = f" | Queued: {len(self.load_queue)}" if len(self.load_queue) else ""
+        self.memory_text = f"Tab memory: {memory} | Live tabs: {live}/{len(tabs)}{queued}"
+        self.update_blocked_label()
+
+    def update_blocked_label(self):
+        """Refresh the blocked request count, reusing the last memory readout."""
+        widget = self.tabs.currentWidget()
+        blocked = widget.blocked_count() if isinstance(widget, BrowserTab) else "-"
+        self.memory_label.setText(f"Blocked: {blocked} | {self.memory_text}")
+
+    def schedule_blocked_update(self, tab):
+        if self.tabs.currentWidget() is tab and not self.blocked_timer.isActive():
+            self.blocked_timer.start()
 
     def update_urlbar(self, q, browser=None):
         if browser != self.tabs.currentWidget():
@@ -412,6 +928,10 @@ class MainWindow(QMainWindow):
             return widget.browser
         return None
 
+    def current_browser_tab(self):
+        widget = self.tabs.currentWidget()
+        return widget if isinstance(widget, BrowserTab) else None
+
     def _is_descendant_of(self, item, ancestor):
         """Check if item is a descendant of ancestor in the tree."""
         current = item.parent()
@@ -433,6 +953,10 @@ class MainWindow(QMainWindow):
                 self.bookmarks_btn_container.hide()
                 self.history_container.hide()
                 self.show_feeds()
+            elif text == "Timeline":
+                self.add_timeline_tab()
+            elif text == "Statistics":
+                self.add_stats_tab()
             elif text == "Bookmarks":
                 self.feeds_container.hide()
                 self.history_container.hide()
@@ -462,6 +986,10 @@ class MainWindow(QMainWindow):
                 self.feeds_container.hide()
                 self.bookmarks_btn_container.hide()
                 self.history_container.hide()
+        elif item is self.profiling_tree_item:
+            self.toggle_profiling()
+        elif item is self.retention_tree_item:
+            self.run_retention()
         elif self._is_descendant_of(item, self.bookmarks_tree_item):
             # Bookmark item or subfolder clicked
             role = item.data(0, Qt.UserRole)
@@ -496,6 +1024,7 @@ class MainWindow(QMainWindow):
         elif text == "History":
             self.history_container.show()
 
+    @profiled()
     def populate_bookmarks_tree(self):
         """Populate the Bookmarks tree folder with items from data/bookmarks.txt.
         
@@ -545,6 +1074,7 @@ class MainWindow(QMainWindow):
         except Exception as e:
             print(f"Error loading bookmarks: {e}")
 
+    @profiled()
     def populate_history_tree(self):
         """Populate the History tree folder with .txt files from data/history/ and its subdirectories."""
         self.history_tree_item.takeChildren()
@@ -626,9 +1156,10 @@ class MainWindow(QMainWindow):
         except Exception as e:
             self.status_bar.showMessage(f"Error reading {fname}: {e}")
 
+    @profiled()
     def show_feeds(self):
         self.feeds_list.clear()
-        file_path = "data/feeds.csv"
+        file_path = os.path.join(self.data_dir, "feeds.csv")
         if not os.path.isfile(file_path):
             return
         
@@ -665,16 +1196,17 @@ class MainWindow(QMainWindow):
         feed_url = item.text()
         # Convert URL to filename logic
         safe_name = feed_url.replace("http://", "").replace("https://", "").replace("/", "_").replace(".", "_").replace("?", "_").replace("&", "_").replace("=", "_")
-        csv_path = f"data/feeds/{safe_name}.csv"
+        feeds_dir = os.path.join(self.data_dir, "feeds")
+        csv_path = os.path.join(feeds_dir, f"{safe_name}.csv")
         
         if os.path.exists(csv_path):
             self.add_csv_tab(csv_path, os.path.basename(csv_path))
         else:
             found = False
-            if os.path.exists("data/feeds"):
-                for f in os.listdir("data/feeds"):
+            if os.path.exists(feeds_dir):
+                for f in os.listdir(feeds_dir):
                     if f.endswith(".csv") and safe_name[:20] in f:
-                        self.add_csv_tab(os.path.join("data/feeds", f), f)
+                        self.add_csv_tab(os.path.join(feeds_dir, f), f)
                         found = True
                         break
             if not found:
@@ -684,9 +1216,9 @@ class MainWindow(QMainWindow):
     def navigate_home(self):
         browser = self.current_browser()
         if browser:
-            browser.setUrl(QUrl("https://www.google.com/search?q=&udm=50&hl=ru"))
+            browser.setUrl(QUrl(HOMEPAGE))
         else:
-            self.add_new_tab(QUrl("https://www.google.com/search?q=&udm=50&hl=ru"), "Homepage")
+            self.add_new_tab(QUrl(HOMEPAGE), "Homepage")
 
     def navigate_to_url(self):
         url_text = self.url_bar.text().strip()
@@ -702,6 +1234,16 @@ class MainWindow(QMainWindow):
 
     def set_proxy(self):
         proxy_url = self.proxy_input.text().strip()
+        if proxy_url.lower() == "auto" or len(parse_proxy_list(proxy_url)) > 1:
+            # Самый быстрый исправный прокси по статистике fetchrss.py
+            pool = ProxyPool(os.path.join(self.data_dir, "proxy_stats.json"))
+            allowed = None if proxy_url.lower() == "auto" else parse_proxy_list(proxy_url)
+            best = pool.best(allowed)
+            if best is None:
+                self.status_bar.showMessage("No proxy statistics yet, run FetchRSS first.")
+                return
+            self.status_bar.showMessage(f"Proxy: {pool.describe(best)}")
+            proxy_url = "" if best == DIRECT else best
         print(f"Setting proxy to: {proxy_url}")
         proxy = QNetworkProxy()
         
@@ -717,6 +1259,11 @@ class MainWindow(QMainWindow):
         else:
             proxy.setType(QNetworkProxy.NoProxy)
             
+        # С --proxy-pac-url в флагах Chromium QtWebEngine не смотрит на прокси приложения:
+        # страницы идут по правилам data/proxy_rules.txt, прочитанным при запуске
+        if len(self.proxy_router):
+            self.status_bar.showMessage("Per-host proxy rules are active, pages ignore this proxy; "
+                                        "set the default with a '*' rule in proxy_rules.txt and restart")
         QNetworkProxy.setApplicationProxy(proxy)
 
     def get_rss(self):
@@ -731,23 +1278,90 @@ class MainWindow(QMainWindow):
             self.save_feed_to_csv(rss_url, "RSS Feed", proxy_url)
             self.add_new_tab(QUrl(rss_url), "RSS Feed")
 
+    def on_ingest_event(self, message):
+        """Handle an event pushed by ingestd.py."""
+        event = message.get("event")
+        if event == "feed_updated":
+            file_path = os.path.normcase(os.path.abspath(message.get("file", "")))
+            for i in range(self.tabs.count()):
+                widget = self.tabs.widget(i)
+                if CSVViewerTab and isinstance(widget, CSVViewerTab) and \
+                        os.path.normcase(os.path.abspath(widget.file_path)) == file_path:
+                    widget.load_csv()
+            if self.feeds_container.isVisible():
+                self.show_feeds()
+            if isinstance(self.tabs.currentWidget(), StatsTab):
+                self.tabs.currentWidget().reload()
+            self.status_bar.showMessage(f"Feed {message.get('feed')} gained {message.get('count')} items")
+        elif event == "job_finished" and message.get("ok") and message.get("job") == "retention":
+            report = last_run(os.path.join(self.data_dir, "retention.tsv"))
+            self.retention_tree_item.setToolTip(0, report or "Not run yet")
+            self.status_bar.showMessage(f"ingestd retention: {report}")
+        elif event == "job_finished" and not message.get("ok"):
+            self.status_bar.showMessage(f"ingestd: {message.get('job')} failed: {message.get('error')}")
+
     def run_fetch_rss(self):
+        if self.ingest_client.send_command("fetch"):
+            self.status_bar.showMessage("Fetch requested from ingestd")
+            return
         print("Running fetchrss.py...")
-        try:
-            subprocess.Popen([sys.executable, "fetchrss.py"])
-        except Exception as e:
-            print(f"Error running fetchrss.py: {e}")
+        # Профилирование включено из интерфейса - дочерний процесс тоже пишет отчёты
+        env = dict(os.environ, **{PROFILE_ENV: PROFILER.mode}) if PROFILER.enabled else None
+
+        def run():
+            with PROFILER.span("fetch_subprocess"):
+                subprocess.run([sys.executable, os.path.join(APP_DIR, "fetchrss.py")], check=True, env=env, cwd=APP_DIR)
+        self.job_runner.submit("fetch", run)
+
+    def toggle_profiling(self):
+        if PROFILER.enabled:
+            report_dir = PROFILER.write_summary()
+            PROFILER.disable()
+            self.status_bar.showMessage(f"Profiling off, reports in {report_dir}")
+        else:
+            PROFILER.enable(os.environ.get(PROFILE_ENV) or "all")
+            self.status_bar.showMessage(f"Profiling on ({PROFILER.mode}), reports in {PROFILER.report_dir}")
+        self.profiling_tree_item.setCheckState(0, Qt.Checked if PROFILER.enabled else Qt.Unchecked)
 
     def run_change_rss(self):
+        if self.ingest_client.send_command("rollover"):
+            return
         print("Running change_rss.py...")
-        try:
-            subprocess.Popen([sys.executable, "change_rss.py"])
-        except Exception as e:
-            print(f"Error running change_rss.py: {e}")
+        # Перенос ждёт завершения сбора, запущенного в ту же минуту
+        self.job_runner.submit("rollover", lambda: subprocess.run(
+            [sys.executable, os.path.join(APP_DIR, "change_rss.py")], check=True, cwd=APP_DIR), after=("fetch",))
+        self.run_retention()
+
+    def run_retention(self):
+        # После переноса, чтобы новые сегменты global_feeds тоже попали под лимиты
+        if self.job_runner.submit("retention", lambda: subprocess.run(
+                [sys.executable, os.path.join(APP_DIR, "retention.py"), "--data-dir", self.data_dir], check=True,
+                cwd=APP_DIR), after=("rollover",)):
+            self.status_bar.showMessage("Pruning data by retention limits...")
+
+    def on_job_event(self, event, job, details):
+        if event == "job_finished":
+            if details.get("ok") and job == "retention":
+                report = last_run(os.path.join(self.data_dir, "retention.tsv"))
+                self.retention_tree_item.setToolTip(0, report or "Not run yet")
+                self.status_bar.showMessage(f"Retention: {report}")
+            elif details.get("ok"):
+                self.status_bar.showMessage(f"{job} finished in {details.get('duration')} s")
+                if isinstance(self.tabs.currentWidget(), StatsTab):
+                    self.tabs.currentWidget().reload()
+            else:
+                self.status_bar.showMessage(f"{job} failed: {details.get('error')}")
 
     def save_feed_to_csv(self, url, description, proxy):
-        file_path = "data/feeds.csv"
+        file_path = os.path.join(self.data_dir, "feeds.csv")
         os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        try:
+            with file_lock(FEED_LIST_LOCK, timeout=5):
+                self._write_feed_row(file_path, url, description, proxy)
+        except LockTimeout:
+            self.status_bar.showMessage("Feed list is busy, try again.")
+
+    def _write_feed_row(self, file_path, url, description, proxy):
         rows = []
         updated = False
         header = ["url", "description", "proxy"]
@@ -1033,10 +1647,12 @@ class MainWindow(QMainWindow):
                 self.status_bar.showMessage(f"Error removing folder: {e}")
 
 if __name__ == "__main__":
+    # Правила маршрутизации передаются Chromium до создания QApplication, из того же data/, что у окна
+    apply_proxy_rules(os.path.join(DATA_DIR, "proxy_rules.txt"))
     app = QApplication(sys.argv)
     app.setApplicationName("NeuroLit - Neuronet Literature")
     
-    icon_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "favicon.png")
+    icon_path = os.path.join(APP_DIR, "favicon.png")
     app.setWindowIcon(QIcon(icon_path))
     
     window = MainWindow()
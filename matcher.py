@@ -0,0 +1,116 @@
+from collections import deque
+
+class DomainTrie:
+    """Set of domains matched by suffix: adding example.com also matches ads.example.com.
+
+    Labels are stored right to left, so a lookup costs one dict step per label
+    of the host regardless of how many domains are loaded.
+    """
+
+    END = ""
+
+    def __init__(self, domains=()):
+        self.root = {}
+        self.size = 0
+        for domain in domains:
+            self.add(domain)
+
+    def add(self, domain, value=True):
+        labels = domain.strip(".").lower().split(".")
+        node = self.root
+        for label in reversed(labels):
+            node = node.setdefault(label, {})
+        if self.END not in node:
+            self.size += 1
+        node[self.END] = value
+
+    def lookup(self, host):
+        """Return the value of the longest added suffix of host, or None."""
+        node = self.root
+        found = None
+        for label in reversed(host.lower().split(".")):
+            node = node.get(label)
+            if node is None:
+                break
+            if self.END in node:
+                found = node[self.END]
+        return found
+
+    def __contains__(self, host):
+        return self.lookup(host) is not None
+
+    def __len__(self):
+        return self.size
+
+class AhoCorasick:
+    """Multi-pattern substring matcher: one pass over the text finds every pattern.
+
+    Build with add() for each pattern, then build() once before searching.
+    """
+
+    def __init__(self, patterns=()):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        self.patterns = []
+        self.built = False
+        for pattern in patterns:
+            self.add(pattern)
+
+    def add(self, pattern):
+        """Add a pattern and return its id."""
+        node = 0
+        for ch in pattern:
+            nxt = self.goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[node][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+            node = nxt
+        pattern_id = len(self.patterns)
+        self.patterns.append(pattern)
+        self.output[node].append(pattern_id)
+        self.built = False
+        return pattern_id
+
+    def build(self):
+        """Compute failure links (breadth first) and merge outputs along them."""
+        queue = deque()
+        for nxt in self.goto[0].values():
+            self.fail[nxt] = 0
+            queue.append(nxt)
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self.goto[node].items():
+                queue.append(nxt)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.output[nxt] = self.output[nxt] + self.output[self.fail[nxt]]
+        self.built = True
+
+    def iter_matches(self, text):
+        """Yield (end_index, pattern_id) for every occurrence in text."""
+        if not self.built:
+            self.build()
+        goto, fail, output = self.goto, self.fail, self.output
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if output[node]:
+                for pattern_id in output[node]:
+                    yield i, pattern_id
+
+    def search(self, text):
+        """Return the id of the first pattern found in text, or None."""
+        for _, pattern_id in self.iter_matches(text):
+            return pattern_id
+        return None
+
+    def __len__(self):
+        return len(self.patterns)
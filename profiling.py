@@ -0,0 +1,203 @@
+import os
+import io
+import time
+import pstats
+import cProfile
+import threading
+import functools
+import tracemalloc
+from datetime import datetime
+
+PROFILE_ENV = "NEUROLIT_PROFILE"
+PROFILING_DIR = "data/profiling"
+
+# Режимы: spans - только время, memory - ещё tracemalloc, cprofile - ещё cProfile, all - всё; 1 - то же, что spans
+MODES = {"spans": set(), "memory": {"memory"}, "cprofile": {"cprofile"}, "all": {"memory", "cprofile"}, "1": set()}
+
+class Profiler:
+    """Opt-in timing spans with tracemalloc and cProfile capture, reported to data/profiling/.
+
+    Enabled by NEUROLIT_PROFILE=1|spans|memory|cprofile|all or from the UI.
+    Reports:
+        spans.tsv      - time, span, duration_ms, and in memory mode the KiB
+                         retained and the peak above the start of the span
+        <span>.prof    - cProfile stats of the span, accumulated; <span>.txt - top functions
+        memory_<time>.txt - tracemalloc top allocations, written by snapshot()
+    Only the outermost span of a thread is profiled by cProfile. Disabled,
+    a span costs one attribute check.
+    """
+
+    def __init__(self, report_dir=PROFILING_DIR, mode=None):
+        self.report_dir = report_dir
+        self.enabled = False
+        self.features = set()
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.profiles = {}  # имя -> накопленная pstats.Stats
+        self.totals = {}    # имя -> [вызовов, всего секунд, максимум]
+        if mode is None:
+            mode = os.environ.get(PROFILE_ENV, "")
+        if mode and mode != "0":
+            self.enable(mode)
+
+    def enable(self, mode="spans"):
+        if mode not in MODES:
+            print(f"Unknown profiling mode {mode!r}, expected one of {', '.join(MODES)}; profiling spans only")
+            mode = "spans"
+        self.features = MODES[mode]
+        if "memory" in self.features and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        os.makedirs(self.report_dir, exist_ok=True)
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+        if "memory" in self.features and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.features = set()
+
+    @property
+    def mode(self):
+        """Value of NEUROLIT_PROFILE that reproduces the current state in a child process."""
+        if not self.enabled:
+            return ""
+        for name, features in MODES.items():
+            if features == self.features:
+                return name
+        return "spans"
+
+    def span(self, name):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def _record(self, name, elapsed, memory, peak):
+        with self.lock:
+            total = self.totals.setdefault(name, [0, 0.0, 0.0])
+            total[0] += 1
+            total[1] += elapsed
+            total[2] = max(total[2], elapsed)
+            with open(os.path.join(self.report_dir, "spans.tsv"), 'a', encoding='utf-8') as f:
+                f.write(f"{datetime.now():%Y-%m-%d %H:%M:%S}\t{name}\t{elapsed * 1000:.1f}\t"
+                        f"{'' if memory is None else memory // 1024}\t{'' if peak is None else peak // 1024}\n")
+
+    def _dump_profile(self, name, profile):
+        with self.lock:
+            stats = self.profiles.get(name)
+            if stats is None:
+                stats = self.profiles[name] = pstats.Stats(profile)
+            else:
+                stats.add(profile)
+            stats.dump_stats(os.path.join(self.report_dir, f"{name}.prof"))
+            stats.stream = io.StringIO()
+            stats.sort_stats("cumulative").print_stats(30)
+            with open(os.path.join(self.report_dir, f"{name}.txt"), 'w', encoding='utf-8') as f:
+                f.write(stats.stream.getvalue())
+
+    def snapshot(self, limit=30):
+        """Write the top tracemalloc allocations; returns the report path, None without memory mode."""
+        if not tracemalloc.is_tracing():
+            return None
+        path = os.path.join(self.report_dir, f"memory_{datetime.now():%Y%m%d_%H%M%S}.txt")
+        stats = tracemalloc.take_snapshot().statistics("lineno")
+        with open(path, 'w', encoding='utf-8') as f:
+            for stat in stats[:limit]:
+                f.write(f"{stat}\n")
+        return path
+
+    def summary(self):
+        """Lines 'span: calls, total, max' sorted by total time."""
+        with self.lock:
+            rows = sorted(self.totals.items(), key=lambda item: item[1][1], reverse=True)
+        return [f"{name}: {calls} calls, {total * 1000:.0f} ms total, {longest * 1000:.0f} ms max"
+                for name, (calls, total, longest) in rows]
+
+    def write_summary(self):
+        """Write summary.txt (and a memory snapshot in memory mode); returns the report directory."""
+        os.makedirs(self.report_dir, exist_ok=True)
+        with open(os.path.join(self.report_dir, "summary.txt"), 'w', encoding='utf-8') as f:
+            f.write("\n".join(self.summary()) + "\n")
+        self.snapshot()
+        return self.report_dir
+
+class _Span:
+    __slots__ = ("profiler", "name", "start", "memory", "profile", "parent", "peak")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.profile = None
+        self.memory = None
+        self.parent = None
+        self.peak = 0  # пик, сброшенный вложенными спанами
+
+    def __enter__(self):
+        profiler = self.profiler
+        local = profiler.local
+        depth = getattr(local, "depth", 0)
+        local.depth = depth + 1
+        if "memory" in profiler.features and tracemalloc.is_tracing():
+            self.parent = getattr(local, "span", None)
+            local.span = self
+            current, peak = tracemalloc.get_traced_memory()
+            # reset_peak сбрасывает и пик внешнего спана: он сохраняется у внешнего и учитывается в его __exit__
+            if self.parent is not None:
+                self.parent.peak = max(self.parent.peak, peak)
+            tracemalloc.reset_peak()
+            self.memory = current
+        if "cprofile" in profiler.features and depth == 0:
+            self.profile = cProfile.Profile()
+            try:
+                self.profile.enable()
+            except ValueError:
+                self.profile = None  # профилировщик уже запущен в другом потоке
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        profiler = self.profiler
+        if self.profile is not None:
+            self.profile.disable()
+        profiler.local.depth -= 1
+        memory = peak = None
+        if self.memory is not None:
+            profiler.local.span = self.parent
+        if self.memory is not None and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, self.peak)
+            if self.parent is not None:
+                self.parent.peak = max(self.parent.peak, peak)
+            memory = current - self.memory
+            peak -= self.memory
+        profiler._record(self.name, elapsed, memory, peak)
+        if self.profile is not None:
+            profiler._dump_profile(self.name, self.profile)
+        return False
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+PROFILER = Profiler()
+
+def profiled(name=None):
+    """Decorator running the function in a PROFILER span (its qualified name by default)."""
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not PROFILER.enabled:
+                return func(*args, **kwargs)
+            with PROFILER.span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
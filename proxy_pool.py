@@ -0,0 +1,139 @@
+import os
+import re
+import sys
+import csv
+import json
+import time
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor
+
+PROXY_STATS_FILE = "data/proxy_stats.json"
+CHECK_URL = "https://www.gstatic.com/generate_204"
+
+DIRECT = "DIRECT"
+
+def parse_proxy_list(cell):
+    """Proxies allowed for a feed: the proxy column may list several, separated by commas or spaces.
+
+    An empty cell means a direct connection; DIRECT can be listed as a fallback.
+    """
+    tokens = [t for t in re.split(r'[,\s]+', cell or "") if t]
+    if not tokens:
+        return [DIRECT]
+    return [DIRECT if t.upper() == DIRECT else t for t in tokens]
+
+def requests_proxies(proxy):
+    if proxy == DIRECT:
+        return {}
+    return {"http": proxy, "https": proxy}
+
+class ProxyPool:
+    """Latency and success statistics per proxy, shared by fetchrss.py, ingestd.py and the browser.
+
+    data/proxy_stats.json:
+        {proxy: {"ok": n, "fail": n, "streak": consecutive failures, "latency": EWMA seconds,
+                 "last_ok": ts, "last_fail": ts}}
+    """
+
+    EWMA_ALPHA = 0.3
+    MAX_STREAK = 3        # после стольких ошибок подряд прокси считается неисправным
+    COOLDOWN = 600        # ... на столько секунд
+
+    def __init__(self, file_path=PROXY_STATS_FILE):
+        self.file_path = file_path
+        self.lock = threading.Lock()
+        self.stats = {}
+        if os.path.isfile(file_path):
+            try:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    self.stats = json.load(f)
+            except Exception as e:
+                print(f"Error loading proxy stats: {e}")
+
+    def record(self, proxy, ok, latency=None):
+        with self.lock:
+            entry = self.stats.setdefault(proxy, {"ok": 0, "fail": 0, "streak": 0, "latency": None,
+                                                  "last_ok": 0, "last_fail": 0})
+            now = time.time()
+            if ok:
+                entry["ok"] += 1
+                entry["streak"] = 0
+                entry["last_ok"] = now
+                if latency is not None:
+                    old = entry["latency"]
+                    entry["latency"] = latency if old is None else old + self.EWMA_ALPHA * (latency - old)
+            else:
+                entry["fail"] += 1
+                entry["streak"] += 1
+                entry["last_fail"] = now
+
+    def is_healthy(self, proxy):
+        entry = self.stats.get(proxy)
+        if entry is None:
+            return True
+        return entry["streak"] < self.MAX_STREAK or time.time() - entry["last_fail"] > self.COOLDOWN
+
+    def cost(self, proxy):
+        """Expected seconds per successful request; unknown proxies rank after measured ones."""
+        entry = self.stats.get(proxy)
+        if entry is None or entry["latency"] is None:
+            return 30.0
+        success_rate = (entry["ok"] + 1) / (entry["ok"] + entry["fail"] + 2)
+        return entry["latency"] / success_rate
+
+    def ranked(self, allowed):
+        """Allowed proxies, healthy and fastest first."""
+        with self.lock:
+            return sorted(allowed, key=lambda p: (not self.is_healthy(p), self.cost(p)))
+
+    def best(self, allowed=None):
+        candidates = self.ranked(allowed if allowed is not None else list(self.stats))
+        return candidates[0] if candidates else None
+
+    def describe(self, proxy):
+        entry = self.stats.get(proxy)
+        if entry is None or entry["latency"] is None:
+            return f"{proxy}: no data"
+        total = entry["ok"] + entry["fail"]
+        state = "ok" if self.is_healthy(proxy) else "down"
+        return f"{proxy}: {entry['latency'] * 1000:.0f} ms, {entry['ok']}/{total} ok, {state}"
+
+    def check(self, proxies, url=CHECK_URL, timeout=10, max_workers=8):
+        """Probe proxies concurrently and record the results."""
+        def probe(proxy):
+            start = time.monotonic()
+            try:
+                requests.get(url, proxies=requests_proxies(proxy), timeout=timeout).raise_for_status()
+                self.record(proxy, True, time.monotonic() - start)
+            except Exception:
+                self.record(proxy, False)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            list(pool.map(probe, proxies))
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.file_path) or ".", exist_ok=True)
+        with self.lock:
+            tmp_path = self.file_path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.stats, f, indent=1)
+            os.replace(tmp_path, self.file_path)
+
+def feed_proxies(csv_path="data/feeds.csv"):
+    """Every proxy mentioned in data/feeds.csv."""
+    proxies = []
+    if os.path.isfile(csv_path):
+        with open(csv_path, 'r', newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f, delimiter='\t'):
+                proxies.extend(parse_proxy_list(row.get('proxy')))
+    return list(dict.fromkeys(proxies))
+
+if __name__ == "__main__":
+    # python proxy_pool.py - проверить все прокси из data/feeds.csv
+    pool = ProxyPool()
+    proxies = sys.argv[1:] or feed_proxies()
+    pool.check(proxies)
+    pool.save()
+    for proxy in pool.ranked(proxies):
+        print(pool.describe(proxy))
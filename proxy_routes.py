@@ -0,0 +1,159 @@
+import os
+import re
+import json
+import base64
+import ipaddress
+from urllib.parse import urlparse
+
+from matcher import DomainTrie
+
+PROXY_RULES_FILE = "data/proxy_rules.txt"
+DIRECT = "DIRECT"
+
+IPV4_RE = re.compile(r'^\d{1,3}(?:\.\d{1,3}){3}$')
+
+PAC_TEMPLATE = """var SUFFIXES = %(suffixes)s;
+var NETWORKS = %(networks)s;
+var DEFAULT_ROUTE = %(default)s;
+
+function ipToInt(ip) {
+    var p = ip.split(".");
+    return ((p[0] << 24) >>> 0) + (p[1] << 16) + (p[2] << 8) + (+p[3]);
+}
+
+function FindProxyForURL(url, host) {
+    host = host.toLowerCase();
+    if (/^\\d+\\.\\d+\\.\\d+\\.\\d+$/.test(host)) {
+        var ip = ipToInt(host);
+        for (var i = 0; i < NETWORKS.length; i++) {
+            if (((ip & NETWORKS[i][1]) >>> 0) === NETWORKS[i][0]) return NETWORKS[i][2];
+        }
+        return DEFAULT_ROUTE;
+    }
+    // Самый длинный совпавший суффикс
+    var labels = host.split(".");
+    for (var j = 0; j < labels.length; j++) {
+        var route = SUFFIXES[labels.slice(j).join(".")];
+        if (route !== undefined) return route;
+    }
+    return DEFAULT_ROUTE;
+}
+"""
+
+def pac_target(target):
+    """DIRECT, http://host:port or socks5://host:port as a PAC result string."""
+    if target == DIRECT:
+        return DIRECT
+    url = urlparse(target if "://" in target else "http://" + target)
+    port = url.port or (1080 if url.scheme.startswith("socks") else 8080)
+    kind = {"socks5": "SOCKS5", "socks": "SOCKS", "socks4": "SOCKS", "https": "HTTPS"}.get(url.scheme, "PROXY")
+    return f"{kind} {url.hostname}:{port}"
+
+class ProxyRouter:
+    """Per-host proxy routing rules, PAC style.
+
+    data/proxy_rules.txt, one rule per line:
+        example.com         http://127.0.0.1:8080   - host and its subdomains
+        *.ru                DIRECT                  - same as .ru
+        10.0.0.0/8          DIRECT                  - IP literals in a network
+        *                   socks5://127.0.0.1:1080 - everything else (default DIRECT)
+    The most specific suffix wins, so rule order does not matter.
+    """
+
+    def __init__(self):
+        self.suffixes = DomainTrie()
+        self.networks = []
+        self.default = DIRECT
+        self.rule_count = 0
+
+    @classmethod
+    def from_file(cls, file_path=PROXY_RULES_FILE):
+        router = cls()
+        if os.path.isfile(file_path):
+            with open(file_path, 'r', encoding='utf-8') as f:
+                for line_no, line in enumerate(f, 1):
+                    line = line.split("#", 1)[0].strip()
+                    if not line:
+                        continue
+                    try:
+                        pattern, target = line.split()
+                        router.add_rule(pattern, target)
+                    except ValueError:
+                        print(f"Bad proxy rule at {file_path}:{line_no}: {line}")
+        return router
+
+    def add_rule(self, pattern, target):
+        target = DIRECT if target.upper() == DIRECT else target
+        if pattern == "*":
+            self.default = target
+        elif "/" in pattern:
+            self.networks.append((ipaddress.ip_network(pattern, strict=False), target))
+            self.networks.sort(key=lambda item: -item[0].prefixlen)
+        else:
+            self.suffixes.add(pattern.lstrip("*").lstrip("."), target)
+        self.rule_count += 1
+
+    def route(self, host):
+        """Proxy target (or DIRECT) for a host, as the PAC script decides it."""
+        host = host.lower()
+        if IPV4_RE.match(host):
+            address = ipaddress.ip_address(host)
+            for network, target in self.networks:
+                if address in network:
+                    return target
+            return self.default
+        target = self.suffixes.lookup(host)
+        return target if target is not None else self.default
+
+    def __len__(self):
+        return self.rule_count
+
+    def _suffix_items(self, node=None, labels=()):
+        node = self.suffixes.root if node is None else node
+        for label, child in node.items():
+            if label == DomainTrie.END:
+                yield ".".join(reversed(labels)), child
+            else:
+                yield from self._suffix_items(child, labels + (label,))
+
+    def to_pac(self):
+        suffixes = {suffix: pac_target(target) for suffix, target in self._suffix_items()}
+        networks = [[int(n.network_address), int(n.netmask), pac_target(t)]
+                    for n, t in self.networks if n.version == 4]
+        return PAC_TEMPLATE % {
+            "suffixes": json.dumps(suffixes),
+            "networks": json.dumps(networks),
+            "default": json.dumps(pac_target(self.default)),
+        }
+
+    def chromium_flag(self):
+        """--proxy-pac-url with the compiled PAC script inlined as a data: URL."""
+        encoded = base64.b64encode(self.to_pac().encode('utf-8')).decode('ascii')
+        return f"--proxy-pac-url=data:application/x-ns-proxy-autoconfig;base64,{encoded}"
+
+def apply_proxy_rules(file_path=PROXY_RULES_FILE):
+    """Pass the routing rules to QtWebEngine. Must run before QApplication is created."""
+    router = ProxyRouter.from_file(file_path)
+    if len(router):
+        flags = os.environ.get("QTWEBENGINE_CHROMIUM_FLAGS", "")
+        os.environ["QTWEBENGINE_CHROMIUM_FLAGS"] = (flags + " " + router.chromium_flag()).strip()
+    return router
+
+class RouteStats:
+    """Page load latency per route, shown in the status bar."""
+
+    EWMA_ALPHA = 0.3
+
+    def __init__(self):
+        self.latency = {}
+        self.count = {}
+
+    def record(self, route, seconds):
+        old = self.latency.get(route)
+        self.latency[route] = seconds if old is None else old + self.EWMA_ALPHA * (seconds - old)
+        self.count[route] = self.count.get(route, 0) + 1
+
+    def describe(self, route):
+        if route not in self.latency:
+            return f"{route}: no data"
+        return f"{route}: {self.latency[route] * 1000:.0f} ms avg over {self.count[route]}"
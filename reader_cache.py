@@ -0,0 +1,272 @@
+import os
+import json
+import time
+import hashlib
+import html
+import threading
+from html.parser import HTMLParser
+from concurrent.futures import ThreadPoolExecutor
+
+from jobs import file_lock
+
+CACHE_DIR = "data/reader_cache"
+# Время чтения записей копится в памяти и пишется в index.json пачкой: столько чтений или раз в столько секунд
+ATIME_BATCH = 50
+ATIME_FLUSH_SECONDS = 300
+
+READER_TEMPLATE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{title}</title>
+<style>
+body {{ max-width: 760px; margin: 32px auto; padding: 0 16px; font: 18px/1.6 Georgia, serif; color: #222; }}
+h1 {{ font-size: 28px; line-height: 1.3; }}
+.source {{ font: 13px sans-serif; color: #008000; }}
+</style></head>
+<body><h1>{title}</h1><p class="source"><a href="{url}">{url}</a></p>
+{body}
+</body></html>
+"""
+
+# Блоки, внутри которых текст статьи не ищем
+SKIP_TAGS = {"script", "style", "noscript", "nav", "header", "footer", "aside", "form", "svg", "iframe"}
+TEXT_TAGS = {"p", "h2", "h3", "h4", "li", "blockquote", "pre"}
+
+class ArticleExtractor(HTMLParser):
+    """Collect the title and text blocks of a page, preferring <article>/<main> content."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = ""
+        self.blocks = []          # (tag, text, inside_article)
+        self._skip_depth = 0
+        self._article_depth = 0
+        self._in_title = False
+        self._current = None      # (tag, [parts])
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in ("article", "main"):
+            self._article_depth += 1
+        elif tag == "title":
+            self._in_title = True
+        elif tag in TEXT_TAGS and self._skip_depth == 0 and self._current is None:
+            self._current = (tag, [])
+        elif tag == "br" and self._current is not None:
+            self._current[1].append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in ("article", "main"):
+            self._article_depth = max(0, self._article_depth - 1)
+        elif tag == "title":
+            self._in_title = False
+        elif self._current is not None and tag == self._current[0]:
+            text = " ".join("".join(self._current[1]).split())
+            if text:
+                self.blocks.append((tag, text, self._article_depth > 0))
+            self._current = None
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+        elif self._current is not None and self._skip_depth == 0:
+            self._current[1].append(data)
+
+def extract_main_text(page_html):
+    """Return (title, [(tag, text), ...]) with the main text blocks of an article page."""
+    parser = ArticleExtractor()
+    try:
+        parser.feed(page_html)
+        parser.close()
+    except Exception as e:
+        print(f"Error extracting article: {e}")
+    blocks = parser.blocks
+    if any(in_article for _, _, in_article in blocks):
+        blocks = [b for b in blocks if b[2]]
+    # Короткие абзацы вне статьи - обычно меню и подписи
+    blocks = [(tag, text) for tag, text, in_article in blocks
+              if in_article or (tag == "p" and len(text) >= 40) or tag in ("h2", "h3", "blockquote", "pre")]
+    return " ".join(parser.title.split()), blocks
+
+def render_reader_html(url, title, blocks):
+    body = "\n".join(
+        f"<{tag}>{html.escape(text)}</{tag}>" if tag != "li" else f"<p>&bull; {html.escape(text)}</p>"
+        for tag, text in blocks
+    )
+    title = html.escape(title or url)
+    return READER_TEMPLATE.format(title=title, url=html.escape(url, quote=True), body=body)
+
+class ReaderCache:
+    """Disk cache of reader-mode pages keyed by URL with LRU eviction.
+
+    Layout:
+        data/reader_cache/index.json    - {url: {"file", "size", "atime"}}
+        data/reader_cache/index.lock    - held while the index is re-read, merged and saved
+        data/reader_cache/<sha1>.html   - rendered reader page
+
+    The GUI and the prefetcher (fetchrss.py, ingestd.py) share the index. Each
+    process saves only its own changes (added, removed and read entries),
+    merged into the index as it is on disk under index.lock, so neither drops
+    the other's entries. Reads update atime in memory and are saved in
+    batches (ATIME_BATCH, ATIME_FLUSH_SECONDS), by put() or by flush().
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=200 * 1024 * 1024, max_entries=5000):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self.lock_path = os.path.join(cache_dir, "index.lock")
+        self.lock = threading.RLock()
+        self.index = {}
+        self.index_stat = None
+        # Несохранённые изменения этого процесса
+        self.added = {}
+        self.removed = set()
+        self.touched = {}
+        self.touched_since = None
+        os.makedirs(cache_dir, exist_ok=True)
+        self.reload()
+
+    def reload(self):
+        """Re-read the index if another process (fetchrss.py) has updated it, keeping unsaved changes."""
+        try:
+            stat = os.stat(self.index_path)
+        except OSError:
+            return
+        key = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        if key == self.index_stat:
+            return
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                self.index = self._merge(json.load(f))
+            self.index_stat = key
+        except Exception as e:
+            print(f"Error loading reader cache index: {e}")
+
+    def _merge(self, index):
+        """index (as read from disk) with this process's unsaved changes applied."""
+        for url in self.removed:
+            index.pop(url, None)
+        index.update(self.added)
+        for url, atime in self.touched.items():
+            entry = index.get(url)
+            if entry is not None and entry["atime"] < atime:
+                entry["atime"] = atime
+        return index
+
+    def _file_for(self, url):
+        return hashlib.sha1(url.encode('utf-8')).hexdigest() + ".html"
+
+    def __contains__(self, url):
+        with self.lock:
+            self.reload()
+            return url in self.index
+
+    def get(self, url):
+        """Return cached reader HTML for url (and mark it recently used), or None."""
+        with self.lock:
+            self.reload()
+            entry = self.index.get(url)
+            if entry is None:
+                return None
+            try:
+                with open(os.path.join(self.cache_dir, entry["file"]), 'r', encoding='utf-8') as f:
+                    content = f.read()
+            except OSError:
+                del self.index[url]
+                self.added.pop(url, None)
+                self.removed.add(url)
+                return None
+            now = time.time()
+            entry["atime"] = now
+            self.touched[url] = now
+            if self.touched_since is None:
+                self.touched_since = now
+            if len(self.touched) >= ATIME_BATCH or now - self.touched_since >= ATIME_FLUSH_SECONDS:
+                self.save_index()
+            return content
+
+    def put(self, url, page_html):
+        """Store the reader view of page_html for url. Returns False if no text was found."""
+        title, blocks = extract_main_text(page_html)
+        if not blocks:
+            return False
+        content = render_reader_html(url, title, blocks).encode('utf-8')
+        fname = self._file_for(url)
+        with self.lock:
+            self.reload()
+            with open(os.path.join(self.cache_dir, fname), 'wb') as f:
+                f.write(content)
+            entry = {"file": fname, "size": len(content), "atime": time.time()}
+            self.index[url] = self.added[url] = entry
+            self.removed.discard(url)
+            self.save_index()
+        return True
+
+    def evict(self):
+        """Drop least recently used entries until size and count limits hold."""
+        total = sum(e["size"] for e in self.index.values())
+        if total <= self.max_bytes and len(self.index) <= self.max_entries:
+            return
+        for url, entry in sorted(self.index.items(), key=lambda kv: kv[1]["atime"]):
+            if total <= self.max_bytes and len(self.index) <= self.max_entries:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, entry["file"]))
+            except OSError:
+                pass
+            total -= entry["size"]
+            del self.index[url]
+
+    def save_index(self):
+        """Merge unsaved changes into the index on disk, evict over the limits and write it back."""
+        with self.lock, file_lock(self.lock_path):
+            index = {}
+            if os.path.exists(self.index_path):
+                try:
+                    with open(self.index_path, 'r', encoding='utf-8') as f:
+                        index = json.load(f)
+                except Exception as e:
+                    print(f"Error loading reader cache index: {e}")
+            self.index = self._merge(index)
+            self.evict()
+            tmp_path = self.index_path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.index, f)
+            os.replace(tmp_path, self.index_path)
+            stat = os.stat(self.index_path)
+            self.index_stat = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+            self.added = {}
+            self.removed = set()
+            self.touched = {}
+            self.touched_since = None
+
+    def flush(self):
+        """Save atimes of reads not saved yet (on exit)."""
+        with self.lock:
+            if self.touched or self.removed:
+                self.save_index()
+
+def prefetch_articles(links, session, cache, max_workers=4, timeout=30):
+    """Fetch article pages for links not yet cached, max_workers at a time."""
+    links = [link for link in dict.fromkeys(links) if link and link.startswith("http") and link not in cache]
+    if not links:
+        return 0
+
+    def fetch_one(link):
+        try:
+            response = session.get(link, timeout=timeout)
+            response.raise_for_status()
+            if "html" not in response.headers.get("Content-Type", "text/html"):
+                return False
+            return cache.put(link, response.text)
+        except Exception as e:
+            print(f"Prefetch failed for {link}: {e}")
+            return False
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        cached = sum(1 for ok in pool.map(fetch_one, links) if ok)
+    print(f"Prefetched {cached}/{len(links)} articles into {cache.cache_dir}")
+    return cached
@@ -0,0 +1,284 @@
+# Retention for the data directory: per-area limits on file age, count and
+# total size, applied to an incrementally maintained index of the files.
+#
+#   python retention.py             - prune by the "retention" policies in data/settings.json
+#   python retention.py --dry-run   - only report what would be removed
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from datetime import datetime
+
+from settings import load_settings, DEFAULTS, SETTINGS_FILE
+from segments import SegmentLog
+from jobs import file_lock, FEEDS_LOCK
+
+RETENTION_INDEX_FILE = "data/retention_index.json"
+RETENTION_LOG = "data/retention.tsv"
+RETENTION_FIELDS = ["time", "area", "removed", "bytes", "by_age", "by_count", "by_size", "kept", "kept_bytes"]
+
+# Область: каталог в data/, расширение файлов, с подкаталогами, файлы-спутники с тем же именем
+AREAS = {
+    "global_feeds": ("global_feeds", ".csv", False, ()),
+    "feeds_xml": ("feeds", ".xml", False, ()),
+    "history": ("history", ".txt", True, ()),
+    "sort_index": ("sort_index", ".idx", False, (".json",)),
+}
+
+def area_policies(settings):
+    """Policies of every area: DEFAULTS["retention"] overlaid with data/settings.json, 0 meaning no limit."""
+    configured = settings.get("retention") or {}
+    policies = {}
+    for area in AREAS:
+        policy = dict(DEFAULTS["retention"].get(area, {}))
+        policy.update(configured.get(area) or {})
+        policies[area] = policy
+    return policies
+
+def format_size(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+class RetentionEngine:
+    """Removes the oldest files of each area over its age, count or size limit.
+
+    data/retention_index.json keeps, per area and directory, the mtime of the
+    directory and the size and mtime of its files. A directory is listed again
+    only when its mtime changes (a file was added, removed or renamed), so a
+    run over an unchanged tree stats the directories, not the files. Files
+    rewritten in place keep their old index entry until their directory
+    changes; every removal candidate is stat-ed again first, so a fresh
+    file is never removed on stale data.
+
+    Sealed segments are removed under FEEDS_LOCK and dropped from the
+    segment manifest; their items stay counted in data/feed_stats.tsv, which
+    FeedStats.rebuild keeps for days no longer on disk. Every run appends one
+    row per area to data/retention.tsv.
+    """
+
+    def __init__(self, data_dir="data", policies=None, index_path=None, log_path=None):
+        self.data_dir = data_dir
+        if policies is None:
+            policies = area_policies(load_settings(os.path.join(data_dir, os.path.basename(SETTINGS_FILE))))
+        self.policies = policies
+        self.index_path = index_path or os.path.join(data_dir, os.path.basename(RETENTION_INDEX_FILE))
+        self.log_path = log_path or os.path.join(data_dir, os.path.basename(RETENTION_LOG))
+        self.lock = threading.Lock()
+        self.index = {}  # область -> {каталог: [mtime_ns, [подкаталоги], {имя файла: [size, mtime]}]}
+        if os.path.isfile(self.index_path):
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    self.index = json.load(f)
+            except Exception as e:
+                print(f"Error loading retention index: {e}")
+            # Индекс старого формата ({"dirs", "files"}) строится заново
+            self.index = {area: dirs for area, dirs in self.index.items() if "dirs" not in dirs}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.index_path) or ".", exist_ok=True)
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f)
+        os.replace(tmp_path, self.index_path)
+
+    def refresh(self, area):
+        """Bring the index of an area up to date, listing only directories whose mtime changed."""
+        directory, ext, recursive, _ = AREAS[area]
+        root = os.path.join(self.data_dir, directory)
+        dirs = self.index.setdefault(area, {})
+        seen = set()
+        pending = [root]
+        while pending:
+            path = pending.pop()
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                continue
+            seen.add(path)
+            known = dirs.get(path)
+            if known is None or known[0] != mtime:
+                subdirs = []
+                files = {}
+                try:
+                    with os.scandir(path) as it:
+                        for item in it:
+                            if item.is_dir(follow_symlinks=False):
+                                subdirs.append(item.path)
+                            elif item.name.endswith(ext) and item.is_file(follow_symlinks=False):
+                                stat = item.stat()
+                                files[item.name] = [stat.st_size, stat.st_mtime]
+                except OSError as e:
+                    print(f"Error listing {path}: {e}")
+                    continue
+                known = dirs[path] = [mtime, sorted(subdirs), files]
+            if recursive:
+                pending.extend(known[1])
+        # Каталоги, которых больше нет, вместе с их файлами
+        for path in [path for path in dirs if path not in seen]:
+            del dirs[path]
+        return self.files(area)
+
+    def files(self, area):
+        """{path: [size, mtime]} of every indexed file of an area."""
+        return {os.path.join(path, name): entry
+                for path, (_, _, files) in self.index.get(area, {}).items() for name, entry in files.items()}
+
+    def plan(self, area, now=None):
+        """[(path, size, mtime, reason)] to remove from area, oldest first, by its policy."""
+        now = now or time.time()
+        policy = self.policies.get(area) or {}
+        max_age = (policy.get("max_age_days") or 0) * 86400
+        max_files = policy.get("max_files") or 0
+        max_bytes = (policy.get("max_mb") or 0) * 1024 * 1024
+        if not (max_age or max_files or max_bytes):
+            return []
+        files = sorted((mtime, size, path) for path, (size, mtime) in self.files(area).items())
+        total = sum(size for _, size, _ in files)
+        count = len(files)
+        plan = []
+        for mtime, size, path in files:
+            if max_age and mtime < now - max_age:
+                reason = "age"
+            elif max_files and count > max_files:
+                reason = "count"
+            elif max_bytes and total > max_bytes:
+                reason = "size"
+            else:
+                break  # остальные новее и в пределах лимитов
+            plan.append((path, size, mtime, reason))
+            total -= size
+            count -= 1
+        return plan
+
+    def _remove(self, area, path, mtime, reason, now):
+        """Delete one planned file after checking it again; returns the bytes freed, None if it was kept."""
+        directory, name = os.path.split(path)
+        files = self.index[area][directory][2]
+        try:
+            stat = os.stat(path)
+        except OSError:
+            files.pop(name, None)
+            return None
+        if stat.st_mtime != mtime:
+            # Файл переписан после индексации: по возрасту проверяем заново, по лимитам - в следующий раз
+            files[name] = [stat.st_size, stat.st_mtime]
+            policy = self.policies.get(area) or {}
+            if reason != "age" or stat.st_mtime >= now - (policy.get("max_age_days") or 0) * 86400:
+                return None
+        size = stat.st_size
+        try:
+            os.remove(path)
+            for ext in AREAS[area][3]:
+                companion = os.path.splitext(path)[0] + ext
+                if os.path.exists(companion):
+                    size += os.path.getsize(companion)
+                    os.remove(companion)
+        except OSError as e:
+            print(f"Error removing {path}: {e}")
+            return None
+        files.pop(name, None)
+        return size
+
+    def run(self, dry_run=False, now=None):
+        """Refresh the index and prune every area. Returns {area: report dict}."""
+        now = now or time.time()
+        report = {}
+        with self.lock:
+            for area in AREAS:
+                self.refresh(area)
+                plan = self.plan(area, now)
+                removed = []
+                if dry_run:
+                    removed = [(path, size, reason) for path, size, _, reason in plan]
+                elif plan and area == "global_feeds":
+                    # Перенос и запись сегментов не должны идти одновременно с удалением
+                    with file_lock(FEEDS_LOCK):
+                        removed = self._apply(area, plan, now)
+                        SegmentLog(os.path.join(self.data_dir, "segments.json")).forget(
+                            [path for path, _, _ in removed])
+                elif plan:
+                    removed = self._apply(area, plan, now)
+                files = self.files(area)
+                removed_paths = {path for path, _, _ in removed}
+                report[area] = {
+                    "removed": len(removed),
+                    "bytes": sum(size for _, size, _ in removed),
+                    "by_age": sum(1 for _, _, reason in removed if reason == "age"),
+                    "by_count": sum(1 for _, _, reason in removed if reason == "count"),
+                    "by_size": sum(1 for _, _, reason in removed if reason == "size"),
+                    "kept": sum(1 for path in files if path not in removed_paths),
+                    "kept_bytes": sum(size for path, (size, _) in files.items() if path not in removed_paths),
+                }
+            self.save()
+        if not dry_run:
+            self.log(report, now)
+        return report
+
+    def _apply(self, area, plan, now):
+        removed = []
+        for path, _, mtime, reason in plan:
+            size = self._remove(area, path, mtime, reason, now)
+            if size is not None:
+                removed.append((path, size, reason))
+        return removed
+
+    def log(self, report, now):
+        os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+        new = not os.path.exists(self.log_path)
+        stamp = datetime.fromtimestamp(now).strftime("%Y-%m-%d %H:%M:%S")
+        with open(self.log_path, 'a', encoding='utf-8') as f:
+            if new:
+                f.write("\t".join(RETENTION_FIELDS) + "\n")
+            for area, row in report.items():
+                f.write("\t".join([stamp, area] + [str(row[field]) for field in RETENTION_FIELDS[2:]]) + "\n")
+
+def describe(report):
+    """One line per area: what was reclaimed and what is kept."""
+    lines = []
+    for area, row in report.items():
+        reasons = ", ".join(f"{row[key]} by {key[3:]}" for key in ("by_age", "by_count", "by_size") if row[key])
+        lines.append(f"{area}: removed {row['removed']} files, {format_size(row['bytes'])}"
+                     f"{f' ({reasons})' if reasons else ''}; kept {row['kept']} files, {format_size(row['kept_bytes'])}")
+    return lines
+
+def last_run(log_path=RETENTION_LOG):
+    """Summary of the last run from data/retention.tsv: 'N files, X reclaimed', None if there was none."""
+    if not os.path.exists(log_path):
+        return None
+    with open(log_path, 'r', encoding='utf-8') as f:
+        rows = [line.rstrip("\n").split("\t") for line in f][1:]
+    if not rows:
+        return None
+    # Последний запуск - хвост файла, по одной строке на область
+    last = []
+    for row in reversed(rows):
+        if len(row) < len(RETENTION_FIELDS) or any(row[1] == seen[1] for seen in last):
+            break
+        last.append(row)
+    if not last:
+        return None
+    files = sum(int(row[2]) for row in last)
+    reclaimed = sum(int(row[3]) for row in last)
+    return f"{files} files, {format_size(reclaimed)} reclaimed"
+
+def run_retention(data_dir="data", dry_run=False):
+    report = RetentionEngine(data_dir).run(dry_run=dry_run)
+    for line in describe(report):
+        print(("[dry run] " if dry_run else "") + line)
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Prune the NeuroLit data directory by retention policies")
+    parser.add_argument("--dry-run", action="store_true", help="report what would be removed, remove nothing")
+    parser.add_argument("--data-dir", default="data", help="data directory (default: data)")
+    args = parser.parse_args()
+    run_retention(args.data_dir, dry_run=args.dry_run)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+import os
+import json
+import time
+from datetime import datetime
+
+from feed_items import read_column, parse_ts
+
+FEEDS_DIR = "data/feeds"
+GLOBAL_FEEDS_DIR = "data/global_feeds"
+SEGMENTS_MANIFEST = "data/segments.json"
+
+def manifest_stat(path):
+    """(mtime, size, inode) of the manifest: a rewrite within the mtime granularity still changes the inode."""
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+class SegmentLog:
+    """Append-only feed segments, rotated by size and by day, with a manifest.
+
+    data/feeds/<feed>.csv is the open segment a feed is appended to. A segment
+    is sealed when it outgrows segment_bytes or was opened on an earlier day:
+    it is renamed, never rewritten, to data/global_feeds/<feed>_<date>.csv
+    (<feed>_<date>_<n>.csv for further segments of the same day), where date
+    is the day the segment was opened.
+
+    data/segments.json:
+        {"open": {path: {"feed", "opened"}},
+         "sealed": [{"feed", "path", "opened", "sealed", "bytes"}]}
+
+    Callers hold FEEDS_LOCK, so the manifest has a single writer at a time;
+    a manifest changed by another SegmentLog is re-read before the next write.
+    """
+
+    def __init__(self, manifest_path=SEGMENTS_MANIFEST, feeds_dir=FEEDS_DIR, global_dir=GLOBAL_FEEDS_DIR,
+                 segment_bytes=32 * 1024 * 1024):
+        self.manifest_path = manifest_path
+        self.feeds_dir = feeds_dir
+        self.global_dir = global_dir
+        self.segment_bytes = segment_bytes
+        self.open_segments = {}
+        self.sealed = []
+        self.loaded_stat = None
+        self.refresh()
+
+    def refresh(self):
+        """Re-read the manifest if it was rewritten since it was loaded (by the push receiver or a rollover)."""
+        try:
+            stat = manifest_stat(self.manifest_path)
+        except OSError:
+            return
+        if stat == self.loaded_stat:
+            return
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            self.open_segments = manifest.get("open", {})
+            self.sealed = manifest.get("sealed", [])
+            self.loaded_stat = stat
+        except Exception as e:
+            print(f"Error loading segment manifest: {e}")
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.manifest_path) or ".", exist_ok=True)
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"open": self.open_segments, "sealed": self.sealed}, f)
+        os.replace(tmp_path, self.manifest_path)
+        self.loaded_stat = manifest_stat(self.manifest_path)
+
+    def opened(self, path):
+        """Open time of a segment; files from before the manifest count from their oldest save_date."""
+        entry = self.open_segments.get(path)
+        if entry is not None:
+            return entry["opened"]
+        # mtime - время последней записи: файл, дописанный сегодня, иначе никогда бы не закрылся
+        saved = [ts for ts in map(parse_ts, read_column(path, "save_date")) if ts]
+        return min(saved) if saved else int(os.path.getmtime(path))
+
+    def latest_sealed(self, feed):
+        """Path of the most recently sealed segment of feed that still exists, or None."""
+        for entry in reversed(self.sealed):
+            if entry["feed"] == feed and os.path.exists(entry["path"]):
+                return entry["path"]
+        return None
+
+    def before_write(self, path, now=None):
+        """Rotate the open segment at path if it is full or from an earlier day, and register a new one."""
+        now = int(now or time.time())
+        self.refresh()
+        changed = False
+        feed = os.path.splitext(os.path.basename(path))[0]
+        if os.path.exists(path):
+            opened = self.opened(path)
+            if (os.path.getsize(path) >= self.segment_bytes
+                    or datetime.fromtimestamp(opened).date() < datetime.fromtimestamp(now).date()):
+                self.seal(path, now, save=False)
+                changed = True
+            elif path not in self.open_segments:
+                # Файл из времени до манифеста, начатый сегодня
+                self.open_segments[path] = {"feed": feed, "opened": opened}
+                changed = True
+        if path not in self.open_segments or not os.path.exists(path):
+            self.open_segments[path] = {"feed": feed, "opened": now}
+            changed = True
+        if changed:
+            self.save()
+
+    def seal(self, path, now=None, save=True):
+        """Rename the open segment at path into global_feeds; returns the new path."""
+        now = int(now or time.time())
+        feed = os.path.splitext(os.path.basename(path))[0]
+        opened = self.opened(path)
+        date_str = datetime.fromtimestamp(opened).strftime("%Y-%m-%d")
+        os.makedirs(self.global_dir, exist_ok=True)
+        target = os.path.join(self.global_dir, f"{feed}_{date_str}.csv")
+        n = 2
+        while os.path.exists(target):
+            target = os.path.join(self.global_dir, f"{feed}_{date_str}_{n}.csv")
+            n += 1
+        size = os.path.getsize(path)
+        os.replace(path, target)
+        self.open_segments.pop(path, None)
+        self.sealed.append({"feed": feed, "path": target, "opened": opened, "sealed": now, "bytes": size})
+        if save:
+            self.save()
+        return target
+
+    def seal_day(self, now=None):
+        """Daily rollover: seal every open segment opened before today. Returns the sealed paths."""
+        now = int(now or time.time())
+        self.refresh()
+        today = datetime.fromtimestamp(now).date()
+        sealed = []
+        if os.path.isdir(self.feeds_dir):
+            for name in sorted(os.listdir(self.feeds_dir)):
+                path = os.path.join(self.feeds_dir, name)
+                if name.endswith(".csv") and datetime.fromtimestamp(self.opened(path)).date() < today:
+                    sealed.append(self.seal(path, now, save=False))
+        # Сегменты, удалённые вручную, не держим в манифесте
+        for path in [path for path in self.open_segments if not os.path.exists(path)]:
+            del self.open_segments[path]
+        self.save()
+        return sealed
+
+    def forget(self, paths):
+        """Drop removed sealed segments from the manifest (retention.py, under FEEDS_LOCK).
+
+        Paths are compared in absolute form: the manifest keeps them relative
+        to the program directory, retention.py may be given an absolute --data-dir.
+        """
+        paths = {os.path.abspath(path) for path in paths}
+        self.refresh()
+        sealed = [entry for entry in self.sealed if os.path.abspath(entry["path"]) not in paths]
+        if len(sealed) != len(self.sealed):
+            self.sealed = sealed
+            self.save()
+
+    def segments(self, feed=None):
+        """Sealed segments in the order they were sealed, optionally of one feed."""
+        return [entry for entry in self.sealed if feed is None or entry["feed"] == feed]
@@ -0,0 +1,74 @@
+import os
+import html
+import json
+import base64
+
+from PySide6.QtCore import Qt, QByteArray, QDataStream, QIODevice
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QLabel
+
+SESSION_FILE = "data/session.json"
+
+class PlaceholderTab(QWidget):
+    """Tab restored from the session but not loaded yet; MainWindow replaces it on first activation.
+
+    state is the saved tab state, see MainWindow.tab_state().
+    """
+
+    def __init__(self, state):
+        super().__init__()
+        self.state = state
+        layout = QVBoxLayout(self)
+        title = html.escape(state.get('title') or '')
+        location = html.escape(state.get('url') or state.get('path') or '')
+        label = QLabel(f"<b>{title}</b><br>{location}")
+        label.setAlignment(Qt.AlignCenter)
+        label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        layout.addWidget(label)
+
+def save_history(history):
+    """QWebEngineHistory as base64 of its QDataStream form, or None if the binding cannot stream it."""
+    try:
+        data = QByteArray()
+        stream = QDataStream(data, QIODevice.WriteOnly)
+        stream << history
+        # Без оператора для QWebEngineHistory PySide6 пишет объект как PyObjectWrapper
+        if b"PyObjectWrapper" in bytes(data[:64]):
+            return None
+        return base64.b64encode(bytes(data)).decode('ascii')
+    except Exception:
+        return None
+
+def history_urls(history):
+    """Fallback form of the history: URLs and the current position (see BrowserTab.load_saved_history)."""
+    return [item.url().toString() for item in history.items()], history.currentItemIndex()
+
+def restore_history(history, encoded):
+    """Load a history saved by save_history; the page then loads its current entry. Returns success."""
+    try:
+        stream = QDataStream(QByteArray(base64.b64decode(encoded)), QIODevice.ReadOnly)
+        stream >> history
+        return stream.status() == QDataStream.Ok and history.count() > 0
+    except Exception:
+        return False
+
+def load_session(file_path=SESSION_FILE):
+    """Saved session {"current": index, "tabs": [state, ...]}, or None."""
+    if not os.path.isfile(file_path):
+        return None
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            session = json.load(f)
+        return session if session.get("tabs") else None
+    except Exception as e:
+        print(f"Error loading session: {e}")
+        return None
+
+def save_session(tabs, current, file_path=SESSION_FILE):
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    try:
+        tmp_path = file_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"current": current, "tabs": tabs}, f, ensure_ascii=False)
+        os.replace(tmp_path, file_path)
+    except Exception as e:
+        print(f"Error saving session: {e}")
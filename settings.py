@@ -0,0 +1,54 @@
+import json
+import os
+
+SETTINGS_FILE = "data/settings.json"
+
+# Значения по умолчанию, переопределяются в data/settings.json
+DEFAULTS = {
+    "max_live_tabs": 8,        # Максимум вкладок с живым процессом рендера
+    "tab_idle_minutes": 20,    # Через сколько минут простоя вкладка выгружается
+    "max_loading_tabs": 3,     # Сколько фоновых вкладок загружается одновременно
+    "preload_tabs": 3,         # Сколько открытых в фоне вкладок загружать заранее, остальные - при переключении
+    "prefetch_articles": True, # Скачивать статьи новых элементов фидов в кэш
+    "prefetch_workers": 4,
+    "reader_cache_mb": 200,
+    "reader_cache_entries": 5000,
+    "story_index_days": 14,    # Сколько дней помнить истории для дедупликации между фидами
+    "fetch_workers": 8,        # Потоков загрузки фидов
+    "parse_processes": 2,      # Процессов разбора XML, 0 - разбирать в потоке без пула
+    "pipeline_queue_size": 16, # Фидов в очереди между стадиями загрузки, разбора и записи
+    "sort_memory_mb": 64,      # Файлы больше этого сортируются внешней сортировкой
+    "segment_mb": 32,          # Размер сегмента фида, после которого он закрывается и переносится в global_feeds
+    "websub_callback": "",     # Внешний адрес приёмника WebSub (http://host:port), пусто - push выключен
+    "websub_port": 8765,       # Порт, который слушает приёмник WebSub
+    "websub_lease_hours": 120, # Срок подписки, запрашиваемый у хаба
+    "websub_poll_hours": 6,    # Фиды с push всё равно опрашиваются раз в столько часов
+    # Лимиты хранения по областям data/ (retention.py): max_age_days, max_files, max_mb; 0 - без ограничения.
+    # Задаётся целиком или по отдельным областям, остальные берутся отсюда.
+    "retention": {
+        "global_feeds": {"max_age_days": 0, "max_files": 0, "max_mb": 0},
+        "feeds_xml": {"max_age_days": 7, "max_files": 0, "max_mb": 0},
+        "history": {"max_age_days": 0, "max_files": 0, "max_mb": 0},
+        "sort_index": {"max_age_days": 0, "max_files": 0, "max_mb": 512},
+    },
+}
+
+def load_settings(file_path=SETTINGS_FILE):
+    """Load settings from data/settings.json merged over DEFAULTS."""
+    settings = dict(DEFAULTS)
+    if os.path.isfile(file_path):
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                settings.update(json.load(f))
+        except Exception as e:
+            print(f"Error loading settings: {e}")
+    return settings
+
+def save_settings(settings, file_path=SETTINGS_FILE):
+    """Write settings back to data/settings.json."""
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    try:
+        with open(file_path, 'w', encoding='utf-8') as f:
+            json.dump(settings, f, indent=2, ensure_ascii=False)
+    except Exception as e:
+        print(f"Error saving settings: {e}")
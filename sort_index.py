@@ -0,0 +1,145 @@
+import os
+import csv
+import json
+import heapq
+import hashlib
+import tempfile
+from array import array
+
+from feed_items import FIELDS, FeedBatch, parse_pub_date, parse_ts
+
+SORT_INDEX_DIR = "data/sort_index"
+
+# Колонки, по которым можно сортировать, и тип ключа
+SORT_COLUMNS = {"title": "text", "pub_date": "int", "save_date": "int"}
+
+def _row_key(row, positions, column):
+    """Sort key of a raw TSV row."""
+    def cell(name):
+        i = positions.get(name)
+        return row[i] if i is not None and i < len(row) else ""
+    if column == "title":
+        return cell("title").casefold()
+    if column == "save_date":
+        return parse_ts(cell("save_date"))
+    ts = cell("pub_ts")
+    return int(ts) if ts.isdigit() else (parse_pub_date(cell("pub_date")) or parse_ts(cell("save_date")))
+
+def _batch_keys(batch, column):
+    if column == "title":
+        return [title.casefold() for title in batch.titles]
+    if column == "save_date":
+        return batch.save_ts
+    return batch.pub_ts
+
+def _iter_rows(file_path):
+    """Data rows of a feed file with {column: position}, the same rows FeedBatch.read_tsv reads."""
+    f = open(file_path, 'r', newline='', encoding='utf-8')
+    reader = csv.reader(f, delimiter='\t')
+    header = next(reader, None)
+    if header is None:
+        f.close()
+        return {}, iter(())
+    if "title" in header and "link" in header:
+        positions = {name: i for i, name in enumerate(header)}
+        first = []
+    else:
+        positions = {name: i for i, name in enumerate(FIELDS)}
+        first = [header]
+
+    def rows():
+        with f:
+            yield from first
+            yield from reader
+    return positions, rows()
+
+def _write_run(records, directory):
+    records.sort()
+    run = tempfile.NamedTemporaryFile('w', newline='', encoding='utf-8', dir=directory, suffix=".run", delete=False)
+    with run:
+        writer = csv.writer(run, delimiter='\t')
+        writer.writerows(records)
+    return run.name
+
+def _read_run(path, kind):
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        for key, row_no in csv.reader(f, delimiter='\t'):
+            yield (int(key) if kind == "int" else key), int(row_no)
+
+def external_sort(file_path, column, chunk_rows=200000, temp_dir=None):
+    """Row numbers of file_path ordered by column, sorting chunk_rows at a time and merging sorted runs from disk."""
+    kind = SORT_COLUMNS[column]
+    positions, rows = _iter_rows(file_path)
+    runs = []
+    with tempfile.TemporaryDirectory(dir=temp_dir) as directory:
+        chunk = []
+        for row_no, row in enumerate(rows):
+            chunk.append((_row_key(row, positions, column), row_no))
+            if len(chunk) >= chunk_rows:
+                runs.append(_write_run(chunk, directory))
+                chunk = []
+        if chunk:
+            runs.append(_write_run(chunk, directory))
+        order = array('I')
+        for _, row_no in heapq.merge(*(_read_run(run, kind) for run in runs)):
+            order.append(row_no)
+    return order
+
+class SortIndex:
+    """Persisted sort permutations of feed files, one per column.
+
+    data/sort_index/<sha1 of path>_<column>.idx - uint32 row numbers, ascending
+    data/sort_index/<sha1 of path>_<column>.json - path, size and mtime it was built for
+
+    Descending order reads the same permutation backwards. Files bigger than
+    memory_bytes are sorted with an external merge sort.
+    """
+
+    def __init__(self, index_dir=SORT_INDEX_DIR, memory_bytes=64 * 1024 * 1024):
+        self.index_dir = index_dir
+        self.memory_bytes = memory_bytes
+        os.makedirs(index_dir, exist_ok=True)
+
+    def _paths(self, file_path, column):
+        key = hashlib.sha1(os.path.abspath(file_path).encode('utf-8')).hexdigest()
+        base = os.path.join(self.index_dir, f"{key}_{column}")
+        return base + ".idx", base + ".json"
+
+    def load(self, file_path, column):
+        """Saved permutation if it is still current for the file, else None."""
+        idx_path, meta_path = self._paths(file_path, column)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            stat = os.stat(file_path)
+            if meta["size"] != stat.st_size or meta["mtime"] != stat.st_mtime:
+                return None
+            order = array('I')
+            with open(idx_path, 'rb') as f:
+                order.frombytes(f.read())
+            return order if len(order) == meta["rows"] else None
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def build(self, file_path, column, batch=None):
+        """Sort the file by column and save the permutation. batch is the already loaded file, if any."""
+        stat = os.stat(file_path)
+        if batch is None and stat.st_size > self.memory_bytes:
+            order = external_sort(file_path, column, temp_dir=self.index_dir)
+        else:
+            if batch is None:
+                batch = FeedBatch.read_tsv(file_path)
+            keys = _batch_keys(batch, column)
+            order = array('I', sorted(range(len(keys)), key=keys.__getitem__))
+        idx_path, meta_path = self._paths(file_path, column)
+        with open(idx_path + ".tmp", 'wb') as f:
+            order.tofile(f)
+        os.replace(idx_path + ".tmp", idx_path)
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump({"path": file_path, "column": column, "size": stat.st_size,
+                       "mtime": stat.st_mtime, "rows": len(order)}, f)
+        return order
+
+    def get(self, file_path, column, batch=None):
+        order = self.load(file_path, column)
+        return order if order is not None else self.build(file_path, column, batch)
@@ -0,0 +1,142 @@
+import threading
+
+from PySide6.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem,
+    QHeaderView, QLabel, QPushButton, QSplitter
+)
+from PySide6.QtCore import Qt, Signal
+
+from feed_stats import FeedStats, format_time
+from jobs import file_lock, LockTimeout, FEEDS_LOCK
+
+COLUMNS = ["feed", "items", "per day", "last 7 days", "since", "last published", "last saved", "avg chars"]
+
+class NumberItem(QTableWidgetItem):
+    """Table cell sorted by its number, not its text."""
+
+    def __init__(self, value, text=None):
+        super().__init__(text if text is not None else str(value))
+        self.value = value
+        self.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+
+    def __lt__(self, other):
+        if isinstance(other, NumberItem):
+            return self.value < other.value
+        return super().__lt__(other)
+
+class StatsTab(QWidget):
+    """Per-feed statistics from the FeedStats rollups; the days of the selected feed below."""
+
+    # Пересчёт закончился (из рабочего потока)
+    rebuilt = Signal(str)
+
+    def __init__(self, main_window, stats=None):
+        super().__init__()
+        self.main_window = main_window
+        self.stats = stats if stats is not None else FeedStats()
+        self.layout = QVBoxLayout(self)
+
+        header_layout = QHBoxLayout()
+        self.title_label = QLabel("<b>Statistics</b>")
+        header_layout.addWidget(self.title_label)
+        header_layout.addStretch()
+        self.rebuild_btn = QPushButton("Rebuild")
+        self.rebuild_btn.setToolTip("Recount from all feed files (slow, only needed once)")
+        self.rebuild_btn.clicked.connect(self.rebuild)
+        header_layout.addWidget(self.rebuild_btn)
+        refresh_btn = QPushButton("Refresh")
+        refresh_btn.setFixedWidth(80)
+        refresh_btn.clicked.connect(self.reload)
+        header_layout.addWidget(refresh_btn)
+        self.layout.addLayout(header_layout)
+
+        splitter = QSplitter(Qt.Vertical)
+        self.table = QTableWidget(0, len(COLUMNS))
+        self.table.setHorizontalHeaderLabels(COLUMNS)
+        self.table.setAlternatingRowColors(True)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.itemSelectionChanged.connect(self.show_days)
+        splitter.addWidget(self.table)
+
+        self.days_table = QTableWidget(0, 5)
+        self.days_table.setHorizontalHeaderLabels(["day", "items", "avg chars", "last published", "last saved"])
+        self.days_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.days_table.horizontalHeader().setStretchLastSection(True)
+        splitter.addWidget(self.days_table)
+        splitter.setSizes([500, 200])
+        self.layout.addWidget(splitter)
+
+        self.rebuilt.connect(self.on_rebuilt)
+        self.reload()
+
+    def reload(self):
+        rows = self.stats.summary()
+        selected = self.selected_feed()
+        self.table.setSortingEnabled(False)
+        self.table.setRowCount(len(rows))
+        for r, row in enumerate(rows):
+            self.table.setItem(r, 0, QTableWidgetItem(row["feed"]))
+            self.table.setItem(r, 1, NumberItem(row["items"]))
+            self.table.setItem(r, 2, NumberItem(row["per_day"], f"{row['per_day']:.1f}"))
+            self.table.setItem(r, 3, NumberItem(row["recent"]))
+            self.table.setItem(r, 4, QTableWidgetItem(row["first_day"]))
+            self.table.setItem(r, 5, QTableWidgetItem(format_time(row["last_pub_ts"])))
+            self.table.setItem(r, 6, QTableWidgetItem(format_time(row["last_save_ts"])))
+            self.table.setItem(r, 7, NumberItem(row["avg_chars"], f"{row['avg_chars']:.0f}"))
+        self.table.setSortingEnabled(True)
+        self.table.resizeColumnsToContents()
+        if self.table.columnWidth(0) > 300:
+            self.table.setColumnWidth(0, 300)
+        total = sum(row["items"] for row in rows)
+        self.title_label.setText(f"<b>Statistics</b> - {len(rows)} feeds, {total} items")
+        if not self.stats.built:
+            # Пока не было пересчёта, в таблице только элементы, пришедшие после обновления
+            self.title_label.setText(f"<b>Statistics</b> - {len(rows)} feeds, {total} items since the upgrade; "
+                                     "press Rebuild to count existing feeds")
+        if selected:
+            found = self.table.findItems(selected, Qt.MatchExactly)
+            if found:
+                self.table.selectRow(found[0].row())
+
+    def selected_feed(self):
+        rows = self.table.selectionModel().selectedRows()
+        if not rows:
+            return None
+        item = self.table.item(rows[0].row(), 0)
+        return item.text() if item else None
+
+    def show_days(self):
+        feed = self.selected_feed()
+        days = self.stats.days(feed) if feed else []
+        self.days_table.setRowCount(len(days))
+        for r, (day, items, chars, last_pub, last_save) in enumerate(days):
+            self.days_table.setItem(r, 0, QTableWidgetItem(day))
+            self.days_table.setItem(r, 1, NumberItem(items))
+            self.days_table.setItem(r, 2, NumberItem(chars / items if items else 0,
+                                                     f"{chars / items if items else 0:.0f}"))
+            self.days_table.setItem(r, 3, QTableWidgetItem(format_time(last_pub)))
+            self.days_table.setItem(r, 4, QTableWidgetItem(format_time(last_save)))
+        self.days_table.resizeColumnsToContents()
+
+    def rebuild(self):
+        self.rebuild_btn.setEnabled(False)
+        self.title_label.setText("<b>Statistics</b> - counting all feed files...")
+
+        def run():
+            try:
+                with file_lock(FEEDS_LOCK, timeout=60):
+                    count = self.stats.rebuild()
+                self.rebuilt.emit(f"Statistics rebuilt for {count} feeds")
+            except LockTimeout:
+                self.rebuilt.emit("Feeds are being written, try again later")
+            except Exception as e:
+                self.rebuilt.emit(f"Error rebuilding statistics: {e}")
+        threading.Thread(target=run, daemon=True).start()
+
+    def on_rebuilt(self, message):
+        self.rebuild_btn.setEnabled(True)
+        self.reload()
+        self.main_window.status_bar.showMessage(message)
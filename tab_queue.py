@@ -0,0 +1,88 @@
+import time
+from collections import deque
+
+from PySide6.QtCore import QObject, QTimer
+
+class TabLoadQueue(QObject):
+    """Loads a few background placeholder tabs ahead of their activation.
+
+    Only max_preload queued tabs are loaded before the user looks at them;
+    a preloaded tab frees its place when it is activated or closed, so
+    hibernation discarding it does not make room for the next one. At most
+    max_loading pages load at once and no tab is loaded while max_live_tabs
+    renderers are alive; the rest stay placeholders until they are activated.
+    The focused tab is never queued: MainWindow loads it at once and only
+    registers it here with track(), so it takes a slot from the background
+    tabs instead of waiting for one.
+    """
+
+    def __init__(self, main_window, browser_tab_class, max_loading=3, max_preload=3, load_timeout=30):
+        super().__init__(main_window)
+        self.main_window = main_window
+        self.browser_tab_class = browser_tab_class
+        self.max_loading = max_loading
+        self.max_preload = max_preload
+        self.load_timeout = load_timeout
+        self.pending = deque()    # PlaceholderTab
+        self.loading = {}         # BrowserTab -> время начала загрузки
+        self.preloaded = set()    # загруженные очередью и ещё не открытые пользователем
+        # Страница, которая так и не закончила загрузку, не держит слот вечно
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.expire)
+        self.timer.start(5000)
+
+    def __len__(self):
+        return len(self.pending)
+
+    def enqueue(self, placeholder):
+        self.pending.append(placeholder)
+        self.pump()
+
+    def track(self, tab):
+        """Count a tab that has started loading against max_loading."""
+        if tab in self.loading:
+            return
+        self.loading[tab] = time.monotonic()
+        tab.browser.loadFinished.connect(lambda _, tab=tab: self.finished(tab))
+
+    def forget(self, widget):
+        """Drop a closed or activated tab from the queue."""
+        if widget in self.pending:
+            self.pending.remove(widget)
+        preloaded = widget in self.preloaded
+        self.preloaded.discard(widget)
+        if self.loading.pop(widget, None) is not None or preloaded:
+            self.pump()
+
+    def activated(self, tab):
+        """The user opened a tab the queue preloaded: its place goes to the next queued tab."""
+        if tab in self.preloaded:
+            self.preloaded.discard(tab)
+            self.pump()
+
+    def finished(self, tab):
+        if self.loading.pop(tab, None) is not None:
+            self.pump()
+
+    def expire(self):
+        now = time.monotonic()
+        for tab, started in list(self.loading.items()):
+            if now - started > self.load_timeout:
+                del self.loading[tab]
+        self.pump()
+
+    def pump(self):
+        window = self.main_window
+        while self.pending and len(self.loading) < self.max_loading and len(self.preloaded) < self.max_preload:
+            live = sum(1 for t in window.browser_tabs() if not t.is_discarded())
+            if live >= window.settings["max_live_tabs"]:
+                break
+            placeholder = self.pending.popleft()
+            i = window.tabs.indexOf(placeholder)
+            if i == -1:
+                continue
+            tab = window.load_placeholder(i)
+            if isinstance(tab, self.browser_tab_class):
+                self.preloaded.add(tab)
+                self.track(tab)
+        window.update_memory_label()
@@ -0,0 +1,162 @@
+import os
+import re
+import json
+import heapq
+import threading
+
+from feed_items import FeedBatch, read_column, parse_pub_date, parse_ts
+
+FEED_DIRS = ("data/feeds", "data/global_feeds")
+TIMELINE_INDEX_FILE = "data/timeline_index.json"
+
+DATE_SUFFIX_RE = re.compile(r'_\d{4}-\d{2}-\d{2}(?:_\d+)?$')
+
+def feed_name(file_path):
+    """Feed of an open or sealed segment: the file name without the date (and segment number)."""
+    return DATE_SUFFIX_RE.sub("", os.path.splitext(os.path.basename(file_path))[0])
+
+def file_time_range(file_path):
+    """(min pub_ts, max pub_ts, count) of a feed file, reading only the timestamp columns."""
+    stamps = read_column(file_path, "pub_ts")
+    if any(not ts.isdigit() for ts in stamps):
+        # Файл без pub_ts (или со старыми строками) - разбираем даты
+        dates = read_column(file_path, "pub_date")
+        saved = read_column(file_path, "save_date")
+        stamps = [int(ts) if ts.isdigit() else (parse_pub_date(date) or parse_ts(save))
+                  for ts, date, save in zip(stamps, dates, saved)]
+    else:
+        stamps = [int(ts) for ts in stamps]
+    if not stamps:
+        return 0, 0, 0
+    return min(stamps), max(stamps), len(stamps)
+
+class TimelineIndex:
+    """Time range of every feed file, so a range query opens only the files that overlap it.
+
+    data/timeline_index.json:
+        {path: [size, mtime, min_ts, max_ts, count]}
+    A file is rescanned only when its size or mtime changes; a segment sealed
+    into global_feeds is a rename, so it takes over the entry of its old path.
+    """
+
+    def __init__(self, file_path=TIMELINE_INDEX_FILE, feed_dirs=FEED_DIRS):
+        self.file_path = file_path
+        self.feed_dirs = feed_dirs
+        self.lock = threading.Lock()
+        self.entries = {}
+        if os.path.isfile(file_path):
+            try:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except Exception as e:
+                print(f"Error loading timeline index: {e}")
+
+    def refresh(self):
+        """Rescan changed files, drop removed ones. Returns {path: (min_ts, max_ts, count)}."""
+        with self.lock:
+            seen = set()
+            changed = False
+            # (size, mtime, фид) -> запись: закрытый сегмент находит запись, сделанную до переименования
+            moved = {(entry[0], entry[1], feed_name(path)): entry for path, entry in self.entries.items()}
+            for feed_dir in self.feed_dirs:
+                if not os.path.isdir(feed_dir):
+                    continue
+                for name in os.listdir(feed_dir):
+                    if not name.endswith(".csv"):
+                        continue
+                    path = os.path.join(feed_dir, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    seen.add(path)
+                    entry = self.entries.get(path)
+                    if entry is None:
+                        entry = moved.pop((stat.st_size, stat.st_mtime, feed_name(path)), None)
+                        if entry is not None:
+                            self.entries[path] = list(entry)
+                            changed = True
+                    if entry is None or entry[0] != stat.st_size or entry[1] != stat.st_mtime:
+                        try:
+                            self.entries[path] = [stat.st_size, stat.st_mtime, *file_time_range(path)]
+                            changed = True
+                        except Exception as e:
+                            print(f"Error indexing {path}: {e}")
+            for path in list(self.entries):
+                if path not in seen:
+                    del self.entries[path]
+                    changed = True
+            if changed:
+                self.save()
+            return {path: tuple(entry[2:]) for path, entry in self.entries.items() if entry[4]}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.file_path) or ".", exist_ok=True)
+        tmp_path = self.file_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.file_path)
+
+def file_stream(file_path, start_ts=None, end_ts=None):
+    """Items of one file newest first as (-pub_ts, row, batch), limited to [start_ts, end_ts]."""
+    batch = FeedBatch.read_tsv(file_path, feed=feed_name(file_path))
+    stamps = batch.pub_ts
+    order = sorted(range(len(batch)), key=stamps.__getitem__, reverse=True)
+    for i in order:
+        ts = stamps[i]
+        if end_ts is not None and ts > end_ts:
+            continue
+        if start_ts is not None and ts < start_ts:
+            break
+        yield -ts, i, batch
+
+def merge_newest_first(ranges, start_ts=None, end_ts=None):
+    """Lazy k-way merge of per-file streams, newest first.
+
+    ranges is {path: (min_ts, max_ts, count)}. Files are opened in order of
+    their newest item, and only once the merge reaches that time, so the
+    first page of a timeline over hundreds of feeds reads a handful of files.
+    Yields (pub_ts, batch, row).
+    """
+    files = sorted(((max_ts, path) for path, (min_ts, max_ts, count) in ranges.items()
+                    if (start_ts is None or max_ts >= start_ts) and (end_ts is None or min_ts <= end_ts)),
+                   reverse=True)
+    heap = []
+    next_file = 0
+    while True:
+        # Открываем файлы, в которых может быть элемент новее текущей вершины кучи
+        while next_file < len(files) and (not heap or files[next_file][0] >= -heap[0][0]):
+            stream = file_stream(files[next_file][1], start_ts, end_ts)
+            first = next(stream, None)
+            if first is not None:
+                heapq.heappush(heap, (first[0], next_file, first[1], first[2], stream))
+            next_file += 1
+        if not heap:
+            return
+        neg_ts, file_no, row, batch, stream = heap[0]
+        yield -neg_ts, batch, row
+        following = next(stream, None)
+        if following is None:
+            heapq.heappop(heap)
+        else:
+            heapq.heapreplace(heap, (following[0], file_no, following[1], following[2], stream))
+
+class Timeline:
+    """Newest-first river of items across all feed files, read in pages."""
+
+    def __init__(self, index=None, start_ts=None, end_ts=None):
+        self.index = index if index is not None else TimelineIndex()
+        self.start_ts = start_ts
+        self.end_ts = end_ts
+        self.items = None
+
+    def page(self, size=100):
+        """Next size items as a list of (pub_ts, batch, row); empty at the end."""
+        if self.items is None:
+            self.items = merge_newest_first(self.index.refresh(), self.start_ts, self.end_ts)
+        page = []
+        for item in self.items:
+            page.append(item)
+            if len(page) >= size:
+                break
+        return page
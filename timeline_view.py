@@ -0,0 +1,103 @@
+import time
+from datetime import datetime
+
+from PySide6.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem,
+    QHeaderView, QLabel, QPushButton, QComboBox, QMenu
+)
+from PySide6.QtCore import Qt, QUrl
+
+from timeline import Timeline, TimelineIndex
+
+PAGE_SIZE = 100
+
+# Период ленты: подпись -> секунд назад (None - всё)
+RANGES = [("All", None), ("24 hours", 86400), ("7 days", 7 * 86400), ("30 days", 30 * 86400)]
+
+class TimelineTab(QWidget):
+    """River of items from all feeds, newest first, loaded page by page."""
+
+    def __init__(self, main_window, index=None):
+        super().__init__()
+        self.main_window = main_window
+        self.index = index if index is not None else TimelineIndex()
+        self.timeline = None
+        self.layout = QVBoxLayout(self)
+
+        header_layout = QHBoxLayout()
+        self.title_label = QLabel("<b>Timeline</b>")
+        header_layout.addWidget(self.title_label)
+        header_layout.addStretch()
+        self.range_box = QComboBox()
+        for label, _ in RANGES:
+            self.range_box.addItem(label)
+        self.range_box.currentIndexChanged.connect(self.reload)
+        header_layout.addWidget(self.range_box)
+        refresh_btn = QPushButton("Refresh")
+        refresh_btn.setFixedWidth(80)
+        refresh_btn.clicked.connect(self.reload)
+        header_layout.addWidget(refresh_btn)
+        self.layout.addLayout(header_layout)
+
+        self.table = QTableWidget(0, 4)
+        self.table.setHorizontalHeaderLabels(["published", "feed", "title", "link"])
+        self.table.setAlternatingRowColors(True)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.table.customContextMenuRequested.connect(self.show_context_menu)
+        # Следующая страница подгружается при прокрутке до конца
+        self.table.verticalScrollBar().valueChanged.connect(self.on_scroll)
+        self.layout.addWidget(self.table)
+
+        self.more_btn = QPushButton("Load more")
+        self.more_btn.clicked.connect(self.load_page)
+        self.layout.addWidget(self.more_btn)
+
+        self.reload()
+
+    def reload(self):
+        seconds = RANGES[self.range_box.currentIndex()][1]
+        start_ts = int(time.time()) - seconds if seconds else None
+        self.timeline = Timeline(self.index, start_ts=start_ts)
+        self.table.setRowCount(0)
+        self.more_btn.setEnabled(True)
+        self.load_page()
+        self.table.resizeColumnsToContents()
+        for column, width in ((1, 200), (2, 700)):
+            if self.table.columnWidth(column) > width:
+                self.table.setColumnWidth(column, width)
+
+    def load_page(self):
+        page = self.timeline.page(PAGE_SIZE)
+        if not page:
+            self.more_btn.setEnabled(False)
+            return
+        row = self.table.rowCount()
+        self.table.setRowCount(row + len(page))
+        for pub_ts, batch, i in page:
+            published = datetime.fromtimestamp(pub_ts).strftime("%Y-%m-%d %H:%M")
+            link = QTableWidgetItem(batch.links[i])
+            link.setForeground(Qt.blue)
+            self.table.setItem(row, 0, QTableWidgetItem(published))
+            self.table.setItem(row, 1, QTableWidgetItem(batch.feed(i)))
+            self.table.setItem(row, 2, QTableWidgetItem(batch.titles[i]))
+            self.table.setItem(row, 3, link)
+            row += 1
+        self.title_label.setText(f"<b>Timeline</b> - {self.table.rowCount()} items")
+
+    def on_scroll(self, value):
+        if value == self.table.verticalScrollBar().maximum() and self.more_btn.isEnabled():
+            self.load_page()
+
+    def show_context_menu(self, pos):
+        item = self.table.itemAt(pos)
+        if item is None:
+            return
+        url = self.table.item(item.row(), 3).text()
+        menu = QMenu(self)
+        open_action = menu.addAction("Open Link")
+        if menu.exec(self.table.viewport().mapToGlobal(pos)) == open_action:
+            if not self.main_window.add_reader_tab(url):
+                self.main_window.add_new_tab(QUrl(url), "Loading...")
@@ -0,0 +1,552 @@
+# WebSub (PubSubHubbub) push subscriber: hubs found in fetched feeds push new
+# content to a local HTTP callback instead of waiting for the next poll.
+#
+#   python websub.py --selftest   - subscribe and receive a push through a local stand-in hub
+
+import os
+import re
+import sys
+import hmac
+import csv
+import json
+import time
+import queue
+import hashlib
+import secrets
+import argparse
+import threading
+import tempfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, urljoin
+
+import requests
+
+from jobs import file_lock, FEEDS_LOCK, FEED_LIST_LOCK
+from feed_parsers import parse_feed
+from segments import SegmentLog
+
+WEBSUB_FILE = "data/websub.json"
+FEEDS_CSV = "data/feeds.csv"
+
+# Больше хаб не пришлёт: приёмник слушает все интерфейсы, тело читается в память целиком
+MAX_PUSH_BYTES = 10 * 1024 * 1024
+
+# <link rel="hub" href="..."> (Atom, atom:link в RSS) - атрибуты в любом порядке
+LINK_TAG_RE = re.compile(rb'<(?:[\w-]+:)?link\b([^>]*)>', re.I)
+ATTR_RE = re.compile(rb'([\w:-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+# HTTP-заголовок Link: <https://hub>; rel="hub", <https://self>; rel="self"
+LINK_HEADER_RE = re.compile(r'<([^>]*)>\s*;\s*rel="?([^";,]+)"?')
+
+def discover(content, headers=None, base_url=""):
+    """(hub, self) URLs advertised by a feed in Link headers, <link> elements or JSON Feed hubs; None if absent."""
+    links = {}
+    for value in (headers or {}).get("Link", "").split(","):
+        match = LINK_HEADER_RE.search(value)
+        if match:
+            for rel in match.group(2).split():
+                links.setdefault(rel.lower(), match.group(1).strip())
+    head = content[:65536]
+    if isinstance(head, str):
+        head = head.encode('utf-8', errors='replace')
+    if head.lstrip().startswith(b"{"):
+        try:
+            feed = json.loads(content)
+            for hub in feed.get("hubs") or ():
+                if isinstance(hub, dict) and hub.get("url"):
+                    links.setdefault("hub", hub["url"])
+            if feed.get("feed_url"):
+                links.setdefault("self", feed["feed_url"])
+        except (ValueError, AttributeError):
+            pass
+    else:
+        for tag in LINK_TAG_RE.finditer(head):
+            attrs = {m.group(1).lower(): (m.group(2) if m.group(2) is not None else m.group(3))
+                     for m in ATTR_RE.finditer(tag.group(1))}
+            href = attrs.get(b"href")
+            if href:
+                for rel in attrs.get(b"rel", b"").split():
+                    links.setdefault(rel.lower().decode('ascii', 'replace'), href.decode('utf-8', 'replace').strip())
+    hub = links.get("hub")
+    if not hub:
+        return None, None
+    return urljoin(base_url, hub), urljoin(base_url, links.get("self") or base_url)
+
+def subscription_id():
+    """Random callback path token: knowing the feed URL must not be enough to forge a verification."""
+    return secrets.token_urlsafe(16)
+
+def legacy_subscription_id(feed_url):
+    # Прежний id из адреса фида - вычисляется кем угодно
+    return hashlib.sha1(feed_url.encode('utf-8')).hexdigest()[:16]
+
+def sign(secret, body, algorithm="sha256"):
+    return f"{algorithm}={hmac.new(secret.encode('utf-8'), body, algorithm).hexdigest()}"
+
+def check_signature(secret, body, header):
+    """True if X-Hub-Signature (sha1, sha256, sha384 or sha512) matches the body."""
+    algorithm, _, digest = (header or "").partition("=")
+    if algorithm not in ("sha1", "sha256", "sha384", "sha512") or not digest:
+        return False
+    return hmac.compare_digest(sign(secret, body, algorithm), f"{algorithm}={digest.lower()}")
+
+class WebSubSubscriber:
+    """Subscribes to hubs advertised by polled feeds and ingests what they push.
+
+    data/websub.json, by feed URL from feeds.csv:
+        {"id", "hub", "topic", "base", "secret", "state": pending|active|denied|unsubscribing,
+         "requested", "lease_until", "last_push", "last_poll"}
+
+    The callback server answers hub verification (GET /websub/<id>, echoing
+    hub.challenge only for a subscription we asked for) and content delivery
+    (POST /websub/<id>, HMAC-signed with the subscription secret). Delivered
+    feeds are parsed and appended by one worker thread through save_items,
+    under FEEDS_LOCK like the polling writer, so pushed and polled copies of an
+    item are deduplicated the same way.
+
+    A feed with an active lease is still polled every poll_hours, in case the
+    hub stops delivering. Feeds removed from feeds.csv are unsubscribed, and
+    their pushes are dropped until the hub confirms.
+    """
+
+    def __init__(self, callback_url, port=8765, data_path=WEBSUB_FILE, story_index=None, html_store=None,
+                 alerts=None, segment_bytes=32 * 1024 * 1024, lease_hours=120, poll_hours=6,
+                 on_feed_updated=None, stats=None, feeds_path=FEEDS_CSV):
+        self.callback_url = callback_url.rstrip("/")
+        self.port = port
+        self.data_path = data_path
+        self.story_index = story_index
+        self.html_store = html_store
+        self.alerts = alerts
+        self.stats = stats
+        self.segment_bytes = segment_bytes
+        self.lease_seconds = int(lease_hours * 3600)
+        self.poll_seconds = poll_hours * 3600
+        self.on_feed_updated = on_feed_updated  # on_feed_updated(url, csv_file, count), из рабочего потока
+        self.feeds_path = feeds_path
+        self.feeds_stat = None
+        self.feeds = set()
+        self.lock = threading.Lock()
+        self.subscriptions = {}
+        self.by_id = {}
+        self.pushes = queue.Queue()
+        self.server = None
+        self.load()
+
+    def load(self):
+        if os.path.isfile(self.data_path):
+            try:
+                with open(self.data_path, 'r', encoding='utf-8') as f:
+                    self.subscriptions = json.load(f)
+            except Exception as e:
+                print(f"Error loading WebSub subscriptions: {e}")
+        # Подписки с угадываемым id: новый адрес приёмника, подписка заново при следующем опросе фида;
+        # старый адрес отвечает 410, и хаб перестаёт на него слать
+        migrated = False
+        for url, sub in self.subscriptions.items():
+            if sub["id"] == legacy_subscription_id(url):
+                sub["id"] = subscription_id()
+                sub["state"] = "pending"
+                sub["requested"] = 0
+                migrated = True
+        if migrated:
+            self.save()
+        self.by_id = {sub["id"]: url for url, sub in self.subscriptions.items()}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.data_path) or ".", exist_ok=True)
+        tmp_path = self.data_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.subscriptions, f, indent=1)
+        os.replace(tmp_path, self.data_path)
+
+    def start(self):
+        """Start the callback server and the ingest worker; False if the port is taken."""
+        try:
+            self.server = ThreadingHTTPServer(("", self.port), CallbackHandler)
+        except OSError as e:
+            print(f"WebSub callback server unavailable on port {self.port}: {e}")
+            return False
+        self.server.daemon_threads = True
+        self.server.subscriber = self
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        threading.Thread(target=self.ingest_worker, daemon=True).start()
+        print(f"WebSub callback listening on port {self.port}")
+        return True
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        self.pushes.put(None)
+
+    def feed_urls(self):
+        """URLs in feeds.csv, re-read only when the file changed; None if there is no feed list."""
+        try:
+            stat = os.stat(self.feeds_path)
+        except OSError:
+            return None
+        key = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        if key != self.feeds_stat:
+            with file_lock(FEED_LIST_LOCK):
+                with open(self.feeds_path, 'r', encoding='utf-8') as f:
+                    self.feeds = {row['url'] for row in csv.DictReader(f, delimiter='\t') if row.get('url')}
+            self.feeds_stat = key
+        return self.feeds
+
+    def prune(self, feed_urls=None):
+        """Unsubscribe every feed no longer in feeds.csv (or in feed_urls). Returns the number unsubscribed."""
+        if feed_urls is None:
+            feed_urls = self.feed_urls()
+            if feed_urls is None:
+                return 0
+        now = time.time()
+        with self.lock:
+            # Неподтверждённую отписку повторяем через сутки
+            gone = [url for url, sub in self.subscriptions.items() if url not in feed_urls
+                    and (sub["state"] != "unsubscribing" or now - sub["requested"] >= 86400)]
+        for url in gone:
+            self.unsubscribe(url)
+        return len(gone)
+
+    # ---- Polling side ----
+
+    def needs_poll(self, feed_url, now=None):
+        """False for a feed the hub pushes (active lease) that was polled within poll_hours."""
+        now = now or time.time()
+        with self.lock:
+            sub = self.subscriptions.get(feed_url)
+            if sub is None or sub["state"] != "active" or sub.get("lease_until", 0) <= now:
+                return True
+            return now - sub.get("last_poll", 0) >= self.poll_seconds
+
+    def polled(self, feed_url, base_filename, content, headers=None):
+        """Called after a feed is fetched: subscribe if it advertises a hub, or renew an expiring lease."""
+        now = time.time()
+        with self.lock:
+            sub = self.subscriptions.get(feed_url)
+            if sub is not None:
+                sub["last_poll"] = now
+                sub["base"] = base_filename
+                self.save()
+                # Продлеваем за сутки до конца срока; ожидающую подписку - повторяем через час
+                if sub["state"] == "active" and sub.get("lease_until", 0) - now > 86400:
+                    return
+                if sub["state"] == "pending" and now - sub["requested"] < 3600:
+                    return
+                if sub["state"] == "denied" and now - sub["requested"] < 86400:
+                    return
+        hub, topic = discover(content, headers, feed_url)
+        if hub is not None:
+            self.subscribe(feed_url, hub, topic, base_filename)
+
+    def subscribe(self, feed_url, hub, topic, base_filename):
+        with self.lock:
+            sub = self.subscriptions.get(feed_url)
+            if sub is None or sub["hub"] != hub or sub["topic"] != topic:
+                sub = self.subscriptions[feed_url] = {
+                    "id": subscription_id(), "hub": hub, "topic": topic, "secret": secrets.token_hex(20),
+                    "state": "pending", "lease_until": 0, "last_push": 0, "last_poll": time.time()}
+                self.by_id[sub["id"]] = feed_url
+            elif sub["state"] != "active":
+                sub["state"] = "pending"
+            sub["base"] = base_filename
+            sub["requested"] = time.time()
+            self.save()
+            form = {"hub.mode": "subscribe", "hub.topic": topic, "hub.callback": f"{self.callback_url}/websub/{sub['id']}",
+                    "hub.secret": sub["secret"], "hub.lease_seconds": str(self.lease_seconds)}
+        try:
+            response = requests.post(hub, data=form, timeout=15)
+            if response.status_code not in (202, 204):
+                print(f"WebSub hub {hub} refused {topic}: {response.status_code} {response.text[:200]}")
+                return False
+        except requests.RequestException as e:
+            print(f"WebSub subscribe to {hub} failed: {e}")
+            return False
+        print(f"WebSub subscription requested: {topic} via {hub}")
+        return True
+
+    def unsubscribe(self, feed_url):
+        """Ask the hub to stop delivering feed_url; the subscription is dropped once the hub verifies it."""
+        with self.lock:
+            sub = self.subscriptions.get(feed_url)
+            if sub is None:
+                return False
+            if sub["state"] in ("pending", "denied"):
+                # Хаб ничего не шлёт - отписываться не от чего
+                del self.subscriptions[feed_url]
+                self.by_id.pop(sub["id"], None)
+                self.save()
+                return True
+            sub["state"] = "unsubscribing"
+            sub["requested"] = time.time()
+            self.save()
+            hub = sub["hub"]
+            form = {"hub.mode": "unsubscribe", "hub.topic": sub["topic"],
+                    "hub.callback": f"{self.callback_url}/websub/{sub['id']}"}
+        try:
+            response = requests.post(hub, data=form, timeout=15)
+            if response.status_code not in (202, 204):
+                print(f"WebSub hub {hub} refused to unsubscribe {form['hub.topic']}: {response.status_code}")
+                return False
+        except requests.RequestException as e:
+            print(f"WebSub unsubscribe from {hub} failed: {e}")
+            return False
+        print(f"WebSub unsubscribe requested: {form['hub.topic']} via {hub}")
+        return True
+
+    # ---- Callback side (server threads) ----
+
+    def verify(self, sub_id, params):
+        """Response body for a hub verification request, None to refuse it (404)."""
+        mode = params.get("hub.mode", "")
+        with self.lock:
+            feed_url = self.by_id.get(sub_id)
+            sub = self.subscriptions.get(feed_url)
+            if sub is None or params.get("hub.topic") != sub["topic"]:
+                return None
+            if mode == "denied":
+                sub["state"] = "denied"
+                print(f"WebSub subscription denied: {sub['topic']} {params.get('hub.reason', '')}")
+                self.save()
+                return ""
+            if mode == "unsubscribe":
+                if sub["state"] != "unsubscribing":
+                    return None
+                del self.subscriptions[feed_url]
+                del self.by_id[sub_id]
+                self.save()
+                print(f"WebSub subscription removed: {sub['topic']}")
+                return params.get("hub.challenge", "")
+            if mode != "subscribe" or sub["state"] not in ("pending", "active"):
+                return None
+            try:
+                lease = int(params.get("hub.lease_seconds") or self.lease_seconds)
+            except ValueError:
+                lease = self.lease_seconds
+            sub["state"] = "active"
+            sub["lease_until"] = time.time() + lease
+            self.save()
+        print(f"WebSub subscription active: {sub['topic']} for {lease // 3600} h")
+        return params.get("hub.challenge", "")
+
+    def receive(self, sub_id, body, signature):
+        """Queue pushed content; False if the subscription is unknown or the signature does not match."""
+        with self.lock:
+            feed_url = self.by_id.get(sub_id)
+            sub = self.subscriptions.get(feed_url)
+            if sub is None or sub["state"] != "active":
+                return False
+            if not check_signature(sub["secret"], body, signature):
+                print(f"WebSub push with a bad signature for {sub['topic']} ignored")
+                return False
+            sub["last_push"] = time.time()
+            base_filename = sub["base"]
+        self.pushes.put((feed_url, base_filename, body))
+        return True
+
+    def ingest_worker(self):
+        import fetchrss  # fetchrss импортирует модули сбора; здесь нужен только save_items
+        while True:
+            job = self.pushes.get()
+            if job is None:
+                return
+            feed_url, base_filename, body = job
+            try:
+                feed_urls = self.feed_urls()
+            except Exception as e:
+                print(f"Error reading the feed list: {e}")
+                feed_urls = None
+            if feed_urls is not None and feed_url not in feed_urls:
+                print(f"WebSub push for {feed_url}, which is no longer in the feed list, dropped")
+                self.prune(feed_urls)
+                continue
+            try:
+                batch = parse_feed(body, os.path.basename(base_filename))
+                with file_lock(FEEDS_LOCK):
+                    added = fetchrss.save_items(batch, base_filename, self.story_index, self.html_store, self.alerts,
+                                                SegmentLog(segment_bytes=self.segment_bytes), self.stats)
+            except Exception as e:
+                print(f"Error ingesting WebSub push for {feed_url}: {e}")
+                continue
+            if added and self.on_feed_updated is not None:
+                self.on_feed_updated(feed_url, base_filename + ".csv", len(added))
+
+class CallbackHandler(BaseHTTPRequestHandler):
+    def _sub_id(self):
+        path = urlparse(self.path).path
+        return path[len("/websub/"):] if path.startswith("/websub/") else None
+
+    def do_GET(self):
+        params = {key: values[0] for key, values in parse_qs(urlparse(self.path).query).items()}
+        sub_id = self._sub_id()
+        body = self.server.subscriber.verify(sub_id, params) if sub_id else None
+        if body is None:
+            self.send_error(404)
+            return
+        data = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.send_error(400)
+            return
+        if length > MAX_PUSH_BYTES:
+            # Тело не читаем; соединение закрывается после ответа
+            self.close_connection = True
+            self.send_error(413)
+            return
+        body = self.rfile.read(length)
+        sub_id = self._sub_id()
+        if sub_id is None or sub_id not in self.server.subscriber.by_id:
+            self.send_error(410)  # хаб перестанет слать неизвестной подписке
+            return
+        # По спецификации 2xx даже при неверной подписи, чтобы не выдавать проверку
+        self.server.subscriber.receive(sub_id, body, self.headers.get("X-Hub-Signature"))
+        self.send_response(202)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+class LocalHub:
+    """Minimal stand-in hub on 127.0.0.1 for testing: verifies intent and distributes signed content."""
+
+    def __init__(self, port=0):
+        self.subscribers = {}  # topic -> {callback: secret}
+        self.lock = threading.Lock()
+        hub = self
+
+        class HubHandler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0)).decode('utf-8')
+                form = {key: values[0] for key, values in parse_qs(body).items()}
+                if form.get("hub.mode") not in ("subscribe", "unsubscribe") or not form.get("hub.callback"):
+                    self.send_error(400)
+                    return
+                self.send_response(202)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                threading.Thread(target=hub.verify, args=(form,), daemon=True).start()
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), HubHandler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def verify(self, form):
+        challenge = secrets.token_hex(8)
+        mode = form["hub.mode"]
+        response = requests.get(form["hub.callback"], timeout=10, params={
+            "hub.mode": mode, "hub.topic": form["hub.topic"], "hub.challenge": challenge,
+            "hub.lease_seconds": form.get("hub.lease_seconds", "3600")})
+        if response.status_code == 200 and response.text == challenge:
+            with self.lock:
+                callbacks = self.subscribers.setdefault(form["hub.topic"], {})
+                if mode == "subscribe":
+                    callbacks[form["hub.callback"]] = form.get("hub.secret")
+                else:
+                    callbacks.pop(form["hub.callback"], None)
+
+    def publish(self, topic, content, secret=None):
+        """POST content to every verified subscriber of topic; returns their status codes."""
+        with self.lock:
+            callbacks = dict(self.subscribers.get(topic, {}))
+        codes = []
+        for callback, subscriber_secret in callbacks.items():
+            key = secret if secret is not None else subscriber_secret
+            headers = {"Content-Type": "application/rss+xml"}
+            if key:
+                headers["X-Hub-Signature"] = sign(key, content)
+            codes.append(requests.post(callback, data=content, headers=headers, timeout=10).status_code)
+        return codes
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+def wait_until(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+def selftest():
+    """Subscribe through LocalHub, push twice (the second time a duplicate) and a forged push, then
+    remove the feed from feeds.csv and check it is unsubscribed; True on success."""
+    from feed_items import read_column
+
+    def rss(hub_url, links):
+        items = "".join(f"<item><title>Pushed {link}</title><link>{link}</link><description>d</description>"
+                        f"<pubDate>Mon, 06 Jan 2025 10:00:00 GMT</pubDate></item>" for link in links)
+        return (f'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom">'
+                f'<channel><title>T</title><atom:link rel="hub" href="{hub_url}"/>'
+                f'<atom:link href="https://example.com/feed.xml" rel="self"/>{items}</channel></rss>').encode('utf-8')
+
+    feed_url = "https://example.com/feed.xml"
+    with tempfile.TemporaryDirectory() as tmp:
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        hub = LocalHub()
+        subscriber = WebSubSubscriber("http://127.0.0.1:0", port=0)
+        try:
+            assert subscriber.start(), "callback server"
+            subscriber.callback_url = f"http://127.0.0.1:{subscriber.port}"
+            base = os.path.join("data", "feeds", "example_com_feed_xml")
+            os.makedirs(os.path.dirname(base))
+            with open(FEEDS_CSV, 'w', encoding='utf-8') as f:
+                f.write(f"url\tproxy\n{feed_url}\t\n")
+            subscriber.polled(feed_url, base, rss(hub.url, []))
+            assert wait_until(lambda: not subscriber.needs_poll(feed_url)), "subscription not verified"
+
+            links = [f"https://example.com/a{i}" for i in range(3)]
+            assert hub.publish(feed_url, rss(hub.url, links)) == [202]
+            assert wait_until(lambda: len(read_column(base + ".csv", "link")) == 3), "push not ingested"
+            hub.publish(feed_url, rss(hub.url, links + ["https://example.com/a3"]))
+            assert wait_until(lambda: len(read_column(base + ".csv", "link")) == 4), "duplicate push not deduplicated"
+            hub.publish(feed_url, rss(hub.url, ["https://example.com/forged"]), secret="wrong")
+            time.sleep(0.5)
+            assert len(read_column(base + ".csv", "link")) == 4, "forged push ingested"
+
+            with open(FEEDS_CSV, 'w', encoding='utf-8') as f:
+                f.write("url\tproxy\n")
+            hub.publish(feed_url, rss(hub.url, ["https://example.com/removed"]))
+            assert wait_until(lambda: feed_url not in subscriber.subscriptions), "removed feed not unsubscribed"
+            assert len(read_column(base + ".csv", "link")) == 4, "push for a removed feed ingested"
+            assert hub.publish(feed_url, rss(hub.url, ["https://example.com/late"])) == [], "hub still delivers"
+        finally:
+            subscriber.stop()
+            hub.close()
+            os.chdir(cwd)
+    print("WebSub self-test passed")
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description="NeuroLit WebSub subscriber")
+    parser.add_argument("--selftest", action="store_true", help="end-to-end test against a local stand-in hub")
+    args = parser.parse_args()
+    if args.selftest:
+        try:
+            return 0 if selftest() else 1
+        except AssertionError as e:
+            print(f"WebSub self-test failed: {e}")
+            return 1
+    parser.print_help()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())